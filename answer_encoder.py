@@ -0,0 +1,219 @@
+"""Serialize submission payloads once, shrinking file answers until they fit the size limit."""
+import base64
+import binascii
+import io
+import json
+import logging
+import re
+import uuid
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, Optional, Tuple
+
+import config
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Same encoding httpx uses for ``json=``, so the bytes measured are the bytes sent
+_JSON_OPTIONS = {"ensure_ascii": False, "separators": (",", ":"), "allow_nan": False}
+
+_DATA_URI = re.compile(r"data:(?P<mime>[\w.+-]+/[\w.+-]+)?(?:;[\w.+-]+=[^;,]*)*;base64,", re.ASCII)
+
+_MAGIC = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"%PDF-", "application/pdf"),
+    (b"PK\x03\x04", "application/zip"),
+)
+
+# Tried in order at each size; lossless first, then lossy at falling quality
+_IMAGE_ENCODINGS = (
+    ("image/png", "PNG", {"optimize": True}),
+    ("image/png", "PNG-P", {"optimize": True}),
+    ("image/webp", "WEBP", {"quality": 90, "method": 6}),
+    ("image/jpeg", "JPEG", {"quality": 85, "optimize": True}),
+    ("image/webp", "WEBP", {"quality": 70, "method": 6}),
+    ("image/jpeg", "JPEG", {"quality": 60, "optimize": True}),
+)
+
+# Each downscale step keeps this share of the width and height
+_DOWNSCALE = 0.75
+
+class AnswerEncodingError(Exception):
+    """Raised when an answer cannot be serialized as JSON."""
+    pass
+
+class AnswerTooLargeError(AnswerEncodingError):
+    """Raised when an answer cannot be made to fit the submission size limit."""
+    pass
+
+def sniff_mime(content: bytes, default: str = "application/octet-stream") -> str:
+    """Guess a file's MIME type from its leading bytes."""
+    head = bytes(content[:16])
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    for magic, mime in _MAGIC:
+        if head.startswith(magic):
+            return mime
+    return default
+
+def base64_size(size: int) -> int:
+    """Length of the base64 encoding of ``size`` bytes, without encoding them."""
+    return 4 * ((size + 2) // 3)
+
+def to_data_uri(content: bytes, mime: Optional[str] = None) -> str:
+    """Encode bytes as a ``data:<mime>;base64,`` URI, sniffing the type if not given."""
+    mime = mime or sniff_mime(content)
+    return f"data:{mime};base64," + base64.b64encode(memoryview(content)).decode("ascii")
+
+def parse_data_uri(value: str) -> Optional[Tuple[str, bytes]]:
+    """Split a base64 data URI into its MIME type and decoded bytes; None if it is not one."""
+    match = _DATA_URI.match(value)
+    if not match:
+        return None
+    raw = memoryview(value.encode("ascii", errors="ignore"))[match.end():]
+    try:
+        return match.group("mime") or "application/octet-stream", base64.b64decode(raw, validate=False)
+    except (binascii.Error, ValueError):
+        return None
+
+def _flatten(image: "Image.Image") -> "Image.Image":
+    """The image on a white background, for formats without transparency."""
+    from PIL import Image
+
+    if image.mode in ("RGB", "L"):
+        return image
+    rgba = image.convert("RGBA")
+    return Image.alpha_composite(Image.new("RGBA", rgba.size, "white"), rgba).convert("RGB")
+
+def _image_candidates(content: bytes) -> Iterator[Tuple[str, bytes]]:
+    """Re-encodings of an image, from the largest likely size down, scaling the image when formats run out."""
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(content))
+    image.load()
+    original = image
+    min_side = config.ANSWER_MIN_IMAGE_SIDE
+    while min(image.size) >= min_side:
+        for mime, fmt, options in _IMAGE_ENCODINGS:
+            if fmt == "PNG-P":
+                mode = "RGBA" if "A" in image.getbands() else "RGB"
+                frame, fmt = image.convert(mode).quantize(256, method=Image.Quantize.FASTOCTREE), "PNG"
+            elif fmt == "JPEG":
+                frame = _flatten(image)
+            else:
+                frame = image
+            buffer = io.BytesIO()
+            frame.save(buffer, format=fmt, **options)
+            yield mime, buffer.getvalue()
+        width, height = image.size
+        image = original.resize((max(1, int(width * _DOWNSCALE)), max(1, int(height * _DOWNSCALE))), Image.LANCZOS)
+
+def shrink_file(content: bytes, mime: str, fits: Callable[[str, int], bool]) -> Tuple[str, bytes]:
+    """
+    Re-encode a file answer until ``fits(mime, size)`` accepts it.
+
+    Images go through optimized and palette PNG, WebP and JPEG at falling
+    quality, then the same again at 75% of the previous size, down to
+    ``ANSWER_MIN_IMAGE_SIDE`` pixels. Other files are left alone: the
+    grader expects the original type, so they are rejected instead.
+
+    Args:
+        content: File bytes
+        mime: The file's MIME type
+        fits: Whether an encoding with this MIME type and byte size is small enough
+
+    Returns:
+        The MIME type and bytes of the first encoding that fits
+
+    Raises:
+        AnswerTooLargeError: If nothing fits
+    """
+    attempts = 0
+    if mime.startswith("image/") and mime != "image/svg+xml":
+        from PIL import Image
+
+        try:
+            for candidate_mime, candidate in _image_candidates(content):
+                attempts += 1
+                if fits(candidate_mime, len(candidate)):
+                    logger.info(f"Re-encoded {mime} answer ({len(content):,} bytes) as {candidate_mime} ({len(candidate):,} bytes) after {attempts} tries")
+                    return candidate_mime, candidate
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            raise AnswerTooLargeError(f"{mime} answer of {len(content):,} bytes is over the submission limit and could not be re-encoded: {e}") from e
+    raise AnswerTooLargeError(f"{mime} answer of {len(content):,} bytes cannot be made to fit the submission limit")
+
+def _file_answer(answer: Any) -> Optional[Tuple[str, bytes]]:
+    """MIME type and bytes of an answer that is a file (raw bytes or a base64 data URI)."""
+    if isinstance(answer, (bytes, bytearray, memoryview)):
+        return sniff_mime(answer), bytes(answer)
+    if isinstance(answer, str) and answer.startswith("data:"):
+        return parse_data_uri(answer)
+    return None
+
+def encode_submission(fields: Dict[str, Any], answer: Any, limit: Optional[int] = None) -> bytes:
+    """
+    Serialize the submission payload ``{**fields, "answer": answer}`` once, within ``limit`` bytes.
+
+    The byte budget for the answer is known before it is encoded: the other
+    fields are serialized first and the answer is spliced in. Raw bytes
+    become a base64 data URI. A file answer over the budget is re-encoded
+    (see ``shrink_file``) until it fits; its base64 is written straight
+    into the body without building another string.
+
+    Args:
+        fields: The other payload fields (email, secret, url)
+        answer: The answer
+        limit: Maximum body size in bytes (``SUBMIT_MAX_BYTES`` by default)
+
+    Returns:
+        The UTF-8 JSON request body
+
+    Raises:
+        AnswerTooLargeError: If the answer cannot be made to fit
+        AnswerEncodingError: If the answer is not JSON serializable
+    """
+    limit = limit or config.SUBMIT_MAX_BYTES
+    placeholder = uuid.uuid4().hex
+    try:
+        envelope = json.dumps({**fields, "answer": placeholder}, **_JSON_OPTIONS).encode("utf-8")
+    except (TypeError, ValueError) as e:
+        raise AnswerEncodingError(f"Payload is not JSON serializable: {e}") from e
+    head, tail = envelope.split(f'"{placeholder}"'.encode("ascii"), 1)
+    budget = limit - len(head) - len(tail)
+
+    encoded: Optional[bytes] = None
+    error: Optional[Exception] = None
+    try:
+        encoded = json.dumps(answer, **_JSON_OPTIONS).encode("utf-8")
+    except (TypeError, ValueError) as e:
+        # Raw bytes land here and are handled as a file below
+        error = e
+    if encoded is not None and len(encoded) <= budget:
+        return b"".join((head, encoded, tail))
+
+    file_answer = _file_answer(answer)
+    if file_answer is None:
+        if encoded is None:
+            raise AnswerEncodingError(f"Answer is not JSON serializable: {error}") from error
+        raise AnswerTooLargeError(f"Answer is {len(encoded):,} bytes, over the {budget:,} bytes left under the {limit:,} byte limit")
+    del encoded
+
+    mime, content = file_answer
+
+    def fits(candidate_mime: str, size: int) -> bool:
+        # Quotes + "data:<mime>;base64," + the base64 text
+        return 2 + len(f"data:{candidate_mime};base64,") + base64_size(size) <= budget
+
+    if not fits(mime, len(content)):
+        mime, content = shrink_file(content, mime, fits)
+    return b"".join((
+        head,
+        f'"data:{mime};base64,'.encode("ascii"),
+        base64.b64encode(memoryview(content)),
+        b'"',
+        tail
+    ))
@@ -3,17 +3,30 @@ import sys
 import asyncio
 import logging
 from contextlib import asynccontextmanager
+from typing import Optional
 
 # Fix for Windows + Playwright: Enforce ProactorEventLoopPolicy
 if sys.platform == 'win32':
     asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
 
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel, EmailStr, ValidationError
 
 import config
+import metrics
+from browser_pool import BrowserPool
+from data_processor import warm_up
+from download_cache import get_download_cache
+from http_client import close_http_clients, get_http_clients
+from job_store import JOB_COMPLETED, JOB_FAILED, JobStore
+from llm_client import LLMClient
+from fast_extract import QuizInfoExtractor
+from fetcher import QuizPageFetcher
+from page_loader import PageLoader
 from quiz_solver import QuizSolver
+from sandbox import SandboxPool
+from scheduler import JobScheduler, SchedulerFullError
 
 # Configure logging
 logging.basicConfig(
@@ -33,10 +46,57 @@ async def lifespan(app: FastAPI):
         logger.error(f"Configuration error: {e}")
         raise
     
+    # Pooled HTTP clients reused by every quiz, download and submission
+    get_http_clients()
+    
+    # Shared Gemini client so the concurrency bound applies across quizzes
+    app.state.llm_client = LLMClient()
+    
+    # Pre-warmed processes for generated code, kept off the event loop
+    app.state.sandbox = SandboxPool()
+    await app.state.sandbox.start()
+    
+    # Shared Chromium for all quizzes handled by this worker
+    app.state.browser_pool = BrowserPool()
+    try:
+        await app.state.browser_pool.start()
+        logger.info("Browser pool started")
+    except Exception as e:
+        # Quizzes still fall back to HTTPX; the pool retries the launch on first use
+        logger.warning(f"Could not pre-launch browser: {e}")
+    
+    # Static-first page fetching; resource blocking and content readiness when rendering
+    app.state.fetcher = QuizPageFetcher(app.state.browser_pool, PageLoader())
+    
+    # Rule-based quiz info extraction that skips the LLM on standard pages
+    app.state.extractor = QuizInfoExtractor()
+    
+    # Per-chain status and results for the /jobs endpoints
+    app.state.job_store = JobStore()
+    
+    # Bounded queue in front of the solver so bursts can't exhaust memory
+    app.state.scheduler = JobScheduler(solve_quiz_async)
+    await app.state.scheduler.start()
+    
+    # Gauges read live state at scrape time
+    metrics.JOB_QUEUE_DEPTH.set_function(lambda: app.state.scheduler.queue_depth)
+    metrics.JOBS_RUNNING.set_function(lambda: app.state.scheduler.running)
+    metrics.BROWSER_ACTIVE_PAGES.set_function(lambda: app.state.browser_pool.active_pages)
+    
+    # Data libraries are imported on first use; optionally load them now without delaying startup
+    if config.WARMUP_IMPORTS:
+        app.state.warmup = asyncio.create_task(asyncio.to_thread(warm_up))
+    
     yield
     
     # Shutdown
     logger.info("Shutting down application...")
+    await app.state.scheduler.shutdown()
+    await app.state.fetcher.close()
+    await app.state.browser_pool.close()
+    await app.state.sandbox.close()
+    await close_http_clients()
+    app.state.job_store.close()
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -66,6 +126,7 @@ class QuizRequest(BaseModel):
 class QuizResponse(BaseModel):
     status: str
     message: str
+    job_id: Optional[str] = None
 
 @app.post("/quiz", response_model=QuizResponse)
 async def handle_quiz(request: Request):
@@ -79,7 +140,8 @@ async def handle_quiz(request: Request):
         QuizResponse with status and message
         
     Raises:
-        HTTPException: 400 for invalid JSON, 403 for invalid credentials
+        HTTPException: 400 for invalid JSON, 403 for invalid credentials,
+            503 with Retry-After when the job queue is full
     """
     # Step 1: Catch invalid JSON BEFORE validation
     try:
@@ -122,12 +184,34 @@ async def handle_quiz(request: Request):
         logger.warning("Invalid secret")
         raise HTTPException(status_code=403, detail="Invalid secret")
     
-    # Step 4: Start quiz solver asynchronously (don't wait for completion)
-    asyncio.create_task(solve_quiz_async(url))
+    # Step 4: Attach to an in-flight chain for the same URL instead of solving it twice
+    existing = app.state.job_store.find_coalescible(email, url, ttl=config.DEDUP_TTL_SECONDS)
+    if existing:
+        logger.info(f"Coalescing duplicate request for {url} into job {existing.id} ({existing.status})")
+        app.state.job_store.attach(existing.id)
+        return QuizResponse(
+            status="accepted",
+            message=f"Quiz request attached to existing job ({existing.status}) for {url}",
+            job_id=existing.id
+        )
+    
+    # Step 5: Queue the quiz chain (don't wait for completion)
+    job = app.state.job_store.create(url, email)
+    try:
+        app.state.scheduler.submit(job.id, url)
+    except SchedulerFullError as e:
+        logger.warning(f"Rejecting quiz request for {url}: {e}")
+        app.state.job_store.discard(job.id)
+        return JSONResponse(
+            status_code=503,
+            content={"detail": f"Server busy: {e}"},
+            headers={"Retry-After": str(config.JOB_RETRY_AFTER_SECONDS)}
+        )
     
     return QuizResponse(
         status="accepted",
-        message=f"Quiz request accepted. Solving quiz at {url}"
+        message=f"Quiz request accepted. Solving quiz at {url}",
+        job_id=job.id
     )
 
 # Alias /solve to /quiz for project submission requirements
@@ -139,20 +223,56 @@ async def handle_solve(request: Request):
     """
     return await handle_quiz(request)
 
-async def solve_quiz_async(quiz_url: str):
+@app.get("/jobs")
+async def list_jobs(limit: int = 50, status: Optional[str] = None):
+    """List recent quiz chain jobs, newest first."""
+    jobs = app.state.job_store.list(limit=min(max(limit, 1), 500), status=status)
+    return {"jobs": [job.to_dict(include_steps=False) for job in jobs]}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get the status, per-quiz steps and outcome of a job."""
+    job = app.state.job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+async def solve_quiz_async(job_id: str, quiz_url: str):
     """
     Solve the quiz asynchronously.
     
     Args:
+        job_id: Id of the job record to update
         quiz_url: URL of the quiz to solve
     """
+    store = app.state.job_store
+    store.mark_running(job_id)
+    # Collects the time every stage of this chain spends, including in tasks it spawns
+    breakdown = metrics.start_breakdown()
     solver = None
     try:
-        solver = QuizSolver()
-        await solver.solve_quiz_chain(quiz_url)
-        logger.info(f"Successfully completed quiz chain starting from {quiz_url}")
+        solver = QuizSolver(
+            browser_pool=app.state.browser_pool,
+            llm_client=app.state.llm_client,
+            sandbox=app.state.sandbox,
+            fetcher=app.state.fetcher,
+            extractor=app.state.extractor
+        )
+        outcome = await solver.solve_quiz_chain(
+            quiz_url,
+            on_step=lambda step: store.add_step(job_id, step)
+        )
+        if outcome["status"] == "completed":
+            store.finish(job_id, JOB_COMPLETED, stage_seconds=breakdown)
+            logger.info(f"Successfully completed quiz chain starting from {quiz_url}")
+        else:
+            store.finish(job_id, JOB_FAILED, outcome["reason"], stage_seconds=breakdown)
+    except asyncio.CancelledError:
+        store.finish(job_id, JOB_FAILED, "Cancelled during shutdown", stage_seconds=breakdown)
+        raise
     except Exception as e:
         logger.error(f"Error solving quiz {quiz_url}: {e}", exc_info=True)
+        store.finish(job_id, JOB_FAILED, str(e), stage_seconds=breakdown)
     finally:
         if solver:
             await solver.close()
@@ -191,9 +311,21 @@ async def health():
         "status": "healthy",
         "config_valid": True,
         "email_configured": bool(config.STUDENT_EMAIL),
-        "gemini_configured": bool(config.GOOGLE_API_KEY)
+        "gemini_configured": bool(config.GOOGLE_API_KEY),
+        "llm_cache": app.state.llm_client.cache.stats() if app.state.llm_client.cache else None,
+        "page_fetches": app.state.fetcher.stats(),
+        "page_loads": app.state.fetcher.page_loader.stats(),
+        "fast_extract": app.state.extractor.stats(),
+        "download_cache": get_download_cache().stats() if get_download_cache() else None,
+        "running_jobs": app.state.scheduler.running,
+        "queued_jobs": app.state.scheduler.queue_depth
     }
 
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics for this worker process."""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -0,0 +1,212 @@
+"""
+Offline benchmark of the full solve pipeline.
+
+Replays a cassette recorded with REPLAY_MODE=record: quiz pages, downloads
+and submissions come from a local stub server and LLM responses from the
+cassette, so no network or API key is needed.
+
+Usage:
+    python benchmark.py --cassette cassettes/demo --chains 20 --concurrency 4
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows has no getrusage
+    resource = None
+
+# Methods timed as pipeline stages, per solver instance
+STAGES = {
+    "solve_single_quiz": "quiz",
+    "_extract_quiz_info": "extract",
+    "_generate_solution_code": "codegen",
+    "_prefetch_data_sources": "prefetch",
+    "_execute_solution_code": "execute",
+    "_llm_direct_answer": "direct_answer",
+    "_submit_answer": "submit",
+}
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+def peak_rss_mb() -> Dict[str, Optional[float]]:
+    """Peak resident memory of this process and of its (sandbox) children."""
+    if resource is None:
+        return {"self": None, "children": None}
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1),
+    }
+
+class StageTimer:
+    """Record how long each wrapped coroutine method takes."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+
+    def wrap(self, obj: Any, method: str, stage: str):
+        original = getattr(obj, method)
+
+        async def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await original(*args, **kwargs)
+            finally:
+                self.samples[stage].append(time.perf_counter() - start)
+
+        setattr(obj, method, timed)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {
+            stage: {
+                "count": len(values),
+                "p50": round(percentile(values, 50), 4),
+                "p90": round(percentile(values, 90), 4),
+                "p99": round(percentile(values, 99), 4),
+                "max": round(max(values), 4),
+            }
+            for stage, values in sorted(self.samples.items())
+        }
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    # Imported here so the replay environment is in place before config is read
+    import config
+    from browser_pool import BrowserPool
+    from fetcher import QuizPageFetcher
+    from http_client import close_http_clients
+    from llm_client import LLMClient
+    from quiz_solver import QuizSolver
+    from replay import Cassette, StubServer
+    from sandbox import SandboxPool
+
+    cassette = Cassette(args.cassette)
+    start_url = args.url or next(iter(cassette.page_urls()), None)
+    if not start_url:
+        raise SystemExit(f"No recorded pages in {args.cassette}; record one with REPLAY_MODE=record first")
+
+    stub = StubServer(cassette)
+    stub_url = stub.start()
+    # Sandbox workers read the stub URL from the environment when they start
+    os.environ["REPLAY_STUB_URL"] = stub_url
+    config.REPLAY_STUB_URL = stub_url
+
+    llm = LLMClient()
+    sandbox = SandboxPool()
+    await sandbox.start()
+    browser_pool = BrowserPool()
+    fetcher = QuizPageFetcher(browser_pool, allow_browser=False)
+
+    timer = StageTimer()
+    timer.wrap(fetcher, "fetch", "page")
+    semaphore = asyncio.Semaphore(args.concurrency)
+    outcomes: List[Dict[str, Any]] = []
+
+    async def run_chain(index: int):
+        async with semaphore:
+            solver = QuizSolver(browser_pool=browser_pool, llm_client=llm, sandbox=sandbox, fetcher=fetcher)
+            for method, stage in STAGES.items():
+                timer.wrap(solver, method, stage)
+            steps: List[Dict[str, Any]] = []
+            start = time.perf_counter()
+            try:
+                outcome = await solver.solve_quiz_chain(start_url, on_step=steps.append)
+            except Exception as e:
+                logging.getLogger(__name__).error(f"Chain {index} crashed: {e}")
+                outcome = {"status": "failed", "reason": str(e)}
+            finally:
+                await solver.close()
+            timer.samples["chain"].append(time.perf_counter() - start)
+            outcomes.append({**outcome, "steps": steps})
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(run_chain(i) for i in range(args.chains)))
+    finally:
+        wall = time.perf_counter() - started
+        await sandbox.close()
+        await browser_pool.close()
+        await close_http_clients()
+        stub.stop()
+
+    quizzes = sum(len(outcome["steps"]) for outcome in outcomes)
+    correct = sum(1 for outcome in outcomes for step in outcome["steps"] if step.get("correct"))
+    return {
+        "cassette": args.cassette,
+        "start_url": start_url,
+        "chains": args.chains,
+        "concurrency": args.concurrency,
+        "completed_chains": sum(1 for outcome in outcomes if outcome["status"] == "completed"),
+        "wall_seconds": round(wall, 3),
+        "throughput": {
+            "chains_per_second": round(len(outcomes) / wall, 3),
+            "quizzes_per_second": round(quizzes / wall, 3),
+            "correct_per_second": round(correct / wall, 3),
+        },
+        "accuracy": round(correct / quizzes, 3) if quizzes else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": timer.summary(),
+    }
+
+def print_report(report: Dict[str, Any]):
+    print(f"Cassette: {report['cassette']}  start: {report['start_url']}")
+    print(
+        f"{report['chains']} chains, concurrency {report['concurrency']}: "
+        f"{report['completed_chains']} completed in {report['wall_seconds']}s"
+    )
+    throughput = report["throughput"]
+    print(
+        f"Throughput: {throughput['chains_per_second']} chains/s, "
+        f"{throughput['quizzes_per_second']} quizzes/s, {throughput['correct_per_second']} correct/s "
+        f"(accuracy {report['accuracy']})"
+    )
+    memory = report["peak_rss_mb"]
+    print(f"Peak RSS: {memory['self']} MB (server), {memory['children']} MB (largest sandbox worker)")
+    print()
+    print(f"{'stage':<14}{'count':>7}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}")
+    for stage, stats in report["stages"].items():
+        print(
+            f"{stage:<14}{stats['count']:>7}{stats['p50']:>10.3f}{stats['p90']:>10.3f}"
+            f"{stats['p99']:>10.3f}{stats['max']:>10.3f}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded cassette through the quiz solver")
+    parser.add_argument("--cassette", required=True, help="Cassette directory recorded with REPLAY_MODE=record")
+    parser.add_argument("--url", help="First quiz URL (default: the first recorded page)")
+    parser.add_argument("--chains", type=int, default=10, help="Quiz chains to run")
+    parser.add_argument("--concurrency", type=int, default=2, help="Chains run at once")
+    parser.add_argument("--llm-latency-scale", type=float, default=0.0,
+                        help="Replay recorded LLM latency times this (0 answers instantly)")
+    parser.add_argument("--llm-cache", action="store_true", help="Keep the LLM response cache enabled")
+    parser.add_argument("--json", help="Also write the report to this file")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Show solver logs")
+    args = parser.parse_args()
+
+    os.environ["REPLAY_MODE"] = "replay"
+    os.environ["REPLAY_CASSETTE_DIR"] = args.cassette
+    os.environ["REPLAY_LLM_LATENCY_SCALE"] = str(args.llm_latency_scale)
+    if not args.llm_cache:
+        os.environ["LLM_CACHE_ENABLED"] = "false"
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+    report = asyncio.run(run_benchmark(args))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
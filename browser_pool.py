@@ -0,0 +1,218 @@
+"""Pooled Chromium browser shared across quiz solves."""
+import asyncio
+import logging
+import os
+import sys
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Set
+
+from playwright.async_api import async_playwright, Browser, Page, Playwright
+
+import config
+from metrics import BROWSER_LAUNCHES, span
+
+logger = logging.getLogger(__name__)
+
+
+def _browser_rss_mb() -> float:
+    """
+    Return the combined resident memory of Chromium processes we spawned.
+
+    Walks /proc for descendants of this process, so it only works on Linux;
+    other platforms report 0 and never trigger memory-based recycling.
+    """
+    if not sys.platform.startswith("linux"):
+        return 0.0
+
+    children: Dict[int, list] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name is wrapped in parentheses and may contain spaces
+        comm = stat[stat.find("(") + 1:stat.rfind(")")]
+        fields = stat[stat.rfind(")") + 2:].split()
+        children.setdefault(int(fields[1]), []).append((int(entry), comm, int(fields[21])))
+
+    total_pages = 0
+    stack = [os.getpid()]
+    while stack:
+        for pid, comm, rss_pages in children.get(stack.pop(), []):
+            if "chrom" in comm or "headless" in comm:
+                total_pages += rss_pages
+            stack.append(pid)
+
+    return total_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+class _BrowserSlot:
+    """A launched browser plus its usage accounting."""
+
+    def __init__(self, browser: Browser):
+        self.browser = browser
+        self.uses = 0
+        self.active = 0
+        self.retired = False
+
+
+class BrowserPool:
+    """
+    Share one Chromium process across quizzes.
+
+    Every quiz gets its own isolated ``BrowserContext``; the browser itself is
+    launched once and recycled after ``max_uses`` pages, when its memory grows
+    past ``max_rss_mb``, or when it crashes.
+
+    With ``cdp_endpoint`` set the pool connects to a browser shared by all
+    workers (see browser_server.py) instead of launching its own, and only
+    reconnects when that browser goes away; recycling it is up to its owner.
+    """
+
+    def __init__(
+        self,
+        max_pages: Optional[int] = None,
+        max_uses: Optional[int] = None,
+        max_rss_mb: Optional[int] = None,
+        cdp_endpoint: Optional[str] = None
+    ):
+        self.max_pages = max_pages or config.BROWSER_MAX_PAGES
+        self.max_uses = max_uses or config.BROWSER_MAX_USES
+        self.max_rss_mb = config.BROWSER_MAX_RSS_MB if max_rss_mb is None else max_rss_mb
+        self.cdp_endpoint = config.BROWSER_CDP_ENDPOINT if cdp_endpoint is None else cdp_endpoint
+        self.launches = 0
+
+        self._playwright: Optional[Playwright] = None
+        self._current: Optional[_BrowserSlot] = None
+        self._slots: Set[_BrowserSlot] = set()
+        self._semaphore = asyncio.Semaphore(self.max_pages)
+        self._lock = asyncio.Lock()
+        self._closed = False
+
+    @property
+    def active_pages(self) -> int:
+        """Number of pages currently checked out."""
+        return sum(slot.active for slot in self._slots)
+
+    async def start(self):
+        """Start the Playwright driver and launch the first browser."""
+        async with self._lock:
+            if self._current is None:
+                self._current = await self._launch()
+
+    async def close(self):
+        """Close every browser and stop the Playwright driver."""
+        self._closed = True
+        async with self._lock:
+            for slot in list(self._slots):
+                await self._close_browser(slot)
+            self._current = None
+            if self._playwright:
+                await self._playwright.stop()
+                self._playwright = None
+
+    @asynccontextmanager
+    async def page(self) -> AsyncIterator[Page]:
+        """
+        Check out a fresh page in an isolated browser context.
+
+        Blocks while ``max_pages`` pages are already in use.
+        """
+        if self._closed:
+            raise RuntimeError("Browser pool is closed")
+
+        async with self._semaphore:
+            slot = await self._acquire_slot()
+            context = None
+            try:
+                context = await slot.browser.new_context()
+                yield await context.new_page()
+            finally:
+                if context:
+                    try:
+                        await context.close()
+                    except Exception as e:
+                        logger.debug(f"Error closing browser context: {e}")
+                await self._release_slot(slot)
+
+    async def _launch(self) -> _BrowserSlot:
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+
+        with span("browser_launch"):
+            if self.cdp_endpoint:
+                browser = await self._playwright.chromium.connect_over_cdp(self.cdp_endpoint)
+            else:
+                browser = await self._playwright.chromium.launch(headless=True)
+        slot = _BrowserSlot(browser)
+        browser.on("disconnected", lambda _: self._on_disconnected(slot))
+        self._slots.add(slot)
+        self.launches += 1
+        BROWSER_LAUNCHES.inc()
+        if self.cdp_endpoint:
+            logger.info(f"Connected to shared Chromium at {self.cdp_endpoint} (connection #{self.launches})")
+        else:
+            logger.info(f"Launched pooled Chromium browser (launch #{self.launches})")
+        return slot
+
+    def _on_disconnected(self, slot: _BrowserSlot):
+        if not slot.retired:
+            logger.warning("Pooled browser disconnected unexpectedly, it will be replaced")
+        slot.retired = True
+        if self._current is slot:
+            self._current = None
+        if slot.active == 0:
+            self._slots.discard(slot)
+
+    def _needs_recycle(self, slot: _BrowserSlot) -> bool:
+        if not slot.browser.is_connected():
+            return True
+        if self.cdp_endpoint:
+            return False
+        if slot.uses >= self.max_uses:
+            logger.info(f"Recycling browser after {slot.uses} pages")
+            return True
+        if self.max_rss_mb:
+            rss_mb = _browser_rss_mb()
+            if rss_mb > self.max_rss_mb:
+                logger.info(f"Recycling browser at {rss_mb:.0f} MB RSS (limit: {self.max_rss_mb} MB)")
+                return True
+        return False
+
+    async def _acquire_slot(self) -> _BrowserSlot:
+        async with self._lock:
+            slot = self._current
+            if slot and self._needs_recycle(slot):
+                await self._retire(slot)
+                slot = None
+            if slot is None:
+                slot = await self._launch()
+                self._current = slot
+            slot.uses += 1
+            slot.active += 1
+            return slot
+
+    async def _release_slot(self, slot: _BrowserSlot):
+        slot.active -= 1
+        if slot.retired and slot.active == 0:
+            async with self._lock:
+                await self._close_browser(slot)
+
+    async def _retire(self, slot: _BrowserSlot):
+        """Stop handing out a browser; close it once its last page is released."""
+        slot.retired = True
+        if self._current is slot:
+            self._current = None
+        if slot.active == 0:
+            await self._close_browser(slot)
+
+    async def _close_browser(self, slot: _BrowserSlot):
+        slot.retired = True
+        self._slots.discard(slot)
+        try:
+            await slot.browser.close()
+        except Exception as e:
+            logger.debug(f"Error closing browser: {e}")
@@ -0,0 +1,127 @@
+"""
+One Chromium shared by every server worker, reachable over the DevTools protocol.
+
+Run standalone (``python browser_server.py --port 9222``) or let
+gunicorn_conf.py start it in shared mode. Workers connect with
+``BROWSER_CDP_ENDPOINT=http://127.0.0.1:9222`` and only create browser
+contexts, so adding workers does not add Chromium processes.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import subprocess
+import sys
+from typing import Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Wait between relaunch attempts, doubled after each failed launch
+RELAUNCH_DELAY_SECONDS = 1.0
+MAX_RELAUNCH_DELAY_SECONDS = 30.0
+
+async def _pause(stop: asyncio.Event, seconds: float):
+    """Sleep, but wake up as soon as the server is asked to stop."""
+    try:
+        await asyncio.wait_for(stop.wait(), timeout=seconds)
+    except asyncio.TimeoutError:
+        pass
+
+async def serve(port: int, host: str = "127.0.0.1"):
+    """
+    Keep a headless Chromium listening for DevTools connections until SIGTERM.
+
+    The browser is launched through Playwright (same binary and flags as
+    BrowserPool) with a remote debugging port added, and relaunched on the
+    same port whenever it exits, so workers only need to reconnect.
+
+    Args:
+        port: DevTools port to listen on
+        host: Interface to bind; keep it local, the port grants full browser control
+    """
+    from playwright.async_api import async_playwright
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows
+            pass
+
+    delay = RELAUNCH_DELAY_SECONDS
+    async with async_playwright() as playwright:
+        while not stop.is_set():
+            try:
+                browser = await playwright.chromium.launch(
+                    headless=True,
+                    args=[f"--remote-debugging-port={port}", f"--remote-debugging-address={host}"]
+                )
+            except Exception as e:
+                logger.error(f"Could not launch shared Chromium, retrying in {delay:.0f}s: {e}")
+                await _pause(stop, delay)
+                delay = min(delay * 2, MAX_RELAUNCH_DELAY_SECONDS)
+                continue
+            delay = RELAUNCH_DELAY_SECONDS
+
+            disconnected = asyncio.Event()
+            browser.on("disconnected", lambda _: disconnected.set())
+            logger.info(f"Shared Chromium {browser.version} listening on http://{host}:{port}")
+
+            waiters = [asyncio.create_task(stop.wait()), asyncio.create_task(disconnected.wait())]
+            await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+            for waiter in waiters:
+                waiter.cancel()
+
+            if stop.is_set():
+                await browser.close()
+                break
+            logger.warning("Shared Chromium exited, relaunching")
+            await _pause(stop, delay)
+
+    logger.info("Shared Chromium stopped")
+
+class BrowserServerProcess:
+    """Run ``serve`` in a child process, e.g. from the gunicorn master."""
+
+    def __init__(self, port: Optional[int] = None):
+        self.port = port or config.BROWSER_SERVER_PORT
+        self._process: Optional[subprocess.Popen] = None
+
+    @property
+    def endpoint(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self):
+        # Own session, so a Ctrl-C aimed at the server does not kill the browser before the workers stop
+        self._process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--port", str(self.port)],
+            start_new_session=True
+        )
+        logger.info(f"Started shared browser server (pid {self._process.pid}) at {self.endpoint}")
+
+    def stop(self, timeout: float = 10.0):
+        if self._process is None or self._process.poll() is not None:
+            return
+        self._process.terminate()
+        try:
+            self._process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            logger.warning("Shared browser server did not stop, killing it")
+            self._process.kill()
+            self._process.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a headless Chromium shared by all server workers")
+    parser.add_argument("--port", type=int, default=config.BROWSER_SERVER_PORT, help="DevTools port")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    asyncio.run(serve(args.port, args.host))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+"""Thread-safe chart rendering: object-oriented matplotlib on Agg, a persistent plotly renderer and a result cache."""
+import asyncio
+import hashlib
+import io
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+import config
+from answer_encoder import base64_size, to_data_uri
+
+logger = logging.getLogger(__name__)
+
+CHART_KINDS = ("bar", "barh", "line", "scatter", "pie", "hist")
+ENGINE_MATPLOTLIB = "matplotlib"
+ENGINE_PLOTLY = "plotly"
+
+_MIME_TYPES = {
+    "png": "image/png",
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+    "svg": "image/svg+xml",
+}
+
+class ChartError(Exception):
+    """Raised when a chart cannot be drawn from the given data and spec."""
+    pass
+
+@dataclass(frozen=True)
+class ChartPreset:
+    """Figure size in inches, resolution and output format."""
+    width: float
+    height: float
+    dpi: int
+    format: str = "png"
+
+    @property
+    def pixels(self) -> Tuple[int, int]:
+        return int(self.width * self.dpi), int(self.height * self.dpi)
+
+# Largest first; when an image comes out over CHART_MAX_BYTES the next smaller preset is tried
+PRESETS: Dict[str, ChartPreset] = {
+    "large": ChartPreset(10, 6, 150),  # What create_chart produced before presets, and the default
+    "medium": ChartPreset(8, 5, 100),
+    "small": ChartPreset(6, 4, 80),
+    "thumbnail": ChartPreset(4, 3, 60),
+}
+
+@dataclass(frozen=True)
+class ChartSpec:
+    """Everything besides the data that determines the rendered image."""
+    kind: str = "bar"
+    x: Optional[str] = None
+    y: Optional[Tuple[str, ...]] = None
+    title: str = "Chart"
+    preset: str = "large"
+    format: Optional[str] = None
+    engine: str = ENGINE_MATPLOTLIB
+
+def data_fingerprint(data: pd.DataFrame) -> str:
+    """Content hash of a DataFrame (values, index, column names and dtypes)."""
+    digest = hashlib.sha256()
+    digest.update(repr([(str(c), str(t)) for c, t in data.dtypes.items()]).encode("utf-8"))
+    try:
+        digest.update(pd.util.hash_pandas_object(data, index=True).values.tobytes())
+    except TypeError:
+        # Unhashable cells (lists, dicts); slower but still content-based
+        digest.update(data.to_csv().encode("utf-8"))
+    return digest.hexdigest()
+
+def _series(data: pd.DataFrame, spec: ChartSpec) -> Tuple[Any, List[str]]:
+    """The x values and the y columns to draw, defaulting like DataFrame.plot."""
+    for column in ([spec.x] if spec.x else []) + list(spec.y or ()):
+        if column not in data.columns:
+            raise ChartError(f"No column {column!r} (columns: {', '.join(map(str, data.columns))})")
+    x = data[spec.x] if spec.x else data.index
+    if spec.y:
+        return x, list(spec.y)
+    numeric = [c for c in data.select_dtypes("number").columns if c != spec.x]
+    if not numeric:
+        raise ChartError("No numeric columns to plot")
+    return x, numeric
+
+def _draw(figure: Figure, data: pd.DataFrame, spec: ChartSpec):
+    """Draw on a figure with the Axes API only; nothing touches pyplot's global state."""
+    ax = figure.add_subplot()
+    x, columns = _series(data, spec)
+    labels = [str(value) for value in x]
+
+    if spec.kind in ("bar", "barh"):
+        width = 0.8 / len(columns)
+        positions = range(len(data))
+        draw = ax.bar if spec.kind == "bar" else ax.barh
+        for i, column in enumerate(columns):
+            draw([p - 0.4 + width * (i + 0.5) for p in positions], data[column], width, label=str(column))
+        if spec.kind == "bar":
+            ax.set_xticks(list(positions), labels, rotation=90 if len(labels) > 12 else 0)
+        else:
+            ax.set_yticks(list(positions), labels)
+    elif spec.kind == "line":
+        for column in columns:
+            ax.plot(x, data[column], label=str(column))
+    elif spec.kind == "scatter":
+        if not spec.x:
+            raise ChartError("A scatter chart needs an x column")
+        for column in columns:
+            ax.scatter(x, data[column], label=str(column), s=12)
+    elif spec.kind == "pie":
+        ax.pie(data[columns[0]], labels=labels, autopct="%1.1f%%")
+        ax.set_aspect("equal")
+    elif spec.kind == "hist":
+        for column in columns:
+            ax.hist(data[column].dropna(), bins="auto", alpha=0.7 if len(columns) > 1 else 1.0, label=str(column))
+    else:
+        raise ChartError(f"Unknown chart type {spec.kind!r} (one of {', '.join(CHART_KINDS)})")
+
+    if spec.kind not in ("pie", "hist"):
+        category_label, value_label = (ax.set_ylabel, ax.set_xlabel) if spec.kind == "barh" else (ax.set_xlabel, ax.set_ylabel)
+        if spec.x:
+            category_label(spec.x)
+        if len(columns) == 1:
+            value_label(str(columns[0]))
+    if len(columns) > 1:
+        ax.legend()
+    ax.set_title(spec.title)
+
+def _engine_missing(error: Exception) -> bool:
+    """Whether a plotly export error means kaleido (or the browser it drives) is not installed."""
+    if isinstance(error, ImportError):
+        return True
+    message = str(error).lower()
+    return "kaleido" in message or "chrome" in message or "chromium" in message
+
+def _render_matplotlib(data: pd.DataFrame, spec: ChartSpec, preset: ChartPreset) -> bytes:
+    figure = Figure(figsize=(preset.width, preset.height), dpi=preset.dpi, layout="tight")
+    # Each figure gets its own Agg canvas, so figures can be rendered from several threads
+    FigureCanvasAgg(figure)
+    _draw(figure, data, spec)
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format=preset.format, dpi=preset.dpi)
+    return buffer.getvalue()
+
+class _PlotlyRenderer:
+    """
+    plotly's static image export, with kaleido's browser kept running.
+
+    Kaleido 1.x starts a headless Chromium per ``to_image`` call unless a
+    sync server is running; it is started once, on first use, and stopped
+    with ``close``.
+    """
+
+    def __init__(self):
+        self._started = False
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            try:
+                import kaleido
+                start = getattr(kaleido, "start_sync_server", None)
+                if start is not None:
+                    start()
+                    logger.info("Started persistent kaleido renderer")
+            except Exception as e:
+                logger.warning(f"Could not start persistent kaleido renderer, rendering per call: {e}")
+
+    def render(self, data: pd.DataFrame, spec: ChartSpec, preset: ChartPreset) -> bytes:
+        import plotly.graph_objects as go
+        import plotly.io as pio
+
+        self._start()
+        x, columns = _series(data, spec)
+        if spec.kind == "line":
+            traces = [go.Scatter(x=x, y=data[c], mode="lines", name=str(c)) for c in columns]
+        elif spec.kind == "scatter":
+            traces = [go.Scatter(x=x, y=data[c], mode="markers", name=str(c)) for c in columns]
+        elif spec.kind == "pie":
+            traces = [go.Pie(labels=x, values=data[columns[0]])]
+        elif spec.kind == "hist":
+            traces = [go.Histogram(x=data[c], name=str(c)) for c in columns]
+        elif spec.kind == "barh":
+            traces = [go.Bar(x=data[c], y=x, orientation="h", name=str(c)) for c in columns]
+        else:
+            traces = [go.Bar(x=x, y=data[c], name=str(c)) for c in columns]
+        fig = go.Figure(data=traces)
+        fig.update_layout(title=spec.title)
+        width, height = preset.pixels
+        return pio.to_image(fig, format=preset.format, width=width, height=height)
+
+    def close(self):
+        with self._lock:
+            if not self._started:
+                return
+            self._started = False
+            try:
+                import kaleido
+                stop = getattr(kaleido, "stop_sync_server", None)
+                if stop is not None:
+                    stop()
+            except Exception as e:
+                logger.debug(f"Stopping kaleido renderer failed: {e}")
+
+class ChartRenderer:
+    """
+    Render charts to base64 data URIs off the caller's thread.
+
+    Matplotlib charts are drawn with the object-oriented Figure API on an
+    Agg canvas per figure, so renders can run concurrently in the thread
+    pool (``submit`` / ``render_async``) without pyplot's global state.
+    Plotly charts go through one persistent kaleido renderer and fall
+    back to matplotlib when kaleido is not installed.
+
+    Results are cached by (data hash, spec). Images whose data URI is
+    longer than ``max_bytes`` are re-rendered with the next smaller preset,
+    so a chart answer stays under the submission size limit.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        cache_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None
+    ):
+        self.cache_entries = cache_entries or config.CHART_CACHE_ENTRIES
+        self.max_bytes = max_bytes or config.CHART_MAX_BYTES
+        self.hits = 0
+        self.misses = 0
+        self.downsized = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers or config.CHART_WORKERS, thread_name_prefix="chart")
+        self._cache: "OrderedDict[Tuple[str, ChartSpec], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._plotly = _PlotlyRenderer()
+        # Set once plotly export has failed, so later plotly charts skip straight to matplotlib
+        self._plotly_unavailable = False
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache hit/miss counters and how many charts had to be shrunk."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "cached": len(self._cache),
+            "downsized": self.downsized
+        }
+
+    def render(
+        self,
+        data: pd.DataFrame,
+        kind: str = "bar",
+        x: Optional[str] = None,
+        y: Optional[Sequence[str]] = None,
+        title: str = "Chart",
+        preset: Optional[str] = None,
+        format: Optional[str] = None,
+        engine: str = ENGINE_MATPLOTLIB
+    ) -> str:
+        """
+        Render a chart in the calling thread.
+
+        Args:
+            data: DataFrame with data to plot
+            kind: bar, barh, line, scatter, pie or hist
+            x: Column for the x-axis (pie labels); the index if omitted
+            y: Column or columns to plot; all numeric columns if omitted
+            title: Chart title
+            preset: large, medium, small or thumbnail
+            format: png, jpeg, webp or svg (overrides the preset's)
+            engine: matplotlib or plotly
+
+        Returns:
+            A ``data:image/...;base64,`` URI
+
+        Raises:
+            ChartError: If the data or spec cannot be drawn
+        """
+        if isinstance(y, str):
+            y = (y,)
+        spec = ChartSpec(
+            kind=kind,
+            x=x,
+            y=tuple(y) if y else None,
+            title=title,
+            preset=preset or config.CHART_DEFAULT_PRESET,
+            format=format,
+            engine=engine
+        )
+        return self.render_spec(data, spec)
+
+    def render_spec(self, data: pd.DataFrame, spec: ChartSpec) -> str:
+        """Render a ChartSpec, serving repeats from the cache."""
+        if spec.preset not in PRESETS:
+            raise ChartError(f"Unknown preset {spec.preset!r} (one of {', '.join(PRESETS)})")
+        if spec.format is not None and spec.format not in _MIME_TYPES:
+            raise ChartError(f"Unknown format {spec.format!r} (one of {', '.join(_MIME_TYPES)})")
+        if spec.engine not in (ENGINE_MATPLOTLIB, ENGINE_PLOTLY):
+            raise ChartError(f"Unknown engine {spec.engine!r}")
+        if data.empty:
+            raise ChartError("Empty dataframe, cannot create chart")
+
+        key = (data_fingerprint(data), spec)
+        with self._lock:
+            uri = self._cache.get(key)
+            if uri is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return uri
+            self.misses += 1
+
+        uri = self._render_within_limit(data, spec)
+        with self._lock:
+            self._cache[key] = uri
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+        return uri
+
+    def submit(self, data: pd.DataFrame, **kwargs: Any) -> "Future[str]":
+        """Render in the worker pool; takes the same arguments as ``render``."""
+        return self._executor.submit(self.render, data, **kwargs)
+
+    async def render_async(self, data: pd.DataFrame, **kwargs: Any) -> str:
+        """Render in the worker pool without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(data, **kwargs))
+
+    def render_many(self, charts: Sequence[Dict[str, Any]]) -> List[str]:
+        """Render several charts concurrently; each dict holds ``data`` plus ``render`` arguments."""
+        futures = [self.submit(**chart) for chart in charts]
+        return [future.result() for future in futures]
+
+    def close(self):
+        """Stop the worker threads and the persistent plotly renderer."""
+        self._executor.shutdown(wait=True)
+        self._plotly.close()
+
+    def _render_within_limit(self, data: pd.DataFrame, spec: ChartSpec) -> str:
+        names = list(PRESETS)
+        size = 0
+        for name in names[names.index(spec.preset):]:
+            preset = PRESETS[name]
+            if spec.format:
+                preset = replace(preset, format=spec.format)
+            image = self._render_bytes(data, spec, preset)
+            mime = _MIME_TYPES[preset.format]
+            # Sized before encoding, so an oversized image is never base64-encoded
+            size = len(f"data:{mime};base64,") + base64_size(len(image))
+            if size <= self.max_bytes:
+                return to_data_uri(image, mime)
+            logger.info(f"{spec.kind} chart at preset {name} is {size:,} bytes, trying a smaller one")
+            self.downsized += 1
+        raise ChartError(f"Chart is {size:,} bytes even at the smallest preset (limit {self.max_bytes:,})")
+
+    def _render_bytes(self, data: pd.DataFrame, spec: ChartSpec, preset: ChartPreset) -> bytes:
+        if spec.engine == ENGINE_PLOTLY and not self._plotly_unavailable:
+            try:
+                return self._plotly.render(data, spec, preset)
+            except (ImportError, ValueError, RuntimeError) as e:
+                if _engine_missing(e):
+                    logger.warning(f"Plotly image export unavailable, drawing with matplotlib: {str(e).strip()}")
+                    self._plotly_unavailable = True
+                else:
+                    # Bad data for this chart only; later charts still try plotly
+                    logger.warning(f"Plotly could not draw this chart, drawing with matplotlib: {str(e).strip()}")
+        return _render_matplotlib(data, spec, preset)
+
+_renderer: Optional[ChartRenderer] = None
+_renderer_lock = threading.Lock()
+
+def get_renderer() -> ChartRenderer:
+    """This process's shared renderer (and its worker threads)."""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = ChartRenderer()
+        return _renderer
@@ -0,0 +1,82 @@
+"""
+Import-time budget check for the API server.
+
+Imports ``app`` in fresh interpreters and fails if the cold import takes
+longer or uses more memory than the budget, or if a library that
+data_processor loads lazily was imported eagerly. Run it in CI or before
+deploying to catch a slow gunicorn worker boot early.
+
+Usage:
+    python check_startup.py --max-seconds 1.5 --max-rss-mb 150
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+# Runs in the child interpreter; prints one JSON line
+_PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+print(json.dumps({{
+    "seconds": seconds,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+    "modules": sorted(sys.modules),
+}}))
+"""
+
+def probe(module: str) -> Dict[str, Any]:
+    """Import a module in a new interpreter and report its cost."""
+    env = dict(os.environ)
+    # Importing does not validate these, but keep the probe independent of the shell
+    for name in ("STUDENT_EMAIL", "STUDENT_SECRET", "GOOGLE_API_KEY"):
+        env.setdefault(name, "startup-check")
+    result = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", _PROBE.format(module=module)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the cold import time and memory of the API server")
+    parser.add_argument("--module", default="app", help="Module to import")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters to average over")
+    parser.add_argument("--max-seconds", type=float, default=1.5, help="Budget for the median import time")
+    parser.add_argument("--max-rss-mb", type=float, default=150, help="Budget for peak RSS after import")
+    args = parser.parse_args()
+
+    from data_processor import HEAVY_MODULES
+
+    runs: List[Dict[str, Any]] = [probe(args.module) for _ in range(max(1, args.runs))]
+    seconds = statistics.median(run["seconds"] for run in runs)
+    rss_mb = max(run["rss_mb"] for run in runs)
+    eager = [name for name in HEAVY_MODULES if name in runs[0]["modules"]]
+
+    print(f"import {args.module}: {seconds:.3f}s median of {len(runs)} (budget {args.max_seconds}s)")
+    print(f"peak RSS: {rss_mb:.0f} MB (budget {args.max_rss_mb:.0f} MB)")
+    print(f"lazy libraries imported eagerly: {', '.join(eager) or 'none'}")
+
+    failures = []
+    if seconds > args.max_seconds:
+        failures.append("import time over budget")
+    if rss_mb > args.max_rss_mb:
+        failures.append("memory over budget")
+    if eager:
+        failures.append("lazy libraries imported at startup")
+    if failures:
+        print(f"FAILED: {'; '.join(failures)}")
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    main()
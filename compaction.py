@@ -0,0 +1,252 @@
+"""Turn rendered quiz HTML into compact, ranked text that fits an LLM prompt budget."""
+import logging
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup, Comment, NavigableString, Tag
+
+logger = logging.getLogger(__name__)
+
+# Never useful in a prompt
+_SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "canvas", "head", "meta", "link", "iframe"}
+# Tags that start a new block of text
+_BLOCK_TAGS = {
+    "p", "div", "section", "article", "main", "header", "footer", "nav", "aside", "form",
+    "h1", "h2", "h3", "h4", "h5", "h6", "li", "ul", "ol", "dl", "dt", "dd", "pre",
+    "blockquote", "br", "hr", "body", "html", "fieldset", "figure", "figcaption", "label"
+}
+_HEADINGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+_BOILERPLATE = {"nav", "footer", "aside"}
+
+_HIDDEN_STYLE = re.compile(r"display\s*:\s*none|visibility\s*:\s*hidden|opacity\s*:\s*0(\.0*)?\s*(;|$)", re.I)
+_HIDDEN_CLASSES = {"hidden", "d-none", "sr-only", "visually-hidden", "invisible"}
+_DATA_FILE = re.compile(r"\.(csv|tsv|json|xlsx?|pdf|txt|parquet|zip|xml|mp3|wav|ogg|png|jpe?g|gif)(\?|#|$)", re.I)
+_KEYWORDS = re.compile(
+    r"\b(question|answer|submit|post|download|scrape|secret|code|sum|count|total|average|mean|"
+    r"calculate|compute|find|what|how many|json|url|email)\b",
+    re.I
+)
+
+# Table rows kept when a single table does not fit the remaining budget
+_MIN_TABLE_ROWS = 5
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)."""
+    return (len(text) + 3) // 4
+
+@dataclass
+class _Block:
+    text: str
+    order: int
+    score: float
+    kind: str = "text"
+
+@dataclass
+class CompactedPage:
+    """Prompt-ready text plus how much it shrank."""
+    text: str
+    input_chars: int
+    output_chars: int
+    output_tokens: int
+    kept_blocks: int
+    dropped_blocks: int
+
+    @property
+    def ratio(self) -> float:
+        """Output size as a fraction of the input."""
+        return self.output_chars / self.input_chars if self.input_chars else 1.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.input_chars:,} -> {self.output_chars:,} chars (~{self.output_tokens:,} tokens, "
+            f"{self.kept_blocks} blocks kept, {self.dropped_blocks} dropped)"
+        )
+
+class PageDigest:
+    """
+    Rendered quiz page parsed once into ranked text blocks.
+
+    Scripts and styles are dropped. Hidden elements and HTML comments are
+    kept (quizzes often hide the data there) and marked as such, links are
+    written as ``[text](absolute url)`` and tables as ``|``-separated rows.
+    Each block gets a relevance score: the ``#result`` element, headings,
+    question keywords, data-file links, hidden content and tables rank up;
+    navigation and footers rank down.
+
+    ``compact(max_tokens)`` then keeps the best blocks that fit the budget
+    and returns them in document order, so the same parse can feed prompts
+    with different budgets.
+    """
+
+    def __init__(self, html: str, base_url: Optional[str] = None):
+        self.input_chars = len(html)
+        self.base_url = base_url
+        self.blocks: List[_Block] = []
+
+        self._buffer: List[str] = []
+        self._buffer_boost = 0.0
+        # Kept for other rule-based passes over the same parse
+        self.soup = BeautifulSoup(html, "html.parser")
+        self._walk(self.soup, hidden=False, boost=0.0)
+        self._flush()
+        self.blocks = self._dedupe(self.blocks)
+
+    def compact(self, max_tokens: int) -> CompactedPage:
+        """
+        Select the most relevant blocks that fit ``max_tokens``.
+
+        Args:
+            max_tokens: Token budget for the returned text
+
+        Returns:
+            The compacted text and size statistics
+        """
+        budget = max_tokens
+        kept: List[_Block] = []
+        for block in sorted(self.blocks, key=lambda b: (-b.score, b.order)):
+            cost = estimate_tokens(block.text) + 1
+            if cost <= budget:
+                kept.append(block)
+                budget -= cost
+            elif block.kind == "table" and budget > 50:
+                # Keep the header and first rows of a table that does not fit
+                rows = block.text.split("\n")
+                partial = rows[:_MIN_TABLE_ROWS]
+                for row in rows[_MIN_TABLE_ROWS:]:
+                    if estimate_tokens("\n".join(partial + [row])) + 20 > budget:
+                        break
+                    partial.append(row)
+                text = "\n".join(partial) + f"\n... ({len(rows) - len(partial)} more rows)"
+                if estimate_tokens(text) + 1 <= budget:
+                    kept.append(_Block(text, block.order, block.score, block.kind))
+                    budget -= estimate_tokens(text) + 1
+            elif not kept and budget > 0:
+                # Never return nothing: truncate the single most relevant block
+                kept.append(_Block(block.text[:budget * 4], block.order, block.score, block.kind))
+                budget = 0
+
+        text = "\n".join(block.text for block in sorted(kept, key=lambda b: b.order))
+        return CompactedPage(
+            text=text,
+            input_chars=self.input_chars,
+            output_chars=len(text),
+            output_tokens=estimate_tokens(text),
+            kept_blocks=len(kept),
+            dropped_blocks=len(self.blocks) - len(kept)
+        )
+
+    def _walk(self, node: Tag, hidden: bool, boost: float):
+        for child in node.children:
+            if isinstance(child, Comment):
+                text = " ".join(child.split())
+                if text:
+                    self._add(f"[comment] {text}", boost + 3, "comment")
+            elif type(child) is NavigableString:
+                # Subclasses are markup rather than text: doctype, CDATA, processing
+                # instructions, and script/style contents under some parsers
+                text = " ".join(child.split())
+                if text:
+                    self._buffer.append(text)
+                    self._buffer_boost = max(self._buffer_boost, boost)
+            elif isinstance(child, Tag):
+                self._visit(child, hidden, boost)
+
+    def _visit(self, tag: Tag, hidden: bool, boost: float):
+        name = tag.name
+        if name in _SKIP_TAGS:
+            return
+
+        child_hidden = hidden or self._is_hidden(tag)
+        child_boost = boost
+        if tag.get("id") == "result":
+            child_boost += 10
+        if name in _BOILERPLATE:
+            child_boost -= 3
+        if child_hidden and not hidden:
+            child_boost += 3
+
+        if name == "a":
+            href = tag.get("href")
+            text = " ".join(tag.get_text(" ").split())
+            if href and not href.startswith(("javascript:", "#")):
+                url = self._absolute(href)
+                self._buffer.append(f"[{text or url}]({url})")
+                link_boost = 2 + (3 if _DATA_FILE.search(href) else 0)
+                self._buffer_boost = max(self._buffer_boost, child_boost + link_boost)
+            elif text:
+                self._buffer.append(text)
+            return
+        if name in ("img", "audio", "video", "source", "embed"):
+            src = tag.get("src")
+            if src:
+                alt = tag.get("alt") or name
+                self._buffer.append(f"[{name}: {alt}]({self._absolute(src)})")
+                self._buffer_boost = max(self._buffer_boost, child_boost + 2)
+            else:
+                self._walk(tag, child_hidden, child_boost)
+            return
+        if name in ("input", "textarea", "select"):
+            value = tag.get("value") or tag.get_text(" ", strip=True)
+            field = tag.get("name") or tag.get("id") or name
+            if tag.get("type") == "hidden" or value:
+                label = "hidden input" if tag.get("type") == "hidden" else name
+                self._buffer.append(f"[{label} {field}={value}]")
+                bonus = 3 if tag.get("type") == "hidden" else 0
+                self._buffer_boost = max(self._buffer_boost, child_boost + bonus)
+            return
+        if name == "table":
+            self._flush()
+            rows = []
+            for tr in tag.find_all("tr"):
+                cells = [" ".join(cell.get_text(" ").split()) for cell in tr.find_all(["th", "td"])]
+                if any(cells):
+                    rows.append(" | ".join(cells))
+            if rows:
+                prefix = "[hidden] " if child_hidden else ""
+                self._add(prefix + "\n".join(rows), child_boost + 2, "table")
+            return
+
+        # Hidden inline elements get their own block so they can be marked
+        is_block = name in _BLOCK_TAGS or (child_hidden and not hidden)
+        if is_block:
+            self._flush()
+        self._walk(tag, child_hidden, child_boost)
+        if is_block:
+            self._flush(
+                prefix="[hidden] " if child_hidden and not hidden else "",
+                extra=2 if name in _HEADINGS else 0
+            )
+
+    def _flush(self, prefix: str = "", extra: float = 0.0):
+        if self._buffer:
+            self._add(prefix + " ".join(self._buffer), self._buffer_boost + extra)
+        self._buffer = []
+        self._buffer_boost = 0.0
+
+    def _add(self, text: str, boost: float, kind: str = "text"):
+        if len(text.strip()) < 2:
+            return
+        score = boost + min(len(_KEYWORDS.findall(text)), 5)
+        self.blocks.append(_Block(text, len(self.blocks), score, kind))
+
+    def _absolute(self, url: str) -> str:
+        return urljoin(self.base_url, url) if self.base_url else url
+
+    @staticmethod
+    def _is_hidden(tag: Tag) -> bool:
+        if tag.has_attr("hidden") or tag.get("aria-hidden") == "true":
+            return True
+        if _HIDDEN_STYLE.search(tag.get("style") or ""):
+            return True
+        return bool(_HIDDEN_CLASSES.intersection(tag.get("class") or []))
+
+    @staticmethod
+    def _dedupe(blocks: List[_Block]) -> List[_Block]:
+        seen = {}
+        for block in blocks:
+            existing = seen.get(block.text)
+            if existing is None or block.score > existing.score:
+                seen[block.text] = block
+        return sorted(seen.values(), key=lambda b: b.order)
@@ -1,5 +1,6 @@
 """Configuration management for the LLM Analysis Quiz application."""
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -17,6 +18,7 @@ GEMINI_MODEL = "gemini-2.5-flash"
 # Server Configuration
 HOST = os.getenv("HOST", "0.0.0.0")
 PORT = int(os.getenv("PORT", "8000"))
+WARMUP_IMPORTS = os.getenv("WARMUP_IMPORTS", "false").lower() == "true"  # Import pandas/pypdf/plotting in the background at startup
 
 # Prompt Engineering (max 100 chars each)
 SYSTEM_PROMPT = os.getenv(
@@ -33,6 +35,126 @@ USER_PROMPT = os.getenv(
 QUIZ_TIMEOUT_SECONDS = 180  # 3 minutes
 BROWSER_TIMEOUT_MS = 30000  # 30 seconds for page loads
 MAX_RETRIES = 3  # Maximum retries for wrong answers
+SUBMIT_MAX_BYTES = int(os.getenv("SUBMIT_MAX_BYTES", "1000000"))  # Answer payload limit (1MB per problem statement)
+ANSWER_MIN_IMAGE_SIDE = int(os.getenv("ANSWER_MIN_IMAGE_SIDE", "64"))  # Image answers are not downscaled below this
+
+# Deadline Budgeting (seconds of the quiz time limit)
+SUBMIT_RESERVE_SECONDS = float(os.getenv("SUBMIT_RESERVE_SECONDS", "8"))  # Always kept for submission
+SKIP_BROWSER_BELOW_SECONDS = float(os.getenv("SKIP_BROWSER_BELOW_SECONDS", "45"))  # Use HTTPX only below this
+DIRECT_ANSWER_BELOW_SECONDS = float(os.getenv("DIRECT_ANSWER_BELOW_SECONDS", "25"))  # Skip code generation below this
+
+# Prompt Compaction Configuration (page text sent to the LLM, in estimated tokens)
+EXTRACTION_CONTEXT_TOKENS = int(os.getenv("EXTRACTION_CONTEXT_TOKENS", "1500"))  # Quiz info extraction
+CODEGEN_CONTEXT_TOKENS = int(os.getenv("CODEGEN_CONTEXT_TOKENS", "3000"))  # Code generation
+
+# Fast-Path Extraction Configuration
+FAST_EXTRACT_MIN_CONFIDENCE = float(os.getenv("FAST_EXTRACT_MIN_CONFIDENCE", "0.8"))  # Skip the LLM at or above this, >1 disables
+
+# Candidate Voting Configuration
+CODEGEN_CANDIDATES = int(os.getenv("CODEGEN_CANDIDATES", "1"))  # Programs generated and run per quiz, capped at SANDBOX_WORKERS
+CODEGEN_QUORUM = int(os.getenv("CODEGEN_QUORUM", "0"))  # Agreeing answers that end the vote early, 0 means majority
+CODEGEN_TEMPERATURE_STEP = float(os.getenv("CODEGEN_TEMPERATURE_STEP", "0.3"))  # Added per candidate to the base 0.2
+
+# Job Scheduler Configuration
+JOB_MAX_CONCURRENCY = int(os.getenv("JOB_MAX_CONCURRENCY", "2"))  # Quiz chains solved at once
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "8"))  # Chains waiting before 503
+JOB_RETRY_AFTER_SECONDS = int(os.getenv("JOB_RETRY_AFTER_SECONDS", "30"))  # Retry-After on 503
+JOB_DRAIN_TIMEOUT_SECONDS = float(os.getenv("JOB_DRAIN_TIMEOUT_SECONDS", "25"))  # Grace period on shutdown
+
+# Job Store Configuration
+JOB_STORE_SIZE = int(os.getenv("JOB_STORE_SIZE", "500"))  # Jobs kept in memory
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "")  # SQLite file shared by all workers, empty keeps jobs per process
+DEDUP_TTL_SECONDS = float(os.getenv("DEDUP_TTL_SECONDS", "0"))  # Reuse completed chains for the same URL this long
+DEDUP_INFLIGHT_SECONDS = float(os.getenv("DEDUP_INFLIGHT_SECONDS", "900"))  # Older queued/running jobs in SQLite are orphans
+
+# HTTP Client Configuration
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "30"))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "10"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))  # Across all hosts
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))  # Idle connections kept open
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "60"))
+HTTP_MAX_HOSTS = int(os.getenv("HTTP_MAX_HOSTS", "10"))  # Per-host pools in the sync session
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "10"))
+
+# LLM Client Configuration
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))  # Per-call timeout
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))  # In-flight Gemini calls per worker
+
+# Sandbox Configuration
+SANDBOX_WORKERS = int(os.getenv("SANDBOX_WORKERS", "1"))  # Pre-warmed exec processes per worker; raise with CODEGEN_CANDIDATES so candidates run in parallel
+SANDBOX_MEMORY_MB = int(os.getenv("SANDBOX_MEMORY_MB", "384"))  # Address-space cap (pandas/numpy take ~170), 0 disables
+SANDBOX_TIMEOUT_SECONDS = float(os.getenv("SANDBOX_TIMEOUT_SECONDS", "90"))  # Max wall clock per run
+
+# LLM Cache Configuration
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "256"))  # Entries kept in memory
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))  # 0 keeps entries until evicted
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", "")  # Optional on-disk backend shared across workers
+LLM_CACHE_DISK_MB = int(os.getenv("LLM_CACHE_DISK_MB", "64"))  # Least recently used files are deleted beyond this
+
+# Data Source Prefetch Configuration
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "4"))  # Parallel downloads per quiz
+PREFETCH_MAX_BYTES = int(os.getenv("PREFETCH_MAX_BYTES", str(50 * 1024 * 1024)))  # Larger files are left to the code
+PREFETCH_WAIT_SECONDS = float(os.getenv("PREFETCH_WAIT_SECONDS", "5"))  # Grace period after code generation
+
+# Download Cache Configuration (data files shared by every worker through one directory)
+DOWNLOAD_CACHE_ENABLED = os.getenv("DOWNLOAD_CACHE_ENABLED", "true").lower() == "true"
+DOWNLOAD_CACHE_DIR = os.getenv("DOWNLOAD_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "quiz-download-cache")
+DOWNLOAD_CACHE_MB = int(os.getenv("DOWNLOAD_CACHE_MB", "1024"))  # Least recently used files are evicted beyond this
+DOWNLOAD_CACHE_FRESH_SECONDS = float(os.getenv("DOWNLOAD_CACHE_FRESH_SECONDS", "60"))  # Longest a copy is served without revalidation; Cache-Control/Expires can shorten it
+
+# Data Ingestion Configuration (chunked CSV/JSON reading in data_processor.read_table)
+INGEST_CHUNK_MB = int(os.getenv("INGEST_CHUNK_MB", "32"))  # Target in-memory size of one chunk
+INGEST_SAMPLE_ROWS = int(os.getenv("INGEST_SAMPLE_ROWS", "1000"))  # Rows sampled to plan dtypes
+INGEST_CATEGORY_RATIO = float(os.getenv("INGEST_CATEGORY_RATIO", "0.5"))  # Strings with fewer distinct values become categoricals
+INGEST_MAX_FRAME_MB = int(os.getenv("INGEST_MAX_FRAME_MB", "512"))  # Cap for tables built fully in memory
+INGEST_SPOOL_MB = int(os.getenv("INGEST_SPOOL_MB", "16"))  # Downloads larger than this spill to a temp file
+
+# PDF Configuration
+PDF_CACHE_DOCUMENTS = int(os.getenv("PDF_CACHE_DOCUMENTS", "8"))  # Parsed documents kept per process
+PDF_CACHE_MB = int(os.getenv("PDF_CACHE_MB", "128"))  # Total size of cached PDF files
+PDF_PAGE_TEXT_CHARS = int(os.getenv("PDF_PAGE_TEXT_CHARS", "2000000"))  # Extracted page text memoized per document
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))  # Whole-document reads this long use worker processes
+PDF_PARALLEL_WORKERS = int(os.getenv("PDF_PARALLEL_WORKERS", "2"))  # Extraction processes (~40MB plus the PDF each), capped at the CPU count, 1 disables
+
+# Excel Configuration
+EXCEL_CACHE_WORKBOOKS = int(os.getenv("EXCEL_CACHE_WORKBOOKS", "8"))  # Open workbooks kept per process
+EXCEL_CACHE_MB = int(os.getenv("EXCEL_CACHE_MB", "128"))  # Total size of cached workbook files
+EXCEL_SHEET_CACHE_MB = int(os.getenv("EXCEL_SHEET_CACHE_MB", "256"))  # Parsed sheets kept per workbook
+EXCEL_CHUNK_ROWS = int(os.getenv("EXCEL_CHUNK_ROWS", "50000"))  # Rows converted to a DataFrame at a time
+
+# Chart Configuration
+CHART_WORKERS = int(os.getenv("CHART_WORKERS", "2"))  # Threads rendering charts
+CHART_CACHE_ENTRIES = int(os.getenv("CHART_CACHE_ENTRIES", "64"))  # Rendered charts kept per process
+CHART_MAX_BYTES = int(os.getenv("CHART_MAX_BYTES", "900000"))  # Data URI size cap, under the 1 MB answer limit
+CHART_DEFAULT_PRESET = os.getenv("CHART_DEFAULT_PRESET", "large")  # large (10x6in at 150dpi), medium, small or thumbnail; smaller ones only when over CHART_MAX_BYTES
+
+# Browser Pool Configuration
+BROWSER_MAX_PAGES = int(os.getenv("BROWSER_MAX_PAGES", "2"))  # Concurrent pages per worker
+BROWSER_MAX_USES = int(os.getenv("BROWSER_MAX_USES", "50"))  # Recycle browser after N pages
+BROWSER_MAX_RSS_MB = int(os.getenv("BROWSER_MAX_RSS_MB", "350"))  # Recycle when Chromium grows past this
+BROWSER_CDP_ENDPOINT = os.getenv("BROWSER_CDP_ENDPOINT", "")  # Connect to a shared Chromium (e.g. http://127.0.0.1:9222) instead of launching one
+BROWSER_SERVER_PORT = int(os.getenv("BROWSER_SERVER_PORT", "9222"))  # DevTools port of the shared Chromium started by browser_server.py
+
+# Page Loading Configuration
+BROWSER_BLOCK_RESOURCES = os.getenv("BROWSER_BLOCK_RESOURCES", "true").lower() == "true"  # Abort images, fonts, CSS, media
+BROWSER_BLOCKED_HOSTS = [
+    host.strip() for host in os.getenv(
+        "BROWSER_BLOCKED_HOSTS",
+        "google-analytics.com,googletagmanager.com,doubleclick.net,facebook.net,hotjar.com,segment.io,mixpanel.com"
+    ).split(",") if host.strip()
+]  # Third-party hosts (and their subdomains) that are never loaded
+BROWSER_READY_SELECTOR = os.getenv("BROWSER_READY_SELECTOR", "#result")  # Page is ready once this has text
+BROWSER_DOM_STABLE_MS = int(os.getenv("BROWSER_DOM_STABLE_MS", "500"))  # ...or, without that element, the DOM has been quiet this long
+BROWSER_READY_TIMEOUT_MS = int(os.getenv("BROWSER_READY_TIMEOUT_MS", "10000"))  # Then fall back to the load event
+BROWSER_IDLE_MEASURE_SECONDS = float(os.getenv("BROWSER_IDLE_MEASURE_SECONDS", "0"))  # Keep pages open after reading to time network idle; each holds a pool slot meanwhile, so off by default
+
+# Record/Replay Configuration
+REPLAY_MODE = os.getenv("REPLAY_MODE", "")  # "record" captures traffic and LLM calls, "replay" serves them back
+REPLAY_CASSETTE_DIR = os.getenv("REPLAY_CASSETTE_DIR", "cassettes/default")
+REPLAY_STUB_URL = os.getenv("REPLAY_STUB_URL", "")  # Local stub server that replayed HTTP requests are sent to
+REPLAY_LLM_LATENCY_SCALE = float(os.getenv("REPLAY_LLM_LATENCY_SCALE", "0"))  # Replay recorded LLM latency times this
 
 # Validate required configuration
 def validate_config():
@@ -1,39 +1,72 @@
 """Data processing utilities for various data sources and formats."""
-import base64
+import asyncio
+import hashlib
+import importlib
 import io
 import logging
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Dict, Optional, Union
-import requests
-import httpx
+from typing import IO, TYPE_CHECKING, Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Union
 from bs4 import BeautifulSoup
-import pandas as pd
-from pypdf import PdfReader
-from PIL import Image
-import matplotlib.pyplot as plt
-import plotly.graph_objects as go
-import plotly.io as pio
+
+import config
+from download_cache import CacheEntry, DownloadCache, get_download_cache
+from http_client import HTTPClientManager, get_http_clients
+from metrics import span, timed
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from excel_workbook import Workbook
+    from ingest import TableStream
+    from pdf_document import PdfDocument
 
 logger = logging.getLogger(__name__)
 
+# Imported on first use: the server process only downloads, and importing
+# these at module load costs most of a second and ~70 MB per worker
+HEAVY_MODULES = ("pandas", "ingest", "pdf_document", "excel_workbook", "charts", "plotly.graph_objects", "plotly.io")
+
+def warm_up(modules: Iterable[str] = HEAVY_MODULES):
+    """
+    Import the lazily loaded libraries ahead of their first use.
+    
+    Args:
+        modules: Module names to import; missing ones are logged and skipped
+    """
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.warning(f"Could not pre-import {name}: {e}")
+
 class DataProcessor:
     """Handle various data processing tasks."""
     
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
-        self.async_client = httpx.AsyncClient(headers=self.session.headers, timeout=30.0)
+    def __init__(self, http: Optional[HTTPClientManager] = None, cache: Optional[DownloadCache] = None):
+        # Pooled clients shared with the rest of the process
+        http = http or get_http_clients()
+        self.session = http.session
+        self.async_client = http.async_client
+        # On-disk download cache shared with the other workers; None when disabled
+        self.cache = cache if cache is not None else get_download_cache()
+        # url -> local path of files prefetched while the solution code was generated
+        self.artifacts: Dict[str, str] = {}
 
     async def close(self):
-        """Close async resources."""
-        await self.async_client.aclose()
+        """Release resources (the shared HTTP clients are closed by their manager)."""
+        pass
     
     def download_file(self, url: str, headers: Optional[Dict] = None) -> bytes:
         """
         Download a file from a URL.
         
+        Without custom headers the file goes through the shared download
+        cache: a recent copy is served without a request, an older one is
+        revalidated with a conditional GET.
+        
         Args:
             url: URL to download from
             headers: Optional custom headers
@@ -41,17 +74,248 @@ class DataProcessor:
         Returns:
             File content as bytes
         """
+        artifact = self.artifacts.get(url)
+        if artifact and not headers:
+            try:
+                content = Path(artifact).read_bytes()
+                logger.info(f"Serving {url} from prefetched artifact")
+                return content
+            except FileNotFoundError:
+                logger.warning(f"Prefetched artifact for {url} is gone, downloading again")
+        if self.cache is not None and not headers:
+            entry = self._fetch_cached(url)
+            try:
+                return self.cache.read_bytes(entry)
+            finally:
+                self.cache.release(entry)
+        
         logger.info(f"Downloading file from {url}")
-        response = self.session.get(url, headers=headers or {}, timeout=30)
-        response.raise_for_status()
+        with span("download"):
+            response = self.session.get(url, headers=headers or {}, timeout=30)
+            response.raise_for_status()
         return response.content
 
+    def open_file(self, url: str, headers: Optional[Dict] = None) -> IO[bytes]:
+        """
+        Open a URL as a binary file without holding the whole body in memory.
+        
+        Prefetched artifacts and download cache entries are opened directly;
+        without the cache, downloads are streamed into a temp file that
+        stays in memory up to ``INGEST_SPOOL_MB`` and spills to disk beyond that.
+        
+        Args:
+            url: URL to download from
+            headers: Optional custom headers
+            
+        Returns:
+            A seekable binary file positioned at the start; the caller closes it
+        """
+        artifact = self.artifacts.get(url)
+        if artifact and not headers:
+            try:
+                f = open(artifact, "rb")
+                logger.info(f"Opening prefetched artifact for {url}")
+                return f
+            except FileNotFoundError:
+                logger.warning(f"Prefetched artifact for {url} is gone, downloading again")
+        if self.cache is not None and not headers:
+            entry = self._fetch_cached(url)
+            try:
+                return open(self.cache.path(entry), "rb")
+            finally:
+                # A no-store download is unlinked but stays readable through the open file
+                self.cache.release(entry)
+        
+        logger.info(f"Streaming file from {url}")
+        spool = tempfile.SpooledTemporaryFile(max_size=config.INGEST_SPOOL_MB * 1024 * 1024)
+        try:
+            with span("download"):
+                with self.session.get(url, headers=headers or {}, timeout=30, stream=True) as response:
+                    response.raise_for_status()
+                    for block in response.iter_content(chunk_size=1 << 16):
+                        spool.write(block)
+        except BaseException:
+            spool.close()
+            raise
+        spool.seek(0)
+        return spool
+
+    def map_file(self, url: str) -> mmap.mmap:
+        """
+        Memory-map a downloaded file (read-only) for parsing without copying it.
+        
+        The map works like a binary file (read, seek, slicing) and can be
+        passed to pandas, PdfReader or zipfile. Empty files cannot be mapped
+        and raise ValueError.
+        
+        Args:
+            url: URL to download from
+            
+        Returns:
+            The mapping; the caller closes it
+        """
+        with self.open_file(url) as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _fetch_cached(self, url: str) -> CacheEntry:
+        """Bring a URL's cache entry up to date, downloading only when it changed."""
+        entry = self.cache.lookup(url)
+        if entry is not None and self.cache.is_fresh(entry):
+            self.cache.hit(entry)
+            return entry
+        
+        logger.info(f"Downloading file from {url}" + (" (revalidating cached copy)" if entry else ""))
+        with span("download"):
+            with self.session.get(url, headers=self.cache.conditional_headers(entry), timeout=30, stream=True) as response:
+                if response.status_code == 304 and entry is not None:
+                    return self.cache.revalidated(entry, response.headers)
+                response.raise_for_status()
+                return self.cache.store(url, response.iter_content(chunk_size=1 << 16), response.headers)
+
+    async def _fetch_cached_async(self, url: str) -> CacheEntry:
+        """Async version of _fetch_cached; the body is streamed to disk from a thread."""
+        entry = await asyncio.to_thread(self.cache.lookup, url)
+        if entry is not None and self.cache.is_fresh(entry):
+            await asyncio.to_thread(self.cache.hit, entry)
+            return entry
+        
+        logger.info(f"Downloading file async from {url}" + (" (revalidating cached copy)" if entry else ""))
+        async with self.async_client.stream("GET", url, headers=self.cache.conditional_headers(entry)) as response:
+            if response.status_code == 304 and entry is not None:
+                return await asyncio.to_thread(self.cache.revalidated, entry, response.headers)
+            response.raise_for_status()
+            writer = await asyncio.to_thread(self.cache.writer, url)
+            try:
+                async for chunk in response.aiter_bytes(1 << 20):
+                    await asyncio.to_thread(writer.write, chunk)
+            except BaseException:
+                writer.abort()
+                raise
+        return await asyncio.to_thread(writer.commit, response.headers)
+
+    @contextmanager
+    def _open_source(self, source: Union[bytes, str, BinaryIO]) -> Iterator[BinaryIO]:
+        """Bytes, a URL, a local path or an open binary file, as a readable stream."""
+        if isinstance(source, (bytes, bytearray)):
+            yield io.BytesIO(source)
+        elif isinstance(source, str) and source.startswith(("http://", "https://")):
+            with self.open_file(source) as f:
+                yield f
+        elif isinstance(source, (str, os.PathLike)):
+            with open(source, "rb") as f:
+                yield f
+        else:
+            yield source
+
+    def read_table(
+        self,
+        source: Union[bytes, str, BinaryIO],
+        format: Optional[str] = None,
+        **read_kwargs: Any
+    ) -> "TableStream":
+        """
+        Open CSV, TSV, JSON-lines or JSON-array data for chunked reading.
+        
+        The result reads the data chunk by chunk with compact dtypes
+        (downcast integers, categorical strings) and aggregates without
+        building the whole DataFrame, so files larger than the sandbox's
+        memory can be summed, counted, filtered and grouped. Call
+        ``.to_frame()`` for an ordinary DataFrame of a table that fits.
+        
+        Args:
+            source: URL, local path, bytes or an open binary file
+            format: csv, tsv, jsonl or json; detected from the name or content if omitted
+            read_kwargs: Passed to pandas.read_csv / read_json (e.g. sep, usecols)
+            
+        Returns:
+            A TableStream over the data
+        """
+        from ingest import TableStream, detect_format
+        
+        name = source if isinstance(source, str) else getattr(source, "name", "")
+        if isinstance(source, str) and source.startswith(("http://", "https://")):
+            # Keep the download for every pass over the table; closed with the TableStream's last reference
+            source = self.open_file(source)
+        if format is None:
+            with self._open_source(source) as stream:
+                head = stream.read(4096)
+            format = detect_format(head, str(name))
+        logger.info(f"Reading {format} table in chunks")
+        return TableStream(source, format, read_kwargs)
+
+    @timed("download")
     async def download_file_async(self, url: str, headers: Optional[Dict] = None) -> bytes:
         """Async version of download_file."""
+        if self.cache is not None and not headers:
+            entry = await self._fetch_cached_async(url)
+            try:
+                return await asyncio.to_thread(self.cache.read_bytes, entry)
+            finally:
+                self.cache.release(entry)
+        
         logger.info(f"Downloading file async from {url}")
         response = await self.async_client.get(url, headers=headers or {})
         response.raise_for_status()
         return response.content
+
+    async def prefetch_async(
+        self,
+        urls: List[str],
+        directory: str,
+        results: Optional[Dict[str, str]] = None
+    ) -> Dict[str, str]:
+        """
+        Download several URLs concurrently into a local artifact directory.
+        
+        With the download cache enabled the files are stored (or
+        revalidated) there, where other workers reuse them, and the
+        artifacts are hard links to the cached copies, so evicting a blob
+        cannot delete a file the solution code is about to read.
+        
+        Args:
+            urls: URLs to fetch
+            directory: Directory to write the files to
+            results: Optional dict filled in as each download finishes, so a
+                caller that cancels the prefetch still keeps completed files
+            
+        Returns:
+            Mapping of URL to local file path for every successful download
+        """
+        results = {} if results is None else results
+        semaphore = asyncio.Semaphore(config.PREFETCH_CONCURRENCY)
+        
+        async def fetch(url: str):
+            path = os.path.join(directory, hashlib.sha256(url.encode("utf-8")).hexdigest())
+            async with semaphore:
+                try:
+                    if self.cache is not None:
+                        entry = await self._fetch_cached_async(url)
+                        try:
+                            if entry.size > config.PREFETCH_MAX_BYTES:
+                                logger.info(f"Not keeping prefetched {url}: {entry.size:,} bytes exceeds limit")
+                                return
+                            await asyncio.to_thread(self.cache.link, entry, path)
+                        finally:
+                            self.cache.release(entry)
+                        results[url] = path
+                        return
+                    content = await self.download_file_async(url)
+                except Exception as e:
+                    logger.warning(f"Prefetch of {url} failed: {e}")
+                    return
+            if len(content) > config.PREFETCH_MAX_BYTES:
+                logger.info(f"Not keeping prefetched {url}: {len(content):,} bytes exceeds limit")
+                return
+            await asyncio.to_thread(Path(path).write_bytes, content)
+            results[url] = path
+        
+        with span("prefetch"):
+            await asyncio.gather(*(fetch(url) for url in dict.fromkeys(urls)))
+        return results
+
+    def register_artifacts(self, artifacts: Optional[Dict[str, str]]):
+        """Serve these prefetched files from download_file instead of the network."""
+        self.artifacts = dict(artifacts or {})
     
     def scrape_website(self, url: str, headers: Optional[Dict] = None) -> str:
         """
@@ -88,155 +352,231 @@ class DataProcessor:
             
         return soup.get_text(separator=' ', strip=True)
     
-    def parse_pdf(self, content: bytes, page: Optional[int] = None) -> str:
+    def open_pdf(self, source: Union[bytes, str]) -> "PdfDocument":
+        """
+        Open a PDF for page-by-page reading.
+        
+        Documents are cached by content hash, so opening the same file
+        again (or calling parse_pdf for another page) does not re-parse it,
+        and each page's text is extracted only once.
+        
+        Args:
+            source: PDF bytes, a URL or a local path
+            
+        Returns:
+            A PdfDocument with page_text(i), text(), page_rows(i) and table(i)
+        """
+        from pdf_document import open_pdf
+        
+        if isinstance(source, str):
+            if source.startswith(("http://", "https://")):
+                source = self.download_file(source)
+            else:
+                source = Path(source).read_bytes()
+        return open_pdf(source)
+    
+    def parse_pdf(self, content: Union[bytes, str], page: Optional[int] = None) -> str:
         """
         Extract text from PDF content.
         
         Args:
-            content: PDF file content
+            content: PDF file content (or a URL or local path)
             page: Optional page number (0-indexed) to extract from
             
         Returns:
             Extracted text
         """
         logger.info(f"Parsing PDF content, page: {page}")
-        reader = PdfReader(io.BytesIO(content))
+        document = self.open_pdf(content)
         
         if page is not None:
-            if 0 <= page < len(reader.pages):
-                return reader.pages[page].extract_text()
+            if 0 <= page < len(document):
+                return document.page_text(page)
             else:
-                logger.warning(f"Page {page} out of range (0-{len(reader.pages)-1})")
+                logger.warning(f"Page {page} out of range (0-{len(document)-1})")
                 return ""
         
-        return "\n".join([p.extract_text() for p in reader.pages])
+        return document.text()
 
-    def parse_csv(self, content: bytes) -> pd.DataFrame:
+    def parse_csv(self, content: Union[bytes, str, BinaryIO]) -> "pd.DataFrame":
         """
         Parse CSV content into DataFrame.
         
         Args:
-            content: CSV file content
+            content: CSV bytes, or a URL, local path or open file to read
+                from without holding the raw bytes in memory
             
         Returns:
             DataFrame
         """
+        import pandas as pd
+        
         logger.info("Parsing CSV content")
-        return pd.read_csv(io.BytesIO(content))
+        with self._open_source(content) as stream:
+            return pd.read_csv(stream)
 
-    def parse_excel(self, content: bytes, sheet_name: Union[str, int] = 0) -> pd.DataFrame:
-        """Parse Excel content into DataFrame."""
+    def open_excel(self, source: Union[bytes, str]) -> "Workbook":
+        """
+        Open an .xlsx workbook for sheet-by-sheet reading.
+        
+        Workbooks are cached by content hash and streamed in read-only
+        mode: listing sheets reads only their dimensions and header rows,
+        and each sheet (or column selection) is parsed once.
+        
+        Args:
+            source: Workbook bytes, a URL or a local path
+            
+        Returns:
+            A Workbook with sheets, describe(), read(sheet, columns, nrows) and iter_rows(...)
+        """
+        from excel_workbook import open_workbook
+        
+        if isinstance(source, str):
+            if source.startswith(("http://", "https://")):
+                source = self.download_file(source)
+            else:
+                source = Path(source).read_bytes()
+        return open_workbook(source)
+    
+    def parse_excel(
+        self,
+        content: Union[bytes, str],
+        sheet_name: Union[str, int, None] = 0
+    ) -> Union["pd.DataFrame", Dict[str, "pd.DataFrame"]]:
+        """
+        Parse Excel content into DataFrame.
+        
+        Args:
+            content: Workbook bytes (or a URL or local path)
+            sheet_name: Sheet name or position, or None for a dict of every sheet
+            
+        Returns:
+            DataFrame, or sheet name -> DataFrame when sheet_name is None
+        """
         logger.info(f"Parsing Excel content, sheet: {sheet_name}")
-        return pd.read_excel(io.BytesIO(content), sheet_name=sheet_name)
+        if isinstance(content, str):
+            content = self.download_file(content) if content.startswith(("http://", "https://")) else Path(content).read_bytes()
+        
+        from excel_workbook import is_xlsx
+        
+        if not is_xlsx(content):
+            # Legacy .xls (or .xlsb/.ods); let pandas pick the engine
+            import pandas as pd
+            return pd.read_excel(io.BytesIO(content), sheet_name=sheet_name)
+        
+        workbook = self.open_excel(content)
+        if sheet_name is None:
+            return {name: workbook.read(name) for name in workbook.sheet_names}
+        return workbook.read(sheet_name)
     
-    def parse_json(self, content: bytes) -> Any:
-        """Parse JSON content."""
+    def parse_json(self, content: Union[bytes, str, BinaryIO]) -> Any:
+        """Parse JSON content (bytes, or a URL, local path or open file)."""
+        import pandas as pd
+        
         logger.info("Parsing JSON content")
-        return pd.read_json(io.BytesIO(content))
+        with self._open_source(content) as stream:
+            return pd.read_json(stream)
     
     def create_chart(
         self,
-        data: pd.DataFrame,
+        data: "pd.DataFrame",
         chart_type: str = "bar",
         x_col: Optional[str] = None,
         y_col: Optional[str] = None,
-        title: str = "Chart"
+        title: str = "Chart",
+        preset: Optional[str] = None,
+        format: Optional[str] = None
     ) -> str:
         """
         Create a chart and return as base64 encoded image.
         
+        Rendered with matplotlib's object-oriented API on an Agg canvas (no
+        pyplot state) and cached by data and arguments; images too large
+        for an answer are re-rendered at a smaller preset.
+        
         Args:
             data: DataFrame with data to plot
-            chart_type: Type of chart (bar, line, scatter, pie)
+            chart_type: Type of chart (bar, barh, line, scatter, pie, hist)
             x_col: Column for x-axis
             y_col: Column for y-axis
             title: Chart title
+            preset: Size preset (large, medium, small, thumbnail)
+            format: Image format (png, jpeg, webp, svg)
             
         Returns:
-            Base64 encoded image string
+            Base64 encoded image string ("" if the chart could not be drawn)
         """
-        logger.info(f"Creating {chart_type} chart")
-        
-        if data.empty:
-            logger.warning("Empty dataframe, cannot create chart")
-            return ""
-            
-        fig, ax = plt.subplots(figsize=(10, 6))
-        
-        try:
-            if chart_type == "bar":
-                data.plot(kind='bar', x=x_col, y=y_col, ax=ax)
-            elif chart_type == "line":
-                data.plot(kind='line', x=x_col, y=y_col, ax=ax)
-            elif chart_type == "scatter":
-                data.plot(kind='scatter', x=x_col, y=y_col, ax=ax)
-            elif chart_type == "pie":
-                data.plot(kind='pie', y=y_col, ax=ax)
-            
-            ax.set_title(title)
-            plt.tight_layout()
-            
-            # Convert to base64
-            buffer = io.BytesIO()
-            plt.savefig(buffer, format='png', dpi=150)
-            buffer.seek(0)
-            image_base64 = base64.b64encode(buffer.read()).decode()
-            plt.close()
-            
-            return f"data:image/png;base64,{image_base64}"
-        except Exception as e:
-            logger.error(f"Error creating chart: {e}")
-            plt.close()
-            return ""
+        return self._render_chart(data, chart_type, x_col, y_col, title, preset, format, "matplotlib")
     
     def create_plotly_chart(
         self,
-        data: pd.DataFrame,
+        data: "pd.DataFrame",
         chart_type: str = "bar",
         x_col: Optional[str] = None,
         y_col: Optional[str] = None,
-        title: str = "Chart"
+        title: str = "Chart",
+        preset: Optional[str] = None,
+        format: Optional[str] = None
     ) -> str:
         """
         Create an interactive Plotly chart and return as base64 encoded image.
         
+        Exported through one persistent kaleido renderer; drawn with
+        matplotlib instead when kaleido is not installed.
+        
         Args:
             data: DataFrame with data to plot
             chart_type: Type of chart
             x_col: Column for x-axis
             y_col: Column for y-axis
             title: Chart title
+            preset: Size preset (large, medium, small, thumbnail)
+            format: Image format (png, jpeg, webp, svg)
             
         Returns:
-            Base64 encoded image string
+            Base64 encoded image string ("" if the chart could not be drawn)
         """
-        logger.info(f"Creating Plotly {chart_type} chart")
-        
-        if chart_type == "bar":
-            fig = go.Figure(data=[go.Bar(x=data[x_col], y=data[y_col])])
-        elif chart_type == "line":
-            fig = go.Figure(data=[go.Scatter(x=data[x_col], y=data[y_col], mode='lines')])
-        elif chart_type == "scatter":
-            fig = go.Figure(data=[go.Scatter(x=data[x_col], y=data[y_col], mode='markers')])
-        else:
-            fig = go.Figure(data=[go.Bar(x=data[x_col], y=data[y_col])])
-        
-        fig.update_layout(title=title)
-        
-        # Convert to base64
-        img_bytes = pio.to_image(fig, format='png', width=1000, height=600)
-        image_base64 = base64.b64encode(img_bytes).decode()
+        return self._render_chart(data, chart_type, x_col, y_col, title, preset, format, "plotly")
+    
+    def _render_chart(
+        self,
+        data: "pd.DataFrame",
+        chart_type: str,
+        x_col: Optional[str],
+        y_col: Optional[str],
+        title: str,
+        preset: Optional[str],
+        format: Optional[str],
+        engine: str
+    ) -> str:
+        from charts import ChartError, get_renderer
         
-        return f"data:image/png;base64,{image_base64}"
+        logger.info(f"Creating {engine} {chart_type} chart")
+        try:
+            return get_renderer().render(
+                data, kind=chart_type, x=x_col, y=y_col, title=title, preset=preset, format=format, engine=engine
+            )
+        except ChartError as e:
+            logger.warning(f"Cannot create chart: {e}")
+            return ""
+        except Exception as e:
+            logger.error(f"Error creating chart: {e}")
+            return ""
     
-    def encode_file_to_base64(self, content: bytes) -> str:
+    def encode_file_to_base64(self, content: bytes, mime: str = "application/octet-stream") -> str:
         """
         Encode file content to base64 data URI.
         
+        Returning the raw bytes as the answer works too: they are encoded
+        once, at submission, and shrunk if they would exceed the 1MB limit.
+        
         Args:
             content: File content as bytes
+            mime: MIME type for the URI (None to detect it from the content)
             
         Returns:
             Base64 encoded data URI
         """
-        return f"data:application/octet-stream;base64,{base64.b64encode(content).decode()}"
+        from answer_encoder import to_data_uri
+        
+        return to_data_uri(content, mime)
@@ -0,0 +1,83 @@
+"""Time budget shared by every stage of a quiz chain."""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+logger = logging.getLogger(__name__)
+
+class Deadline:
+    """
+    A fixed point in time that stages budget against.
+
+    Each stage asks for ``budget(cap, reserve)``: at most ``cap`` seconds,
+    and never so much that less than ``reserve`` seconds remain for the
+    stages after it (typically answer submission).
+    """
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + seconds
+
+    def elapsed(self) -> float:
+        """Seconds since the deadline was created."""
+        return time.monotonic() - self.started_at
+
+    def remaining(self) -> float:
+        """Seconds left, never negative."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def budget(self, cap: Optional[float] = None, reserve: float = 0.0, minimum: float = 1.0) -> float:
+        """
+        Seconds a stage may use.
+
+        Args:
+            cap: Upper bound for this stage
+            reserve: Seconds to leave for later stages
+            minimum: Floor so a stage always gets a chance to run (but never
+                more than ``cap`` or what actually remains)
+
+        Returns:
+            Time budget in seconds; 0 once the deadline has passed, which
+            the LLM client and sandbox reject instead of using their defaults
+        """
+        remaining = self.remaining()
+        floor = min(minimum, remaining)
+        available = remaining - reserve
+        if cap is not None:
+            available = min(available, cap)
+            floor = min(floor, cap)
+        return max(available, floor)
+
+    @asynccontextmanager
+    async def stage(self, name: str, cap: Optional[float] = None, reserve: float = 0.0) -> AsyncIterator[float]:
+        """
+        Run a block under ``asyncio.timeout`` with this stage's budget.
+
+        Yields the budget in seconds; raises ``TimeoutError`` on overrun.
+        """
+        budget = self.budget(cap, reserve)
+        try:
+            async with asyncio.timeout(budget):
+                yield budget
+        except TimeoutError:
+            logger.warning(f"Stage '{name}' overran its {budget:.1f}s budget ({self.remaining():.1f}s left)")
+            raise
+
+# The deadline of the job this process is running, set by sandbox workers
+_current: Optional[Deadline] = None
+
+def set_current_deadline(deadline: Optional[Deadline]):
+    """Make ``deadline`` visible to library code running the current job (see ``current_deadline``)."""
+    global _current
+    _current = deadline
+
+def current_deadline() -> Optional[Deadline]:
+    """The deadline of the job this process is running, or None outside a sandbox run."""
+    return _current
@@ -0,0 +1,430 @@
+"""Disk cache of downloaded files shared by every worker process, revalidated with conditional GETs."""
+import hashlib
+import json
+import logging
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Iterable, Iterator, Mapping, Optional, Union
+
+import config
+
+try:
+    import fcntl
+except ImportError:  # Windows has no flock; writes are still atomic renames, only eviction can race
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Temp files older than this belong to a writer that died mid-download
+_STALE_TEMP_SECONDS = 3600
+
+_COUNTERS = ("hits", "revalidated", "misses", "not_stored", "bytes_saved", "bytes_downloaded")
+
+def _sha(data: Union[str, bytes]) -> str:
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+def _http_date(value: str) -> float:
+    return parsedate_to_datetime(value).timestamp()
+
+def freshness_lifetime(headers: Mapping[str, str], limit: float) -> Optional[float]:
+    """
+    Seconds a response may be served without asking the server again.
+
+    ``Cache-Control: no-store`` means it must not be stored at all (None);
+    ``no-cache`` (or ``Pragma: no-cache``) means it must be revalidated on
+    every use (0). Otherwise ``max-age`` (less ``Age``) or ``Expires`` (less
+    ``Date``) give the lifetime, capped at ``limit``, which is also used
+    when the server says nothing.
+    """
+    directives: Dict[str, str] = {}
+    for part in headers.get("Cache-Control", "").split(","):
+        name, _, value = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip().strip('"')
+    if "no-store" in directives:
+        return None
+    if "no-cache" in directives or (not directives and "no-cache" in headers.get("Pragma", "").lower()):
+        return 0.0
+    try:
+        if "max-age" in directives:
+            lifetime = float(directives["max-age"]) - float(headers.get("Age") or 0)
+        elif headers.get("Expires"):
+            date = headers.get("Date")
+            lifetime = _http_date(headers["Expires"]) - (_http_date(date) if date else time.time())
+        else:
+            return limit
+    except (TypeError, ValueError, IndexError, OverflowError):
+        # Malformed values, e.g. "Expires: 0", mean already expired
+        return 0.0
+    return max(0.0, min(limit, lifetime))
+
+@dataclass
+class CacheEntry:
+    """What the cache knows about one URL."""
+    url: str
+    # SHA-256 of the content, which is also the file name of the blob
+    blob: str
+    size: int
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_type: Optional[str] = None
+    # When the server last confirmed this content (download or 304)
+    validated_at: float = 0.0
+    # Seconds after validated_at the content may be served without a request (see freshness_lifetime)
+    lifetime: float = 0.0
+    # False for a no-store response: the file is a private temp file, never served to another lookup
+    stored: bool = True
+
+class DownloadCache:
+    """
+    Content-addressed store of downloaded files under one directory.
+
+    Layout::
+
+        blobs/<sha256 of content>   file bytes; URLs serving identical files share one blob
+        index/<sha256 of URL>.json  CacheEntry of the URL's latest download
+        stats.json                  counters summed over every process
+        .lock                       flock taken for eviction and counter updates
+
+    Blobs and index entries are written to temp files and renamed into
+    place, so readers never need the lock. An entry is served without a
+    request for as long as the server's ``Cache-Control`` / ``Expires``
+    allow, but never longer than ``fresh_seconds``; older ones are
+    revalidated with ``If-None-Match`` / ``If-Modified-Since``, and
+    ``no-store`` responses are handed to the caller without being indexed
+    (``release`` deletes them once used). When the
+    blobs exceed ``max_bytes`` the least recently used are deleted (reads
+    bump a blob's mtime). Deleting a blob another process has open or
+    mapped is safe on POSIX.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        fresh_seconds: Optional[float] = None
+    ):
+        self.directory = directory or config.DOWNLOAD_CACHE_DIR
+        self.max_bytes = max_bytes or config.DOWNLOAD_CACHE_MB * 1024 * 1024
+        self.fresh_seconds = config.DOWNLOAD_CACHE_FRESH_SECONDS if fresh_seconds is None else fresh_seconds
+        self._blobs = os.path.join(self.directory, "blobs")
+        self._index = os.path.join(self.directory, "index")
+        os.makedirs(self._blobs, exist_ok=True)
+        os.makedirs(self._index, exist_ok=True)
+        self._counters = dict.fromkeys(_COUNTERS, 0)
+        self._thread_lock = threading.Lock()
+
+    def stats(self) -> Dict[str, Any]:
+        """This process's hit ratio and bytes saved, plus the totals of every process sharing the directory."""
+        return {
+            **self._summary(self._counters),
+            "shared": self._summary(self._read_shared()),
+        }
+
+    def path(self, entry: CacheEntry) -> str:
+        """Local path of an entry's content."""
+        return os.path.join(self._blobs, entry.blob)
+
+    def lookup(self, url: str) -> Optional[CacheEntry]:
+        """The cached entry for a URL, or None if it was never stored or its blob was evicted."""
+        index_path = self._index_path(url)
+        try:
+            with open(index_path, encoding="utf-8") as f:
+                entry = CacheEntry(**json.load(f))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable download cache entry for {url}: {e}")
+            return None
+        if entry.url != url or not os.path.exists(self.path(entry)):
+            return None
+        return entry
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        """Whether the entry may be served without asking the server."""
+        return entry.stored and time.time() - entry.validated_at < entry.lifetime
+
+    def conditional_headers(self, entry: Optional[CacheEntry]) -> Dict[str, str]:
+        """Headers that let the server answer 304 Not Modified for this entry."""
+        headers: Dict[str, str] = {}
+        if entry is None:
+            return headers
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def hit(self, entry: CacheEntry):
+        """Record that a fresh entry was served without a request."""
+        self._touch(entry)
+        self._record(hits=1, bytes_saved=entry.size)
+        logger.info(f"Serving {entry.url} from download cache ({entry.size:,} bytes)")
+
+    def revalidated(self, entry: CacheEntry, headers: Optional[Mapping[str, str]] = None) -> CacheEntry:
+        """Record a 304 response: the cached content is current again, for as long as its headers say."""
+        entry.validated_at = time.time()
+        if headers is not None and ("Cache-Control" in headers or "Expires" in headers):
+            # A 304 carrying no-store still leaves the previously stored copy valid for this use
+            entry.lifetime = freshness_lifetime(headers, self.fresh_seconds) or 0.0
+        self._write_index(entry)
+        self._touch(entry)
+        self._record(revalidated=1, bytes_saved=entry.size)
+        logger.info(f"{entry.url} not modified, serving cached copy ({entry.size:,} bytes)")
+        return entry
+
+    def store(self, url: str, content: Union[bytes, Iterable[bytes]], headers: Mapping[str, str]) -> CacheEntry:
+        """
+        Save a downloaded body and its validators.
+
+        Args:
+            url: URL the content came from
+            content: The body, or an iterable of chunks streamed straight to disk
+            headers: Response headers (ETag, Last-Modified, Content-Type, Cache-Control, Expires)
+
+        Returns:
+            The new entry; for a ``no-store`` response an unindexed one to ``release`` after use
+        """
+        writer = self.writer(url)
+        try:
+            for chunk in ([content] if isinstance(content, (bytes, bytearray, memoryview)) else content):
+                writer.write(chunk)
+        except BaseException:
+            writer.abort()
+            raise
+        return writer.commit(headers)
+
+    def writer(self, url: str) -> "BlobWriter":
+        """Start writing a download to disk as it arrives, e.g. from an async response."""
+        return BlobWriter(self, url)
+
+    def link(self, entry: CacheEntry, path: str):
+        """
+        Give an entry's content a second name that eviction cannot delete.
+
+        A hard link shares the blob's disk space; where linking fails (another
+        filesystem, no permission) the file is copied instead.
+        """
+        self._unlink(path)
+        try:
+            os.link(self.path(entry), path)
+        except OSError:
+            shutil.copyfile(self.path(entry), path)
+
+    def release(self, entry: CacheEntry):
+        """Delete the private file of a no-store entry once its content has been read or opened."""
+        if not entry.stored:
+            self._unlink(self.path(entry))
+
+    def read_bytes(self, entry: CacheEntry) -> bytes:
+        with open(self.path(entry), "rb") as f:
+            return f.read()
+
+    def open_mmap(self, entry: CacheEntry) -> mmap.mmap:
+        """
+        Map an entry's content read-only, for parsing without copying it into memory.
+
+        Raises:
+            ValueError: If the file is empty (empty files cannot be mapped)
+        """
+        with open(self.path(entry), "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def evict(self, keep: Optional[str] = None):
+        """Delete least recently used blobs until the cache fits ``max_bytes``, sparing blob ``keep``."""
+        with self._locked():
+            blobs = []
+            total = 0
+            now = time.time()
+            for item in os.scandir(self._blobs):
+                try:
+                    stat = item.stat()
+                except FileNotFoundError:
+                    continue
+                if item.name.endswith(".tmp"):
+                    if now - stat.st_mtime > _STALE_TEMP_SECONDS:
+                        self._unlink(item.path)
+                    continue
+                total += stat.st_size
+                if item.name != keep:
+                    blobs.append((stat.st_mtime, stat.st_size, item.path))
+            if total <= self.max_bytes:
+                return
+            blobs.sort()
+            evicted = 0
+            for _, size, path in blobs:
+                if total <= self.max_bytes:
+                    break
+                self._unlink(path)
+                total -= size
+                evicted += 1
+            # Index entries of evicted blobs are skipped by lookup; drop them too
+            for item in os.scandir(self._index):
+                try:
+                    with open(item.path, encoding="utf-8") as f:
+                        blob = json.load(f).get("blob", "")
+                except (OSError, ValueError):
+                    continue
+                if not os.path.exists(os.path.join(self._blobs, blob)):
+                    self._unlink(item.path)
+            logger.info(f"Evicted {evicted} files from the download cache, {total / (1024 * 1024):.0f} MB left")
+
+    @staticmethod
+    def _summary(counters: Dict[str, int]) -> Dict[str, Any]:
+        served = counters.get("hits", 0) + counters.get("revalidated", 0)
+        lookups = served + counters.get("misses", 0)
+        return {
+            **{name: counters.get(name, 0) for name in _COUNTERS},
+            "hit_ratio": round(served / lookups, 3) if lookups else 0.0
+        }
+
+    def _index_path(self, url: str) -> str:
+        return os.path.join(self._index, f"{_sha(url)}.json")
+
+    def _write_index(self, entry: CacheEntry):
+        path = self._index_path(entry.url)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(asdict(entry), f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to write download cache entry for {entry.url}: {e}")
+
+    def _touch(self, entry: CacheEntry):
+        try:
+            os.utime(self.path(entry))
+        except OSError:
+            pass
+
+    @staticmethod
+    def _unlink(path: str):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Exclusive lock across threads and worker processes."""
+        with self._thread_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.directory, ".lock"), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_shared(self) -> Dict[str, int]:
+        try:
+            with open(os.path.join(self.directory, "stats.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _record(self, **amounts: int):
+        for name, amount in amounts.items():
+            self._counters[name] += amount
+        path = os.path.join(self.directory, "stats.json")
+        try:
+            with self._locked():
+                shared = self._read_shared()
+                for name, amount in amounts.items():
+                    shared[name] = shared.get(name, 0) + amount
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(shared, f)
+                os.replace(tmp_path, path)
+        except OSError as e:
+            logger.debug(f"Could not update shared download cache stats: {e}")
+
+class BlobWriter:
+    """
+    One download being written into the cache.
+
+    ``write`` the body as it arrives, then ``commit`` it with the response
+    headers, or ``abort`` it to delete the partial file.
+    """
+
+    def __init__(self, cache: DownloadCache, url: str):
+        self.cache = cache
+        self.url = url
+        self.size = 0
+        self._digest = hashlib.sha256()
+        fd, self._tmp_path = tempfile.mkstemp(dir=cache._blobs, suffix=".tmp")
+        self._file = os.fdopen(fd, "wb")
+
+    def write(self, chunk: bytes):
+        self._digest.update(chunk)
+        self._file.write(chunk)
+        self.size += len(chunk)
+
+    def abort(self):
+        self._file.close()
+        self.cache._unlink(self._tmp_path)
+
+    def commit(self, headers: Mapping[str, str]) -> CacheEntry:
+        """Index the complete body under its content hash and return its entry."""
+        cache = self.cache
+        lifetime = freshness_lifetime(headers, cache.fresh_seconds)
+        try:
+            self._file.close()
+            if lifetime is None:
+                # Left as a temp file: eviction removes it if the caller never releases it
+                blob = os.path.basename(self._tmp_path)
+            else:
+                blob = self._digest.hexdigest()
+                # Same content already stored (by another URL or worker): keep that one
+                os.replace(self._tmp_path, os.path.join(cache._blobs, blob))
+        except BaseException:
+            cache._unlink(self._tmp_path)
+            raise
+
+        entry = CacheEntry(
+            url=self.url,
+            blob=blob,
+            size=self.size,
+            etag=headers.get("ETag"),
+            last_modified=headers.get("Last-Modified"),
+            content_type=headers.get("Content-Type"),
+            validated_at=time.time(),
+            lifetime=lifetime or 0.0,
+            stored=lifetime is not None
+        )
+        if not entry.stored:
+            logger.info(f"Not caching {self.url}: Cache-Control no-store")
+            cache._record(misses=1, not_stored=1, bytes_downloaded=self.size)
+            return entry
+        cache._write_index(entry)
+        cache._record(misses=1, bytes_downloaded=self.size)
+        cache.evict(keep=blob)
+        return entry
+
+_cache: Optional[DownloadCache] = None
+_cache_lock = threading.Lock()
+
+def get_download_cache() -> Optional[DownloadCache]:
+    """This process's cache over the shared directory, or None when disabled."""
+    global _cache
+    if not config.DOWNLOAD_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = DownloadCache()
+            except OSError as e:
+                logger.warning(f"Download cache unavailable, downloading directly: {e}")
+                return None
+        return _cache
@@ -0,0 +1,381 @@
+"""Excel workbooks opened once per content hash, with a sheet index and streamed, cached sheet reads."""
+import hashlib
+import io
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+from openpyxl import load_workbook
+
+import config
+from ingest import DtypePlan, concat_chunks, restore_dtypes
+
+logger = logging.getLogger(__name__)
+
+# .xlsx/.xlsm files are zip archives; legacy .xls files are not and need pandas' xlrd path
+_ZIP_MAGIC = b"PK\x03\x04"
+
+_MB = 1024 * 1024
+
+class ExcelError(Exception):
+    """Raised when a workbook cannot be opened or a sheet or column does not exist."""
+    pass
+
+def is_xlsx(content: bytes) -> bool:
+    """Whether the bytes look like an Office Open XML workbook openpyxl can stream."""
+    return content[:4] == _ZIP_MAGIC
+
+@dataclass
+class SheetInfo:
+    """What a sheet holds, read from its dimension record and first row only."""
+    name: str
+    index: int
+    # Dimensions as declared by the file (rows include the header row); None when the writer left them out
+    rows: Optional[int]
+    columns: Optional[int]
+    header: List[str] = field(default_factory=list)
+    state: str = "visible"
+
+def _column_names(values: Sequence[Any]) -> List[str]:
+    """Header cells as column names, named and de-duplicated the way pandas.read_excel does."""
+    names: List[str] = []
+    seen: Dict[str, int] = {}
+    for position, value in enumerate(values):
+        name = f"Unnamed: {position}" if value is None else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+class Workbook:
+    """
+    One workbook, opened in openpyxl's read-only (streaming) mode.
+
+    Opening reads only the workbook's sheet list; ``sheets`` adds each
+    sheet's declared dimensions and header row without loading its cells.
+    ``read`` streams rows of one sheet, keeping only the requested columns
+    and at most ``nrows`` rows, builds the DataFrame in chunks and keeps
+    it so reading the same sheet again is free. Kept sheets use the compact
+    dtypes of ``read_table`` (downcast integers, categorical strings) and
+    are bounded by ``max_frame_bytes`` per workbook; callers always get
+    pandas' default dtypes back, as from ``pd.read_excel``.
+    """
+
+    def __init__(self, content: bytes, key: Optional[str] = None, max_frame_bytes: Optional[int] = None):
+        if not is_xlsx(content):
+            raise ExcelError("Not an .xlsx/.xlsm workbook (legacy .xls files are read with pandas)")
+        self.content = content
+        self.key = key or hashlib.sha256(content).hexdigest()
+        self.max_frame_bytes = max_frame_bytes or config.EXCEL_SHEET_CACHE_MB * _MB
+        self._open_book = self._load()
+        self._sheets: Optional[List[SheetInfo]] = None
+        self._frames: "OrderedDict[Tuple, pd.DataFrame]" = OrderedDict()
+        self._frame_bytes = 0
+        # Read-only worksheets share one open archive and are not thread safe
+        self._lock = threading.RLock()
+
+    def _load(self):
+        try:
+            return load_workbook(io.BytesIO(self.content), read_only=True, data_only=True)
+        except Exception as e:
+            raise ExcelError(f"Could not open workbook: {e}") from e
+
+    @property
+    def _book(self):
+        # Reopened if the cache closed this workbook while a caller still holds it
+        if self._open_book is None:
+            self._open_book = self._load()
+        return self._open_book
+
+    @property
+    def sheet_names(self) -> List[str]:
+        return list(self._book.sheetnames)
+
+    @property
+    def sheets(self) -> List[SheetInfo]:
+        """Name, declared size and header of every sheet (indexed once)."""
+        with self._lock:
+            if self._sheets is None:
+                self._sheets = [self._index_sheet(i, name) for i, name in enumerate(self._book.sheetnames)]
+            return list(self._sheets)
+
+    def sheet(self, sheet: Union[str, int] = 0) -> SheetInfo:
+        """
+        Look up a sheet by name or position.
+
+        Raises:
+            ExcelError: If there is no such sheet
+        """
+        sheets = self.sheets
+        if isinstance(sheet, int):
+            if not -len(sheets) <= sheet < len(sheets):
+                raise ExcelError(f"Sheet {sheet} out of range (0-{len(sheets) - 1})")
+            return sheets[sheet]
+        for info in sheets:
+            if info.name == sheet:
+                return info
+        raise ExcelError(f"No sheet named {sheet!r} (sheets: {', '.join(self.sheet_names)})")
+
+    def describe(self) -> str:
+        """One line per sheet, e.g. for logging or for an LLM prompt."""
+        lines = []
+        for info in self.sheets:
+            size = f"{info.rows}x{info.columns}" if info.rows is not None else "unknown size"
+            lines.append(f"[{info.index}] {info.name} ({size}): {', '.join(info.header)}")
+        return "\n".join(lines)
+
+    def iter_rows(
+        self,
+        sheet: Union[str, int] = 0,
+        columns: Optional[Sequence[Union[str, int]]] = None,
+        header: Optional[int] = 0,
+        nrows: Optional[int] = None
+    ) -> Iterator[Tuple[Any, ...]]:
+        """
+        Stream cell values of a sheet's data rows.
+
+        Not locked: use from one thread at a time, or go through ``read``.
+
+        Args:
+            sheet: Sheet name or position
+            columns: Column names (from the header row) or positions to keep
+            header: Row (0-indexed) holding the column names, or None for none
+            nrows: Stop after this many data rows
+
+        Yields:
+            One tuple of values per row, restricted to ``columns``
+        """
+        info = self.sheet(sheet)
+        positions = self._positions(info, columns, header)
+        offset = min(positions) if positions else 0
+        rows = self._book[info.name].iter_rows(
+            min_row=1 if header is None else header + 2,
+            min_col=offset + 1 if positions else None,
+            max_col=max(positions) + 1 if positions else None,
+            values_only=True
+        )
+        # Blank rows are held back until a non-blank one follows: trailing ones are formatting, not data
+        blank = 0
+        yielded = 0
+        for row in rows:
+            if positions:
+                row = tuple(row[p - offset] if p - offset < len(row) else None for p in positions)
+            if all(value is None for value in row):
+                blank += 1
+                continue
+            for pending in [(None,) * len(row)] * blank + [row]:
+                if nrows is not None and yielded >= nrows:
+                    return
+                yield pending
+                yielded += 1
+            blank = 0
+
+    def read(
+        self,
+        sheet: Union[str, int] = 0,
+        columns: Optional[Sequence[Union[str, int]]] = None,
+        header: Optional[int] = 0,
+        nrows: Optional[int] = None,
+        chunk_rows: Optional[int] = None
+    ) -> pd.DataFrame:
+        """
+        A sheet (or some of its columns and rows) as a DataFrame.
+
+        Args:
+            sheet: Sheet name or position
+            columns: Column names or positions to read; others are never materialized
+            header: Row (0-indexed) holding the column names, or None to number columns
+            nrows: Maximum number of data rows
+            chunk_rows: Rows converted to a DataFrame at a time
+
+        Returns:
+            The data with default dtypes (int64, float64, strings). Results
+            are cached in compact form and every call gets its own deep
+            copy, so editing the returned frame in place (``df.loc[...] =``,
+            ``fillna(inplace=True)``) cannot change later reads.
+
+        Raises:
+            ExcelError: If the sheet or a column does not exist
+        """
+        info = self.sheet(sheet)
+        key = (info.name, tuple(columns) if columns is not None else None, header, nrows)
+        with self._lock:
+            frame = self._frames.get(key)
+            if frame is not None:
+                self._frames.move_to_end(key)
+                return restore_dtypes(frame.copy())
+
+            positions = self._positions(info, columns, header)
+            names = self._names(info, positions, header)
+            frame = self._build(self.iter_rows(info.index, columns, header, nrows), names, chunk_rows)
+            logger.info(f"Read sheet {info.name!r} of workbook {self.key[:12]}: {len(frame):,} rows x {len(frame.columns)} columns")
+            self._remember(key, frame)
+            return restore_dtypes(frame.copy())
+
+    def close(self):
+        """Close the underlying archive and drop parsed sheets; using the workbook again reopens it."""
+        with self._lock:
+            self._frames.clear()
+            self._frame_bytes = 0
+            if self._open_book is not None:
+                self._open_book.close()
+                self._open_book = None
+
+    def _index_sheet(self, index: int, name: str) -> SheetInfo:
+        worksheet = self._book[name]
+        first = next(worksheet.iter_rows(min_row=1, max_row=1, values_only=True), ())
+        # Trailing empty header cells are usually column formatting
+        first = list(first)
+        while first and first[-1] is None:
+            first.pop()
+        return SheetInfo(
+            name=name,
+            index=index,
+            rows=worksheet.max_row,
+            columns=worksheet.max_column,
+            header=_column_names(first),
+            state=getattr(worksheet, "sheet_state", "visible")
+        )
+
+    def _header_values(self, info: SheetInfo, header: Optional[int]) -> List[str]:
+        if header is None:
+            return []
+        if header == 0:
+            return info.header
+        with self._lock:
+            row = next(self._book[info.name].iter_rows(min_row=header + 1, max_row=header + 1, values_only=True), ())
+        row = list(row)
+        while row and row[-1] is None:
+            row.pop()
+        return _column_names(row)
+
+    def _positions(
+        self,
+        info: SheetInfo,
+        columns: Optional[Sequence[Union[str, int]]],
+        header: Optional[int]
+    ) -> List[int]:
+        """Zero-based column positions to read; empty means every column."""
+        if columns is None:
+            # With a header, the columns it names; data past the last header cell is formatting
+            if header is not None:
+                return list(range(len(self._header_values(info, header))))
+            return []
+        names = self._header_values(info, header)
+        positions = []
+        for column in columns:
+            if isinstance(column, int):
+                positions.append(column)
+            elif column in names:
+                positions.append(names.index(column))
+            else:
+                raise ExcelError(f"No column {column!r} in sheet {info.name!r} (columns: {', '.join(names)})")
+        return positions
+
+    def _names(self, info: SheetInfo, positions: List[int], header: Optional[int]) -> Optional[List[str]]:
+        if header is None:
+            return positions or None
+        names = self._header_values(info, header)
+        return [names[p] if p < len(names) else f"Unnamed: {p}" for p in positions]
+
+    @staticmethod
+    def _build(rows: Iterator[Tuple[Any, ...]], names: Optional[List], chunk_rows: Optional[int]) -> pd.DataFrame:
+        """Convert streamed rows a chunk at a time so only one chunk of Python objects is alive."""
+        chunk_rows = chunk_rows or config.EXCEL_CHUNK_ROWS
+        plan: Optional[DtypePlan] = None
+        chunks: List[pd.DataFrame] = []
+        while True:
+            batch = list(islice(rows, chunk_rows))
+            if not batch:
+                break
+            chunk = pd.DataFrame.from_records(batch, columns=names)
+            if plan is None:
+                plan = DtypePlan.from_sample(chunk, config.INGEST_CATEGORY_RATIO)
+            chunks.append(plan.apply(chunk))
+        if not chunks:
+            return pd.DataFrame(columns=names)
+        return concat_chunks(chunks)
+
+    def _remember(self, key: Tuple, frame: pd.DataFrame):
+        size = int(frame.memory_usage(deep=True).sum())
+        if size > self.max_frame_bytes:
+            return
+        self._frames[key] = frame
+        self._frame_bytes += size
+        while self._frame_bytes > self.max_frame_bytes and len(self._frames) > 1:
+            _, dropped = self._frames.popitem(last=False)
+            self._frame_bytes -= int(dropped.memory_usage(deep=True).sum())
+
+class WorkbookCache:
+    """
+    LRU of open workbooks keyed by content hash.
+
+    Bounded by workbook count and the total size of the raw files, so quiz
+    code that reads several sheets of the same download opens it once.
+    """
+
+    def __init__(self, max_workbooks: Optional[int] = None, max_bytes: Optional[int] = None):
+        self.max_workbooks = max_workbooks or config.EXCEL_CACHE_WORKBOOKS
+        self.max_bytes = max_bytes or config.EXCEL_CACHE_MB * _MB
+        self.hits = 0
+        self.misses = 0
+        self._workbooks: "OrderedDict[str, Workbook]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "workbooks": len(self._workbooks),
+            "bytes": self._bytes
+        }
+
+    def open(self, content: bytes) -> Workbook:
+        """Return the open workbook for these bytes, opening it on a miss."""
+        key = hashlib.sha256(content).hexdigest()
+        with self._lock:
+            workbook = self._workbooks.get(key)
+            if workbook is not None:
+                self._workbooks.move_to_end(key)
+                self.hits += 1
+                return workbook
+            self.misses += 1
+
+        workbook = Workbook(content, key=key)
+        evicted: List[Workbook] = []
+        with self._lock:
+            if key in self._workbooks:
+                # Opened by another thread meanwhile; keep that one
+                evicted.append(workbook)
+                workbook = self._workbooks[key]
+            else:
+                self._workbooks[key] = workbook
+                self._bytes += len(content)
+            while len(self._workbooks) > 1 and (
+                len(self._workbooks) > self.max_workbooks or self._bytes > self.max_bytes
+            ):
+                _, dropped = self._workbooks.popitem(last=False)
+                self._bytes -= len(dropped.content)
+                evicted.append(dropped)
+        # Outside the cache lock: close() waits for reads in progress on that workbook
+        for dropped in evicted:
+            dropped.close()
+        return workbook
+
+_cache: Optional[WorkbookCache] = None
+
+def open_workbook(content: bytes) -> Workbook:
+    """Open an .xlsx workbook through this process's shared cache."""
+    global _cache
+    if _cache is None:
+        _cache = WorkbookCache()
+    return _cache.open(content)
@@ -0,0 +1,172 @@
+"""Rule-based quiz info extraction that answers standard pages without an LLM call."""
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from urllib.parse import urljoin
+
+from bs4 import NavigableString, Tag
+
+import config
+from compaction import PageDigest
+
+logger = logging.getLogger(__name__)
+
+_URL = r"(https?://[^\s<>\"'`]+|/[^\s<>\"'`]+)"
+# "POST your answer to <url>", "submit it at <url>", ...
+_SUBMIT_PHRASE = re.compile(r"\b(?:post|submit|send)\b[^.\n]{0,100}?\b(?:to|at)\s+" + _URL, re.I)
+_SUBMIT_URL = re.compile(r"(https?://[^\s<>\"'`]+)?/submit\b[^\s<>\"'`]*", re.I)
+_DATA_FILE = re.compile(r"\.(csv|tsv|json|xlsx?|pdf|txt|parquet|zip|xml|mp3|wav|ogg|opus|png|jpe?g|gif)(\?|#|$)", re.I)
+_TRAILING_PUNCTUATION = ".,;:)]}'\""
+
+# Answer-type hints, checked in order
+_ANSWER_HINTS = [
+    ("file", re.compile(r"\bbase64\b|\bdata uri\b|\b(chart|plot|graph|image|visuali[sz]ation)\b", re.I)),
+    ("json", re.compile(r"\bjson (object|array)\b|\breturn (a|an) (object|array)\b", re.I)),
+    ("boolean", re.compile(r"\btrue or false\b|\byes or no\b|\bboolean\b", re.I)),
+    ("number", re.compile(r"\b(sum|total|count|how many|average|mean|median|number of|maximum|minimum|integer)\b", re.I)),
+]
+
+@dataclass
+class FastExtraction:
+    """Quiz info found by the rules and how much to trust it."""
+    info: Dict[str, Any]
+    confidence: float
+    reasons: List[str] = field(default_factory=list)
+
+def _clean_url(url: str) -> str:
+    return url.rstrip(_TRAILING_PUNCTUATION)
+
+class QuizInfoExtractor:
+    """
+    Pull the question, submit URL, data files and answer type from the DOM.
+
+    Each finding adds to a confidence score (question in ``#result`` 0.4,
+    submit URL named in the text 0.4 or merely present 0.3, answer-type
+    hint 0.1, linked data files 0.1). When the score reaches
+    ``FAST_EXTRACT_MIN_CONFIDENCE`` the LLM extraction call is skipped.
+    """
+
+    def __init__(self, min_confidence: Optional[float] = None):
+        self.min_confidence = config.FAST_EXTRACT_MIN_CONFIDENCE if min_confidence is None else min_confidence
+        self.attempts = 0
+        self.hits = 0
+        self.total_seconds = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        """Fast-path hit rate and average extraction latency."""
+        return {
+            "attempts": self.attempts,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.attempts, 3) if self.attempts else 0.0,
+            "avg_ms": round(self.total_seconds * 1000 / self.attempts, 2) if self.attempts else None
+        }
+
+    def accepts(self, extraction: FastExtraction) -> bool:
+        """Whether an extraction is confident enough to skip the LLM."""
+        return extraction.confidence >= self.min_confidence
+
+    def extract(self, digest: PageDigest) -> FastExtraction:
+        """
+        Run the rules against a parsed page.
+
+        Args:
+            digest: Parsed quiz page (its ``base_url`` resolves relative links)
+
+        Returns:
+            The extracted info, which is also usable as a fallback when the
+            LLM fails, regardless of its confidence
+        """
+        start = time.perf_counter()
+        soup = digest.soup
+        base_url = digest.base_url
+        confidence = 0.0
+        reasons: List[str] = []
+
+        container = soup.find(id="result")
+        if container is not None and container.get_text(strip=True):
+            confidence += 0.4
+            reasons.append("#result")
+        else:
+            container = soup.body or soup
+        question = self._text_with_links(container, base_url)
+
+        submit_url = ""
+        match = _SUBMIT_PHRASE.search(question)
+        if match:
+            submit_url = _clean_url(match.group(1))
+            confidence += 0.4
+            reasons.append("submit phrase")
+        else:
+            match = _SUBMIT_URL.search(question) or _SUBMIT_URL.search(str(soup))
+            form = soup.find("form", action=True)
+            if match:
+                submit_url = _clean_url(match.group(0))
+            elif form is not None:
+                submit_url = form["action"]
+            if submit_url:
+                confidence += 0.3
+                reasons.append("submit url")
+        if submit_url and base_url:
+            submit_url = urljoin(base_url, submit_url)
+
+        answer_type = "string"
+        for hint, pattern in _ANSWER_HINTS:
+            if pattern.search(question):
+                answer_type = hint
+                confidence += 0.1
+                reasons.append(f"{hint} hint")
+                break
+
+        data_sources = self._data_sources(container, base_url, exclude={submit_url, base_url})
+        if any(_DATA_FILE.search(url) for url in data_sources):
+            confidence += 0.1
+            reasons.append("data files")
+
+        extraction = FastExtraction(
+            info={
+                "question": question,
+                "answer_type": answer_type,
+                "data_sources": data_sources,
+                "submit_url": submit_url
+            },
+            confidence=round(min(confidence, 1.0), 2),
+            reasons=reasons
+        )
+
+        self.attempts += 1
+        self.total_seconds += time.perf_counter() - start
+        if self.accepts(extraction):
+            self.hits += 1
+        return extraction
+
+    @classmethod
+    def _text_with_links(cls, node: Tag, base_url: Optional[str]) -> str:
+        """Visible text with each link's target appended, e.g. ``file (https://.../data.csv)``."""
+        parts: List[str] = []
+        for child in node.children:
+            if isinstance(child, NavigableString):
+                # Skip comments, CDATA and doctype declarations
+                if type(child) is NavigableString:
+                    parts.append(" ".join(child.split()))
+            elif isinstance(child, Tag) and child.name not in ("script", "style", "noscript", "template"):
+                text = cls._text_with_links(child, base_url)
+                href = child.get("href") if child.name == "a" else None
+                if href and not href.startswith(("javascript:", "#")):
+                    url = urljoin(base_url, href) if base_url else href
+                    text = f"{text} ({url})" if text and text != href else url
+                parts.append(text)
+        return " ".join(part for part in parts if part)
+
+    @staticmethod
+    def _data_sources(node: Tag, base_url: Optional[str], exclude: set) -> List[str]:
+        urls: List[str] = []
+        for tag in node.find_all(["a", "audio", "video", "source", "img", "embed"]):
+            ref = tag.get("href") or tag.get("src")
+            if not ref or ref.startswith(("javascript:", "#", "mailto:")):
+                continue
+            url = urljoin(base_url, ref) if base_url else ref
+            if url not in exclude and url not in urls and "/submit" not in url:
+                urls.append(url)
+        return urls
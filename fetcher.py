@@ -0,0 +1,305 @@
+"""Tiered quiz page fetching: static HTTPX first, Chromium only when the page needs JavaScript."""
+import asyncio
+import base64
+import binascii
+import logging
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Set
+from urllib.parse import urlparse
+
+import httpx
+from bs4 import BeautifulSoup
+
+import config
+from browser_pool import BrowserPool
+from deadline import Deadline
+from http_client import get_http_clients
+from metrics import span
+from page_loader import PageLoader
+from replay import REPLAY_RECORD, active_cassette
+
+logger = logging.getLogger(__name__)
+
+# Per-origin decisions
+RENDER_STATIC = "static"
+RENDER_BROWSER = "browser"
+
+_ATOB_CALL = re.compile(r"atob\(\s*([\"'`])([A-Za-z0-9+/=\s\\]+?)\1\s*\)")
+_TARGET_BY_ID = re.compile(r"getElementById\(\s*[\"'`]([^\"'`]+)[\"'`]\s*\)")
+_TARGET_BY_SELECTOR = re.compile(r"querySelector\(\s*[\"'`]([^\"'`]+)[\"'`]\s*\)")
+# Script features that mean the content cannot be reproduced without running it
+_DYNAMIC_JS = re.compile(r"\bfetch\s*\(|XMLHttpRequest|\bimport\s*\(|\beval\s*\(|new\s+Function\b|\$\.(ajax|get|post)\b")
+_DOM_WRITE = re.compile(r"innerHTML|innerText|textContent|document\.write|appendChild|insertAdjacent")
+_NEEDS_JS_TEXT = re.compile(r"enable javascript|requires javascript|javascript is (disabled|required)", re.I)
+
+class FetchError(Exception):
+    """The quiz page could not be loaded by any tier."""
+    pass
+
+@dataclass
+class FetchResult:
+    """Page HTML and how it was obtained."""
+    url: str
+    content: str
+    method: str
+    reason: str = ""
+
+@dataclass
+class StaticAnalysis:
+    """Outcome of checking whether static HTML is enough."""
+    needs_browser: bool
+    reason: str
+    content: str
+
+def _decode_atob(payload: str) -> Optional[str]:
+    """Decode an ``atob`` argument the way the page's script would."""
+    try:
+        raw = base64.b64decode(re.sub(r"\s|\\n", "", payload), validate=True)
+    except (binascii.Error, ValueError):
+        return None
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError:
+        # atob yields a binary string, i.e. one character per byte
+        return raw.decode("latin-1")
+
+def analyze_static_html(html: str) -> StaticAnalysis:
+    """
+    Decide whether a statically fetched page needs JavaScript rendering.
+
+    Inline ``atob(...)`` payloads are decoded in Python and written into
+    the element the script targets (or appended to the body), so pages that
+    only unpack a base64 blob do not need a browser.
+
+    Args:
+        html: Page HTML as served
+
+    Returns:
+        The decision, a short reason and the (possibly decoded) content
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    body = soup.body or soup
+    decoded_any = False
+
+    for script in soup.find_all("script"):
+        src = script.get("src")
+        if src:
+            return StaticAnalysis(True, f"external script {src}", html)
+
+        code = script.string or ""
+        if _DYNAMIC_JS.search(code):
+            return StaticAnalysis(True, "script loads data at runtime", html)
+
+        payloads = [_decode_atob(match.group(2)) for match in _ATOB_CALL.finditer(code)]
+        if any(payload is None for payload in payloads):
+            return StaticAnalysis(True, "undecodable atob payload", html)
+        if not payloads:
+            if _DOM_WRITE.search(code):
+                return StaticAnalysis(True, "script writes to the DOM", html)
+            continue
+
+        target = None
+        match = _TARGET_BY_ID.search(code)
+        if match:
+            target = soup.find(id=match.group(1))
+        else:
+            match = _TARGET_BY_SELECTOR.search(code)
+            if match:
+                try:
+                    target = soup.select_one(match.group(1))
+                except Exception:
+                    target = None
+        if target is None:
+            target = soup.new_tag("div")
+            body.append(target)
+
+        target.clear()
+        for payload in payloads:
+            target.append(BeautifulSoup(payload, "html.parser"))
+        decoded_any = True
+
+    if decoded_any:
+        return StaticAnalysis(False, "decoded atob payload", str(soup))
+
+    result = soup.find(id="result")
+    if result is not None and not result.get_text(strip=True):
+        return StaticAnalysis(True, "empty #result", html)
+
+    for tag in body.find_all(["script", "style", "noscript", "template"]):
+        tag.decompose()
+    text = body.get_text(" ", strip=True)
+    if not text:
+        return StaticAnalysis(True, "script-only body", html)
+    if _NEEDS_JS_TEXT.search(text) and len(text) < 500:
+        return StaticAnalysis(True, "page asks for JavaScript", html)
+
+    return StaticAnalysis(False, "static content", html)
+
+class QuizPageFetcher:
+    """
+    Load quiz pages as cheaply as possible.
+
+    Pages are fetched with the pooled HTTPX client first and checked with
+    ``analyze_static_html``; Chromium is used only when that check says the
+    page must be rendered. The decision is remembered per origin, so later
+    pages from the same quiz server skip the probe: browser origins are
+    not fetched statically first. Pages of static origins are still
+    checked, and one that needs JavaScript is rendered (and flips its
+    origin to the browser) rather than served unrendered.
+    """
+
+    def __init__(
+        self,
+        browser_pool: BrowserPool,
+        page_loader: Optional[PageLoader] = None,
+        http_client: Optional[httpx.AsyncClient] = None,
+        allow_browser: bool = True
+    ):
+        self.browser_pool = browser_pool
+        self.page_loader = page_loader or PageLoader()
+        self.http_client = http_client or get_http_clients().async_client
+        # Off for offline replay, where recorded pages are already rendered
+        self.allow_browser = allow_browser
+        self.cassette = active_cassette() if config.REPLAY_MODE == REPLAY_RECORD else None
+        self._decisions: Dict[str, str] = {}
+        # Renders whose content was returned but whose page is kept open to time network idle
+        self._renders: Set[asyncio.Task] = set()
+        self.counts: Dict[str, int] = {"static": 0, "browser": 0, "probes": 0, "cached_decisions": 0}
+
+    def stats(self) -> Dict[str, Any]:
+        """Fetch counters and the current per-origin decisions."""
+        return {**self.counts, "origins": dict(self._decisions)}
+
+    async def close(self):
+        """Cancel renders still holding a page open, so their slots are freed before the browser pool closes."""
+        renders = list(self._renders)
+        for task in renders:
+            task.cancel()
+        if renders:
+            await asyncio.gather(*renders, return_exceptions=True)
+
+    async def fetch(self, url: str, deadline: Deadline) -> FetchResult:
+        """
+        Load a quiz page.
+
+        Args:
+            url: Quiz page URL
+            deadline: Time budget; the browser is skipped when it runs low
+
+        Returns:
+            The page content and the tier that produced it
+
+        Raises:
+            FetchError: If neither tier could load the page
+        """
+        result = await self._fetch(url, deadline)
+        if self.cassette:
+            self.cassette.record_page(url, result.content)
+        return result
+
+    async def _fetch(self, url: str, deadline: Deadline) -> FetchResult:
+        parsed = urlparse(url)
+        origin = f"{parsed.scheme}://{parsed.netloc}"
+        decision = self._decisions.get(origin)
+        static_html: Optional[str] = None
+        static_error: Optional[Exception] = None
+
+        if decision == RENDER_BROWSER and self.allow_browser:
+            self.counts["cached_decisions"] += 1
+            reason = "origin needs rendering"
+        else:
+            try:
+                with span("page_fetch"):
+                    response = await self.http_client.get(
+                        url,
+                        timeout=deadline.budget(cap=config.HTTP_TIMEOUT_SECONDS, reserve=config.SUBMIT_RESERVE_SECONDS)
+                    )
+                    response.raise_for_status()
+                static_html = response.text
+            except Exception as e:
+                logger.warning(f"Static fetch of {url} failed: {e}")
+                static_error = e
+
+            if static_html is not None:
+                if decision == RENDER_STATIC:
+                    self.counts["cached_decisions"] += 1
+                else:
+                    self.counts["probes"] += 1
+                analysis = analyze_static_html(static_html)
+                if decision == RENDER_STATIC and analysis.needs_browser:
+                    logger.info(f"{origin} was static but {url} needs rendering ({analysis.reason})")
+                    del self._decisions[origin]
+                if not analysis.needs_browser or not self.allow_browser:
+                    self._decisions[origin] = RENDER_STATIC
+                    self.counts["static"] += 1
+                    logger.info(f"Using static HTML for {url} ({analysis.reason}), length: {len(analysis.content)}")
+                    return FetchResult(url, analysis.content, RENDER_STATIC, analysis.reason)
+                reason = analysis.reason
+            else:
+                reason = "static fetch failed"
+
+        if not self.allow_browser:
+            logger.warning(f"Browser disabled, not rendering {url}")
+        elif deadline.remaining() < config.SKIP_BROWSER_BELOW_SECONDS:
+            logger.warning(f"Only {deadline.remaining():.0f}s left, skipping browser for {url}")
+        else:
+            try:
+                content = await self._render(url, deadline)
+                self._decisions[origin] = RENDER_BROWSER
+                self.counts["browser"] += 1
+                logger.info(f"Rendered {url} with Playwright ({reason}), length: {len(content)}")
+                return FetchResult(url, content, RENDER_BROWSER, reason)
+            except Exception as e:
+                logger.error(f"Playwright failed for {url}: {e}")
+                if static_html is None:
+                    raise FetchError(f"Failed to load quiz: {static_error or 'no static fetch'} -> {e}")
+
+        if static_html is None:
+            raise FetchError(f"Failed to load quiz: {static_error}")
+        self.counts["static"] += 1
+        return FetchResult(url, static_html, RENDER_STATIC, f"{reason}, browser unavailable")
+
+    async def _render(self, url: str, deadline: Deadline) -> str:
+        """
+        Render in a pooled page and return as soon as the HTML is read.
+
+        With ``BROWSER_IDLE_MEASURE_SECONDS`` set, the page is closed in the
+        background after network idle or that many seconds, so the loader can
+        measure how much waiting for idle would have cost without the caller
+        paying for it. The page keeps its pool slot until then.
+        """
+        async with deadline.stage(
+            "page load",
+            cap=config.BROWSER_TIMEOUT_MS / 1000,
+            reserve=config.SUBMIT_RESERVE_SECONDS
+        ) as budget:
+            content: asyncio.Future = asyncio.get_running_loop().create_future()
+            task = asyncio.create_task(self._render_page(url, budget, content))
+            self._renders.add(task)
+            task.add_done_callback(self._renders.discard)
+            try:
+                return await content
+            except asyncio.CancelledError:
+                task.cancel()
+                raise
+
+    async def _render_page(self, url: str, timeout: float, content: asyncio.Future):
+        """Load a page, hand its HTML to ``content``, then close it once network idle is timed."""
+        try:
+            async with self.browser_pool.page() as page:
+                logger.info(f"Loading quiz page with Playwright: {url}")
+                with span("page_render"):
+                    page_load = await self.page_loader.load(page, url, timeout=timeout)
+                try:
+                    content.set_result(await page.content())
+                finally:
+                    await page_load.close(wait=config.BROWSER_IDLE_MEASURE_SECONDS if content.done() else 0)
+        except asyncio.CancelledError:
+            content.cancel()
+            raise
+        except Exception as e:
+            if content.done():
+                logger.debug(f"Error closing rendered page {url}: {e}")
+            else:
+                content.set_exception(e)
@@ -16,6 +16,39 @@ bind = f"0.0.0.0:{port}"
 workers = 2
 worker_class = "uvicorn.workers.UvicornWorker"
 
+# Shared mode: import the app once in the master so forked workers share its
+# modules copy-on-write, and run a single Chromium that every worker connects
+# to over CDP. Workers then only hold browser contexts, so their count can
+# follow the cores (each still runs SANDBOX_WORKERS exec processes).
+shared_mode = os.getenv("GUNICORN_SHARED_MODE", "false").lower() == "true"
+# An endpoint set by the environment means the browser is run elsewhere
+start_browser_server = shared_mode and not os.getenv("BROWSER_CDP_ENDPOINT")
+_browser_server = None
+
+if shared_mode:
+    preload_app = True
+    workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+    # Set before the app (and config) is imported, so every worker inherits it
+    os.environ.setdefault("BROWSER_CDP_ENDPOINT", f"http://127.0.0.1:{os.getenv('BROWSER_SERVER_PORT', '9222')}")
+
+def on_starting(server):
+    """Start the shared browser before any worker needs it."""
+    global _browser_server
+    if start_browser_server:
+        from browser_server import BrowserServerProcess
+        _browser_server = BrowserServerProcess()
+        _browser_server.start()
+
+def when_ready(server):
+    """With preload, import the lazily loaded data libraries once in the master."""
+    if shared_mode and os.getenv("WARMUP_IMPORTS", "false").lower() == "true":
+        from data_processor import warm_up
+        warm_up()
+
+def on_exit(server):
+    if _browser_server:
+        _browser_server.stop()
+
 # Timeout settings (important for long-running quiz solving)
 timeout = 300
 keepalive = 5
@@ -0,0 +1,114 @@
+"""Process-wide pooled HTTP clients shared by the solver, data processor and sandbox."""
+import logging
+from typing import Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+def _http2_available() -> bool:
+    """HTTP/2 in httpx needs the optional h2 package."""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+class HTTPClientManager:
+    """
+    Own one async (httpx) and one sync (requests) client per process.
+
+    Both keep connections alive between calls, so repeated requests to the
+    quiz host, data hosts and submit endpoint reuse TCP/TLS sessions.
+    httpx pools connections per origin; the requests adapter keeps up to
+    ``HTTP_MAX_HOSTS`` per-host pools.
+    """
+
+    def __init__(self):
+        self.timeout = httpx.Timeout(
+            config.HTTP_TIMEOUT_SECONDS,
+            connect=config.HTTP_CONNECT_TIMEOUT_SECONDS
+        )
+        http2 = config.HTTP2_ENABLED and _http2_available()
+        if config.HTTP2_ENABLED and not http2:
+            logger.warning("h2 is not installed, falling back to HTTP/1.1")
+
+        # Offline replay sends every request to the local stub server instead
+        transport = None
+        adapter = None
+        if config.REPLAY_MODE == "replay" and config.REPLAY_STUB_URL:
+            from replay import ReplayAdapter, ReplayTransport
+            transport = ReplayTransport(config.REPLAY_STUB_URL)
+            adapter = ReplayAdapter(
+                config.REPLAY_STUB_URL,
+                pool_connections=config.HTTP_MAX_HOSTS,
+                pool_maxsize=config.HTTP_MAX_CONNECTIONS_PER_HOST
+            )
+
+        self.async_client = httpx.AsyncClient(
+            http2=http2,
+            transport=transport,
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=config.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=config.HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=config.HTTP_KEEPALIVE_SECONDS
+            ),
+            headers={'User-Agent': USER_AGENT}
+        )
+
+        self.session = requests.Session()
+        self.session.headers.update({'User-Agent': USER_AGENT})
+        adapter = adapter or HTTPAdapter(
+            pool_connections=config.HTTP_MAX_HOSTS,
+            pool_maxsize=config.HTTP_MAX_CONNECTIONS_PER_HOST
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        if config.REPLAY_MODE == "record":
+            from replay import active_cassette, install_recorder
+            install_recorder(self.async_client, self.session, active_cassette())
+
+    async def close(self):
+        """Close both clients and their connection pools."""
+        await self.async_client.aclose()
+        self.session.close()
+
+_REQUEST_FUNCTIONS = ("request", "get", "options", "head", "post", "put", "patch", "delete")
+
+def route_requests_through(session: requests.Session):
+    """
+    Point the ``requests`` module's request functions at ``session`` for this process.
+
+    Used by sandbox workers, so generated code gets pooled connections
+    whether it uses the injected ``requests``, runs ``import requests`` or
+    ``from requests import get``. Exceptions, ``codes`` and the rest of the
+    module are untouched.
+    """
+    for name in _REQUEST_FUNCTIONS:
+        method = getattr(session, name)
+        setattr(requests, name, method)
+        setattr(requests.api, name, method)
+
+_manager: Optional[HTTPClientManager] = None
+
+def get_http_clients() -> HTTPClientManager:
+    """Return this process's HTTP client manager, creating it on first use."""
+    global _manager
+    if _manager is None:
+        _manager = HTTPClientManager()
+    return _manager
+
+async def close_http_clients():
+    """Close this process's HTTP clients, if they were created."""
+    global _manager
+    if _manager is not None:
+        await _manager.close()
+        _manager = None
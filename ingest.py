@@ -0,0 +1,474 @@
+"""Chunked CSV/JSON ingestion with compact dtypes and aggregations that never build the full DataFrame."""
+import codecs
+import io
+import json
+import logging
+import os
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, BinaryIO, Callable, ContextManager, Dict, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import (
+    is_float_dtype,
+    is_integer_dtype,
+    is_object_dtype,
+    is_string_dtype,
+    union_categoricals,
+)
+
+import config
+
+logger = logging.getLogger(__name__)
+
+FORMAT_CSV = "csv"
+FORMAT_TSV = "tsv"
+FORMAT_JSON = "json"
+FORMAT_JSON_LINES = "jsonl"
+
+_EXTENSIONS = {
+    ".csv": FORMAT_CSV,
+    ".tsv": FORMAT_TSV,
+    ".tab": FORMAT_TSV,
+    ".json": FORMAT_JSON,
+    ".jsonl": FORMAT_JSON_LINES,
+    ".ndjson": FORMAT_JSON_LINES,
+}
+
+# Bytes read at a time when scanning a JSON array
+_READ_BLOCK = 1 << 16
+_MB = 1024 * 1024
+
+# A row filter: a DataFrame.query expression or a function returning a boolean mask
+Where = Union[str, Callable[[pd.DataFrame], Any], None]
+# Raw data: bytes, a local path or a seekable binary file
+Source = Union[bytes, str, os.PathLike, BinaryIO]
+
+# How partial group results from separate chunks are merged
+_COMBINE = {"sum": "sum", "count": "sum", "size": "sum", "min": "min", "max": "max"}
+
+class IngestError(Exception):
+    """The data could not be read as a table."""
+    pass
+
+class FrameTooLargeError(IngestError):
+    """Materializing the table would exceed the frame memory cap."""
+    pass
+
+def detect_format(head: bytes, name: str = "") -> str:
+    """
+    Guess a table format from a file name, falling back to its first bytes.
+
+    Args:
+        head: The first few kilobytes of the data
+        name: File name or URL path, if known
+
+    Returns:
+        One of the ``FORMAT_*`` constants
+    """
+    extension = os.path.splitext(name.split("?", 1)[0])[1].lower()
+    if extension in _EXTENSIONS:
+        return _EXTENSIONS[extension]
+
+    text = head.decode("utf-8", errors="ignore").lstrip("\ufeff \t\r\n")
+    if text.startswith("["):
+        return FORMAT_JSON
+    if text.startswith("{"):
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+        return FORMAT_JSON_LINES if len(lines) > 1 and lines[1].startswith("{") else FORMAT_JSON
+    first_line = text.split("\n", 1)[0]
+    if "\t" in first_line and "," not in first_line:
+        return FORMAT_TSV
+    return FORMAT_CSV
+
+def stream_opener(source: Source) -> Callable[[], ContextManager[BinaryIO]]:
+    """
+    Turn a source into something that can be read from the start repeatedly.
+
+    Paths are reopened for each pass; bytes are wrapped without copying;
+    file objects are rewound and left open for their owner to close.
+    """
+    @contextmanager
+    def open_source() -> Iterator[BinaryIO]:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            yield io.BytesIO(source)
+        elif isinstance(source, (str, os.PathLike)):
+            with open(source, "rb") as f:
+                yield f
+        else:
+            source.seek(0)
+            yield source
+
+    return open_source
+
+def iter_json_array(stream: BinaryIO) -> Iterator[Any]:
+    """
+    Yield the items of a top-level JSON array one at a time.
+
+    Only the item being decoded is held in memory, so arrays larger than
+    RAM can be scanned.
+
+    Raises:
+        IngestError: If the data is not a JSON array
+    """
+    json_decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    started = False
+    eof = False
+
+    def read_more() -> str:
+        nonlocal eof
+        block = stream.read(_READ_BLOCK)
+        eof = not block
+        return text_decoder.decode(block, final=eof)
+
+    while True:
+        buffer = buffer.lstrip(" \t\r\n,")
+        if not started:
+            if not buffer and not eof:
+                buffer += read_more()
+                continue
+            if not buffer.startswith("["):
+                raise IngestError("Expected a JSON array")
+            buffer = buffer[1:]
+            started = True
+            continue
+        if buffer.startswith("]"):
+            return
+        try:
+            item, end = json_decoder.raw_decode(buffer)
+            # A number at the end of the buffer may continue in the next block
+            if end == len(buffer) and not eof:
+                raise ValueError("item may be incomplete")
+        except ValueError:
+            if eof:
+                raise IngestError("Truncated or malformed JSON array")
+            buffer += read_more()
+            continue
+        buffer = buffer[end:]
+        yield item
+
+@dataclass
+class DtypePlan:
+    """Compact dtypes chosen from a sample and applied to every chunk."""
+    integers: List[str] = field(default_factory=list)
+    floats: List[str] = field(default_factory=list)
+    categories: List[str] = field(default_factory=list)
+    downcast_floats: bool = False
+
+    @classmethod
+    def from_sample(cls, sample: pd.DataFrame, category_ratio: float, downcast_floats: bool = False) -> "DtypePlan":
+        """
+        Plan dtypes from sampled rows.
+
+        Integer columns are downcast to the smallest type that fits each
+        chunk (lossless). Float columns stay float64 unless
+        ``downcast_floats`` is set, because float32 sums drift. String
+        columns whose share of distinct values is below ``category_ratio``
+        become categoricals.
+        """
+        plan = cls(downcast_floats=downcast_floats)
+        for column in sample.columns:
+            series = sample[column]
+            if is_integer_dtype(series.dtype):
+                plan.integers.append(column)
+            elif is_float_dtype(series.dtype):
+                plan.floats.append(column)
+            elif is_object_dtype(series.dtype) or is_string_dtype(series.dtype):
+                values = series.dropna()
+                if len(values) and values.nunique() / len(values) < category_ratio:
+                    plan.categories.append(column)
+        return plan
+
+    def apply(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """Convert one chunk in place; columns that changed type since the sample are left alone."""
+        for column in self.integers:
+            if column in chunk and is_integer_dtype(chunk[column].dtype):
+                chunk[column] = pd.to_numeric(chunk[column], downcast="integer")
+        if self.downcast_floats:
+            for column in self.floats:
+                if column in chunk and is_float_dtype(chunk[column].dtype):
+                    chunk[column] = pd.to_numeric(chunk[column], downcast="float")
+        for column in self.categories:
+            if column in chunk and (is_object_dtype(chunk[column].dtype) or is_string_dtype(chunk[column].dtype)):
+                chunk[column] = chunk[column].astype("category")
+        return chunk
+
+def restore_dtypes(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Undo ``DtypePlan.apply`` in place: integers back to int64, floats to
+    float64 and categoricals to the dtype of their values.
+
+    Compact dtypes are only safe inside the aggregations; a frame handed to
+    generated code must behave like ``pd.read_csv`` output, where
+    ``df.a * 1000`` cannot wrap around an int8.
+    """
+    for position, dtype in enumerate(frame.dtypes):
+        if isinstance(dtype, pd.CategoricalDtype):
+            frame.isetitem(position, frame.iloc[:, position].astype(dtype.categories.dtype))
+        elif isinstance(dtype, np.dtype) and dtype.kind in "iu" and dtype.itemsize < 8:
+            frame.isetitem(position, frame.iloc[:, position].astype("int64"))
+        elif isinstance(dtype, np.dtype) and dtype.kind == "f" and dtype.itemsize < 8:
+            frame.isetitem(position, frame.iloc[:, position].astype("float64"))
+    return frame
+
+def _frame_mb(frame: pd.DataFrame) -> float:
+    return frame.memory_usage(deep=True).sum() / _MB
+
+def concat_chunks(chunks: Sequence[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate chunks, keeping categorical columns categorical across differing categories."""
+    if not chunks:
+        return pd.DataFrame()
+    if len(chunks) == 1:
+        return chunks[0]
+    for column in chunks[0].columns:
+        if not all(column in chunk and isinstance(chunk[column].dtype, pd.CategoricalDtype) for chunk in chunks):
+            continue
+        try:
+            categories = union_categoricals([chunk[column] for chunk in chunks], ignore_order=True).categories
+        except TypeError:
+            # Categories of different types (e.g. an all-empty chunk); pandas falls back to object
+            continue
+        for chunk in chunks:
+            chunk[column] = chunk[column].cat.set_categories(categories)
+    return pd.concat(chunks, ignore_index=True)
+
+class TableStream:
+    """
+    A CSV, TSV, JSON-lines or JSON-array table read in chunks.
+
+    Dtypes are planned from the first ``sample_rows`` rows and the chunk
+    size is picked so one chunk takes about ``chunk_mb`` in memory. Every
+    aggregation is a fresh pass over the source, so only one chunk (plus
+    the running result) is in memory at a time. ``to_frame`` and ``filter``
+    build a DataFrame and refuse to grow it past ``max_frame_mb``; they and
+    ``head`` return pandas' default dtypes (see ``restore_dtypes``), so the
+    compact ones never leak out of the aggregations.
+
+    Example::
+
+        table = data_processor.read_table(url)
+        table.sum(["amount"])
+        table.groupby("region", {"amount": ["sum", "mean"]}, where="amount > 0")
+    """
+
+    def __init__(
+        self,
+        source: Source,
+        format: str,
+        read_kwargs: Optional[Dict[str, Any]] = None,
+        chunk_rows: Optional[int] = None,
+        sample_rows: Optional[int] = None,
+        category_ratio: Optional[float] = None,
+        downcast_floats: bool = False,
+        max_frame_mb: Optional[float] = None
+    ):
+        self._open = stream_opener(source)
+        self.format = format
+        self.read_kwargs = dict(read_kwargs or {})
+        if format == FORMAT_TSV:
+            self.read_kwargs.setdefault("sep", "\t")
+        self.max_frame_mb = max_frame_mb or config.INGEST_MAX_FRAME_MB
+
+        sample = self._read_sample(sample_rows or config.INGEST_SAMPLE_ROWS)
+        ratio = config.INGEST_CATEGORY_RATIO if category_ratio is None else category_ratio
+        self.plan = DtypePlan.from_sample(sample, ratio, downcast_floats)
+        row_bytes = max(sample.memory_usage(deep=True).sum() / max(len(sample), 1), 1)
+        self.chunk_rows = chunk_rows or max(1000, int(config.INGEST_CHUNK_MB * _MB / row_bytes))
+        self.columns: List[str] = [str(column) for column in sample.columns]
+        self._sample = self.plan.apply(sample)
+
+    def _read_sample(self, rows: int) -> pd.DataFrame:
+        try:
+            with self._open() as stream:
+                if self.format in (FORMAT_CSV, FORMAT_TSV):
+                    return pd.read_csv(stream, nrows=rows, **self.read_kwargs)
+                if self.format == FORMAT_JSON_LINES:
+                    return pd.read_json(io.BytesIO(b"".join(islice(stream, rows))), lines=True, **self.read_kwargs)
+                return pd.DataFrame.from_records(list(islice(iter_json_array(stream), rows)))
+        except IngestError:
+            raise
+        except Exception as e:
+            raise IngestError(f"Could not read {self.format} data: {e}") from e
+
+    def chunks(self) -> Iterator[pd.DataFrame]:
+        """Yield the table chunk by chunk with the planned dtypes."""
+        with self._open() as stream:
+            if self.format in (FORMAT_CSV, FORMAT_TSV):
+                with pd.read_csv(stream, chunksize=self.chunk_rows, **self.read_kwargs) as reader:
+                    for chunk in reader:
+                        yield self.plan.apply(chunk)
+            elif self.format == FORMAT_JSON_LINES:
+                with pd.read_json(stream, lines=True, chunksize=self.chunk_rows, **self.read_kwargs) as reader:
+                    for chunk in reader:
+                        yield self.plan.apply(chunk)
+            else:
+                items = iter_json_array(stream)
+                while True:
+                    batch = list(islice(items, self.chunk_rows))
+                    if not batch:
+                        break
+                    yield self.plan.apply(pd.DataFrame.from_records(batch))
+
+    __iter__ = chunks
+
+    def _filtered(self, where: Where = None) -> Iterator[pd.DataFrame]:
+        for chunk in self.chunks():
+            if where is None:
+                yield chunk
+            elif isinstance(where, str):
+                yield chunk.query(where)
+            else:
+                yield chunk[where(chunk)]
+
+    def head(self, n: int = 5) -> pd.DataFrame:
+        """First rows, from the sample when it is long enough."""
+        if n <= len(self._sample):
+            # Copied so in-place edits of the result cannot reach the sample
+            return restore_dtypes(self._sample.head(n).copy())
+        return restore_dtypes(next(iter(self.chunks()), pd.DataFrame()).head(n))
+
+    def to_frame(self, columns: Optional[List[str]] = None, where: Where = None) -> pd.DataFrame:
+        """
+        Build the (optionally filtered and projected) table in memory, with default dtypes.
+
+        Raises:
+            FrameTooLargeError: If it would exceed ``max_frame_mb``; use the
+                aggregations instead
+        """
+        kept: List[pd.DataFrame] = []
+        total_mb = 0.0
+        for chunk in self._filtered(where):
+            chunk = restore_dtypes(chunk[columns] if columns is not None else chunk)
+            total_mb += _frame_mb(chunk)
+            if total_mb > self.max_frame_mb:
+                raise FrameTooLargeError(
+                    f"Table exceeds {self.max_frame_mb:.0f} MB in memory; "
+                    "aggregate with sum/count/groupby or narrow it with columns/where"
+                )
+            kept.append(chunk)
+        if not kept:
+            empty = self._sample.iloc[0:0] if columns is None else self._sample[columns].iloc[0:0]
+            return restore_dtypes(empty.copy())
+        return pd.concat(kept, ignore_index=True) if len(kept) > 1 else kept[0]
+
+    def filter(self, where: Where, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Rows matching ``where`` (a query string or mask function) as a DataFrame."""
+        return self.to_frame(columns=columns, where=where)
+
+    def count(self, where: Where = None) -> int:
+        """Number of rows, optionally only those matching ``where``."""
+        return sum(len(chunk) for chunk in self._filtered(where))
+
+    def sum(self, columns: Optional[List[str]] = None, where: Where = None) -> pd.Series:
+        """Column sums over the whole table (numeric columns only when ``columns`` is not given)."""
+        return self._reduce("sum", columns, where)
+
+    def min(self, columns: Optional[List[str]] = None, where: Where = None) -> pd.Series:
+        return self._reduce("min", columns, where)
+
+    def max(self, columns: Optional[List[str]] = None, where: Where = None) -> pd.Series:
+        return self._reduce("max", columns, where)
+
+    def mean(self, columns: Optional[List[str]] = None, where: Where = None) -> pd.Series:
+        totals = self._reduce("sum", columns, where)
+        counts = self._reduce("count", list(totals.index), where)
+        return totals / counts
+
+    def _reduce(self, how: str, columns: Optional[List[str]], where: Where) -> pd.Series:
+        result: Optional[pd.Series] = None
+        for chunk in self._filtered(where):
+            frame = chunk[columns] if columns is not None else chunk.select_dtypes("number")
+            if how == "count":
+                partial = frame.count()
+            else:
+                partial = getattr(frame, how)(numeric_only=columns is None)
+            if result is None:
+                result = partial
+            elif how in ("sum", "count"):
+                result = result.add(partial, fill_value=0)
+            else:
+                result = getattr(pd.concat([result, partial], axis=1), how)(axis=1)
+        return result if result is not None else pd.Series(dtype="float64")
+
+    def value_counts(self, column: str, where: Where = None) -> pd.Series:
+        """Occurrences of each value of ``column``, most frequent first."""
+        result: Optional[pd.Series] = None
+        for chunk in self._filtered(where):
+            partial = chunk[column].value_counts(dropna=False)
+            partial.index = partial.index.astype(object)
+            result = partial if result is None else result.add(partial, fill_value=0)
+        if result is None:
+            return pd.Series(dtype="int64", name="count")
+        return result.astype("int64").sort_values(ascending=False)
+
+    def groupby(
+        self,
+        by: Union[str, List[str]],
+        agg: Dict[str, Union[str, List[str]]],
+        where: Where = None
+    ) -> pd.DataFrame:
+        """
+        Grouped aggregation combined chunk by chunk.
+
+        Args:
+            by: Grouping column(s)
+            agg: Column -> function or list of functions, each one of
+                sum, count, min, max, mean or size
+            where: Optional row filter applied first
+
+        Returns:
+            One row per group. A column with a single function keeps its
+            name; with several, results are named ``<column>_<function>``.
+        """
+        specs = []
+        for column, funcs in agg.items():
+            funcs = [funcs] if isinstance(funcs, str) else list(funcs)
+            for func in funcs:
+                if func not in ("sum", "count", "min", "max", "mean", "size"):
+                    raise ValueError(f"Unsupported aggregation {func!r}")
+                name = column if len(funcs) == 1 else f"{column}_{func}"
+                specs.append((name, column, func))
+
+        # Partial results that combine across chunks: mean is tracked as sum and count
+        partial_specs = {}
+        for _, column, func in specs:
+            if func == "mean":
+                partial_specs[(column, "sum")] = None
+                partial_specs[(column, "count")] = None
+            else:
+                partial_specs[(column, func)] = None
+
+        combined: Optional[pd.DataFrame] = None
+        for chunk in self._filtered(where):
+            if chunk.empty:
+                continue
+            grouped = chunk.groupby(by, observed=True, dropna=False)
+            partial = pd.DataFrame({
+                f"{column}\0{func}": grouped.size() if func == "size" else getattr(grouped[column], func)()
+                for column, func in partial_specs
+            })
+            if combined is None:
+                combined = partial
+                continue
+            stacked = pd.concat([combined, partial])
+            regrouped = stacked.groupby(level=list(range(stacked.index.nlevels)), dropna=False)
+            combined = pd.DataFrame({
+                f"{column}\0{func}": getattr(regrouped[f"{column}\0{func}"], _COMBINE[func])()
+                for column, func in partial_specs
+            })
+
+        keys = [by] if isinstance(by, str) else list(by)
+        if combined is None:
+            return pd.DataFrame(columns=keys + [name for name, _, _ in specs])
+        result = pd.DataFrame(index=combined.index)
+        for name, column, func in specs:
+            if func == "mean":
+                result[name] = combined[f"{column}\0sum"] / combined[f"{column}\0count"]
+            else:
+                result[name] = combined[f"{column}\0{func}"]
+        result.index.names = keys
+        return result.reset_index()
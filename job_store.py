@@ -0,0 +1,282 @@
+"""Job records for quiz chains, kept in memory with optional SQLite persistence."""
+import json
+import logging
+import sqlite3
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import config
+from metrics import JOBS
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+# Answers larger than this (e.g. base64 images) are stored as a preview
+MAX_STORED_ANSWER_CHARS = 2000
+
+# Columns beside the JSON record, for lookups shared by every worker
+_COLUMNS = (
+    ("email", "TEXT"),
+    ("url", "TEXT"),
+    ("finished_at", "REAL"),
+    ("coalesced_requests", "INTEGER NOT NULL DEFAULT 0"),
+)
+_ROW = "data, coalesced_requests"
+
+@dataclass
+class Job:
+    """A quiz chain request and everything that happened while solving it."""
+    id: str
+    url: str
+    email: str
+    status: str = JOB_QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    # Duplicate requests that attached to this job instead of starting a new chain
+    coalesced_requests: int = 0
+    steps: List[Dict[str, Any]] = field(default_factory=list)
+    # Seconds spent per solver stage (see metrics.span), summed over the chain
+    stage_seconds: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def duration_seconds(self) -> Optional[float]:
+        """Wall-clock time from start to finish (or now, if still running)."""
+        if self.started_at is None:
+            return None
+        return (self.finished_at or time.time()) - self.started_at
+
+    def to_dict(self, include_steps: bool = True) -> Dict[str, Any]:
+        data = asdict(self)
+        data["duration_seconds"] = self.duration_seconds
+        data["queue_seconds"] = (self.started_at - self.created_at) if self.started_at else None
+        data["step_count"] = len(self.steps)
+        data["correct_count"] = sum(1 for step in self.steps if step.get("correct"))
+        if not include_steps:
+            del data["steps"]
+        return data
+
+def _preview(value: Any) -> Any:
+    """Keep small answers verbatim and truncate large ones."""
+    try:
+        text = json.dumps(value)
+    except (TypeError, ValueError):
+        text = repr(value)
+        value = text
+    if len(text) <= MAX_STORED_ANSWER_CHARS:
+        return value
+    return f"{text[:MAX_STORED_ANSWER_CHARS]}... ({len(text):,} chars)"
+
+class JobStore:
+    """
+    Bounded ring buffer of recent jobs.
+
+    When ``path`` is set every change is also written to SQLite, which is
+    then the source of truth for ``get`` and ``list``: job history survives
+    restarts, and with several gunicorn workers on one file any worker can
+    answer for jobs another one is running. Without it each process only
+    knows its own jobs, so the status API needs a single worker.
+    """
+
+    def __init__(self, capacity: Optional[int] = None, path: Optional[str] = None):
+        self.capacity = capacity or config.JOB_STORE_SIZE
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        # Latest job per (email, url), used to coalesce duplicate requests
+        self._latest: Dict[Tuple[str, str], str] = {}
+        self._db: Optional[sqlite3.Connection] = None
+
+        path = config.JOB_STORE_PATH if path is None else path
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, created_at REAL, status TEXT, data TEXT)"
+            )
+            self._migrate()
+            self._db.commit()
+            logger.info(f"Persisting job records to {path}")
+
+    def close(self):
+        """Close the SQLite connection, if any."""
+        if self._db:
+            self._db.close()
+            self._db = None
+
+    def create(self, url: str, email: str) -> Job:
+        """Record a new queued job."""
+        job = Job(id=uuid.uuid4().hex, url=url, email=email)
+        self._jobs[job.id] = job
+        self._latest[(email, url)] = job.id
+        while len(self._jobs) > self.capacity:
+            _, evicted = self._jobs.popitem(last=False)
+            self._forget_latest(evicted)
+        self._save(job)
+        return job
+
+    def find_coalescible(self, email: str, url: str, ttl: float = 0) -> Optional[Job]:
+        """
+        Find a job a duplicate request can attach to.
+
+        Queued and running jobs for the same (email, url) always match; a
+        completed job matches for ``ttl`` seconds after it finished. With a
+        SQLite store the latest job is looked up there, so duplicates reaching
+        different workers coalesce too; in-flight jobs older than
+        ``DEDUP_INFLIGHT_SECONDS`` are taken to belong to a worker that died.
+        """
+        if self._db:
+            job = self._latest_shared(email, url)
+        else:
+            job = self._jobs.get(self._latest.get((email, url), ""))
+        if job is None:
+            return None
+        if job.status in (JOB_QUEUED, JOB_RUNNING):
+            return job
+        if job.status == JOB_COMPLETED and ttl and time.time() - job.finished_at < ttl:
+            return job
+        return None
+
+    def attach(self, job_id: str):
+        """Count a duplicate request that was coalesced into a job, which may belong to another worker."""
+        job = self._jobs.get(job_id)
+        if job:
+            job.coalesced_requests += 1
+        if self._db:
+            # Incremented in its own column so the owning worker's saves don't overwrite it
+            try:
+                self._db.execute(
+                    "UPDATE jobs SET coalesced_requests = coalesced_requests + 1 WHERE id = ?", (job_id,)
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Failed to persist job {job_id}: {e}")
+
+    def discard(self, job_id: str):
+        """Forget a job that was never admitted."""
+        job = self._jobs.pop(job_id, None)
+        if job:
+            self._forget_latest(job)
+        if self._db:
+            self._db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            self._db.commit()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Look up a job by id, in the shared SQLite store when there is one."""
+        if self._db:
+            row = self._db.execute(f"SELECT {_ROW} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row:
+                return self._from_row(row)
+        return self._jobs.get(job_id)
+
+    def list(self, limit: int = 50, status: Optional[str] = None) -> List[Job]:
+        """Return the most recent jobs, newest first."""
+        if self._db:
+            query = f"SELECT {_ROW} FROM jobs"
+            params: tuple = ()
+            if status:
+                query += " WHERE status = ?"
+                params = (status,)
+            query += " ORDER BY created_at DESC LIMIT ?"
+            rows = self._db.execute(query, params + (limit,)).fetchall()
+            return [self._from_row(row) for row in rows]
+
+        jobs = [job for job in reversed(self._jobs.values()) if not status or job.status == status]
+        return jobs[:limit]
+
+    def mark_running(self, job_id: str):
+        job = self._jobs.get(job_id)
+        if job:
+            job.status = JOB_RUNNING
+            job.started_at = time.time()
+            self._save(job)
+
+    def add_step(self, job_id: str, step: Dict[str, Any]):
+        """Append one quiz attempt to a job."""
+        job = self._jobs.get(job_id)
+        if job:
+            step = dict(step)
+            if "answer" in step:
+                step["answer"] = _preview(step["answer"])
+            job.steps.append(step)
+            self._save(job)
+
+    def finish(
+        self,
+        job_id: str,
+        status: str,
+        error: Optional[str] = None,
+        stage_seconds: Optional[Dict[str, float]] = None
+    ):
+        job = self._jobs.get(job_id)
+        if job:
+            job.status = status
+            job.error = error
+            job.finished_at = time.time()
+            if stage_seconds is not None:
+                job.stage_seconds = dict(stage_seconds)
+            JOBS.inc(status=status)
+            self._save(job)
+
+    def _forget_latest(self, job: Job):
+        key = (job.email, job.url)
+        if self._latest.get(key) == job.id:
+            del self._latest[key]
+
+    def _latest_shared(self, email: str, url: str) -> Optional[Job]:
+        """The newest job for (email, url) in SQLite, skipping in-flight ones too old to still be running."""
+        try:
+            row = self._db.execute(
+                f"SELECT {_ROW}, status, created_at FROM jobs WHERE email = ? AND url = ? "
+                "ORDER BY created_at DESC LIMIT 1",
+                (email, url)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Failed to look up jobs for {url}: {e}")
+            return None
+        if row is None:
+            return None
+        status, created_at = row[2], row[3]
+        if status in (JOB_QUEUED, JOB_RUNNING) and time.time() - created_at > config.DEDUP_INFLIGHT_SECONDS:
+            return None
+        return self._from_row(row[:2])
+
+    def _migrate(self):
+        """Add the columns queried across workers to tables created before they existed."""
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        for name, definition in _COLUMNS:
+            if name not in columns:
+                self._db.execute(f"ALTER TABLE jobs ADD COLUMN {name} {definition}")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_by_request ON jobs (email, url, created_at)")
+
+    def _save(self, job: Job):
+        if not self._db:
+            return
+        try:
+            self._db.execute(
+                "INSERT INTO jobs (id, created_at, status, data, email, url, finished_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET "
+                "status = excluded.status, data = excluded.data, finished_at = excluded.finished_at",
+                (
+                    job.id, job.created_at, job.status, json.dumps(asdict(job), default=str),
+                    job.email, job.url, job.finished_at
+                )
+            )
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Failed to persist job {job.id}: {e}")
+
+    @staticmethod
+    def _from_row(row: Tuple[str, Optional[int]]) -> Job:
+        data, coalesced_requests = row
+        job = Job(**json.loads(data))
+        job.coalesced_requests = coalesced_requests or 0
+        return job
@@ -0,0 +1,165 @@
+"""Content-addressed cache for LLM responses."""
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+def make_key(model: str, prompt: str, generation_config: Dict[str, Any]) -> str:
+    """Hash a request so identical (model, prompt, config) triples share a key."""
+    payload = json.dumps(
+        {"model": model, "prompt": prompt, "config": generation_config},
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class LLMCache:
+    """
+    LRU + TTL cache of response texts.
+
+    Entries live in memory; with ``directory`` set they are also written
+    to disk as one JSON file per key so other workers and restarts can
+    reuse them. Expired files are deleted when read, and after each write
+    the directory is pruned of expired files and, least recently used
+    first, down to ``max_disk_bytes``.
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        directory: Optional[str] = None,
+        max_disk_bytes: Optional[int] = None
+    ):
+        self.max_entries = max_entries or config.LLM_CACHE_SIZE
+        self.max_disk_bytes = max_disk_bytes or config.LLM_CACHE_DISK_MB * 1024 * 1024
+        self.ttl_seconds = config.LLM_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.directory = config.LLM_CACHE_DIR if directory is None else directory
+        self.hits = 0
+        self.misses = 0
+
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": len(self._entries)
+        }
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for a key, or None."""
+        entry = self._entries.get(key)
+        if entry is None and self.directory:
+            entry = self._read_disk(key)
+            if entry is not None:
+                self._remember(key, entry)
+
+        if entry is not None:
+            stored_at, text = entry
+            if not self._expired(stored_at):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return text
+            self._entries.pop(key, None)
+            if self.directory:
+                self._unlink(self._path(key))
+
+        self.misses += 1
+        return None
+
+    def set(self, key: str, text: str):
+        """Store a response, evicting the least recently used entries."""
+        entry = (time.time(), text)
+        self._remember(key, entry)
+        if self.directory:
+            self._write_disk(key, entry)
+            self._prune_disk()
+
+    def _remember(self, key: str, entry: Tuple[float, str]):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _expired(self, stored_at: float) -> bool:
+        return bool(self.ttl_seconds) and time.time() - stored_at > self.ttl_seconds
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _read_disk(self, key: str) -> Optional[Tuple[float, str]]:
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                data = json.load(f)
+            # Reads count as use for the disk LRU
+            os.utime(self._path(key))
+            return data["stored_at"], data["text"]
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable LLM cache entry {key}: {e}")
+            return None
+
+    def _write_disk(self, key: str, entry: Tuple[float, str]):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"stored_at": entry[0], "text": entry[1]}, f)
+            # Atomic so concurrent workers never read a half-written entry
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to write LLM cache entry {key}: {e}")
+            self._unlink(tmp_path)
+
+    def _prune_disk(self):
+        """Delete expired entry files, then the least recently used until the directory fits ``max_disk_bytes``."""
+        files = []
+        total = 0
+        try:
+            items = list(os.scandir(self.directory))
+        except OSError:
+            return
+        for item in items:
+            if not item.name.endswith(".json"):
+                continue
+            try:
+                stat = item.stat()
+            except OSError:
+                continue
+            # A file is rewritten on every set, so its mtime is no older than its stored_at
+            if self._expired(stat.st_mtime):
+                self._unlink(item.path)
+                continue
+            files.append((stat.st_mtime, stat.st_size, item.path))
+            total += stat.st_size
+        if total <= self.max_disk_bytes:
+            return
+        files.sort()
+        removed = 0
+        for _, size, path in files:
+            if total <= self.max_disk_bytes:
+                break
+            self._unlink(path)
+            total -= size
+            removed += 1
+        logger.info(f"Pruned {removed} LLM cache files, {total / (1024 * 1024):.1f} MB left")
+
+    @staticmethod
+    def _unlink(path: str):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
@@ -0,0 +1,147 @@
+"""Async client for Gemini calls."""
+import asyncio
+import logging
+import time
+from typing import Optional
+
+import google.generativeai as genai
+
+import config
+from llm_cache import LLMCache, make_key
+from metrics import LLM_REQUESTS, LLM_TOKENS
+from replay import REPLAY_RECORD, REPLAY_REPLAY, active_cassette
+
+logger = logging.getLogger(__name__)
+
+class LLMError(Exception):
+    """Base exception for LLM call errors."""
+    pass
+
+class LLMTimeoutError(LLMError):
+    """LLM call exceeded its time budget."""
+    pass
+
+class LLMClient:
+    """Call Gemini without blocking the event loop."""
+
+    def __init__(
+        self,
+        model_name: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+        cache: Optional[LLMCache] = None
+    ):
+        genai.configure(api_key=config.GOOGLE_API_KEY)
+        self.model_name = model_name or config.GEMINI_MODEL
+        self.model = genai.GenerativeModel(self.model_name)
+        self.timeout = timeout or config.LLM_TIMEOUT_SECONDS
+        # Bounds in-flight requests so a burst of quizzes can't exhaust the quota
+        self._semaphore = asyncio.Semaphore(max_concurrency or config.LLM_MAX_CONCURRENCY)
+        if cache is None and config.LLM_CACHE_ENABLED:
+            cache = LLMCache()
+        self.cache = cache
+        # Recording captures every response; replay answers from the cassette without calling Gemini
+        self.cassette = active_cassette()
+
+    async def generate(
+        self,
+        prompt: str,
+        temperature: float = 0.2,
+        response_mime_type: Optional[str] = None,
+        timeout: Optional[float] = None,
+        use_cache: bool = True
+    ) -> str:
+        """
+        Generate a completion for a prompt.
+
+        Args:
+            prompt: Full prompt text
+            temperature: Sampling temperature
+            response_mime_type: Optional response MIME type (e.g. application/json)
+            timeout: Seconds allowed for the call, including time spent queued;
+                zero or less (an expired deadline) only allows a cache hit
+            use_cache: Set False to skip the cache lookup (e.g. to get a different
+                answer on retry); the fresh response still replaces the cached one
+
+        Returns:
+            Response text
+
+        Raises:
+            LLMTimeoutError: If the call does not finish within the timeout
+            LLMError: If the API call fails or returns no text
+        """
+        if timeout is None:
+            timeout = self.timeout
+        generation_config = {"temperature": temperature}
+        if response_mime_type:
+            generation_config["response_mime_type"] = response_mime_type
+
+        key = make_key(self.model_name, prompt, generation_config)
+        if self.cache and use_cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                logger.info("LLM cache hit")
+                LLM_REQUESTS.inc(outcome="cache_hit")
+                if self.cassette and config.REPLAY_MODE == REPLAY_RECORD:
+                    self.cassette.record_llm(key, prompt, cached, 0.0)
+                return cached
+
+        if timeout <= 0:
+            LLM_REQUESTS.inc(outcome="timeout")
+            raise LLMTimeoutError("No time left for an LLM call")
+
+        start = time.monotonic()
+        try:
+            text = await asyncio.wait_for(
+                self._generate(prompt, generation_config, timeout, key),
+                timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            logger.error(f"LLM call timed out after {timeout:.1f}s")
+            LLM_REQUESTS.inc(outcome="timeout")
+            raise LLMTimeoutError(f"LLM call timed out after {timeout:.1f}s")
+        except LLMError:
+            LLM_REQUESTS.inc(outcome="error")
+            raise
+        LLM_REQUESTS.inc(outcome="ok")
+
+        if self.cassette and config.REPLAY_MODE == REPLAY_RECORD:
+            self.cassette.record_llm(key, prompt, text, time.monotonic() - start)
+        if self.cache:
+            self.cache.set(key, text)
+        return text
+
+    async def _generate(self, prompt: str, generation_config: dict, timeout: float, key: str) -> str:
+        if self.cassette and config.REPLAY_MODE == REPLAY_REPLAY:
+            return await self._replay(key)
+        async with self._semaphore:
+            try:
+                response = await self.model.generate_content_async(
+                    prompt,
+                    generation_config=genai.types.GenerationConfig(**generation_config),
+                    request_options={"timeout": timeout}
+                )
+                text = response.text
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                raise LLMError(f"Gemini request failed: {e}") from e
+        self._count_tokens(response, prompt, text)
+        return text
+
+    @staticmethod
+    def _count_tokens(response, prompt: str, text: str):
+        """Add a response's token usage to the counters, estimating when the API omits it."""
+        usage = getattr(response, "usage_metadata", None)
+        prompt_tokens = getattr(usage, "prompt_token_count", 0) or len(prompt) // 4
+        completion_tokens = getattr(usage, "candidates_token_count", 0) or len(text) // 4
+        LLM_TOKENS.inc(prompt_tokens, kind="prompt")
+        LLM_TOKENS.inc(completion_tokens, kind="completion")
+
+    async def _replay(self, key: str) -> str:
+        entry = self.cassette.find_llm(key)
+        if entry is None:
+            raise LLMError("No recorded LLM response for this prompt")
+        if config.REPLAY_LLM_LATENCY_SCALE:
+            await asyncio.sleep(entry["latency_seconds"] * config.REPLAY_LLM_LATENCY_SCALE)
+        return entry["response"]
@@ -0,0 +1,227 @@
+"""Fast Playwright page loading: block non-essential requests and wait for content, not network idle."""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Optional, Set
+from urllib.parse import urlparse
+
+from playwright.async_api import Page, Request, Route
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Resource types never needed to read a quiz page's text and links
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font", "stylesheet"}
+
+# Installed before any page script runs; records when the DOM last changed
+_MUTATION_TRACKER = """
+window.__lastMutation = performance.now();
+new MutationObserver(() => { window.__lastMutation = performance.now(); })
+    .observe(document, {subtree: true, childList: true, characterData: true, attributes: true});
+"""
+
+_SELECTOR_PRESENT = """
+(selector) => document.querySelector(selector) !== null
+"""
+
+_SELECTOR_FILLED = """
+(selector) => {
+    const el = document.querySelector(selector);
+    return !!el && el.innerText.trim().length > 0;
+}
+"""
+
+_DOM_STABLE = """
+(quietMs) => document.readyState !== "loading"
+    && performance.now() - (window.__lastMutation || 0) >= quietMs
+"""
+
+@dataclass
+class PageLoad:
+    """Timings for one page load."""
+    url: str
+    ready_by: str = "timeout"
+    ready_seconds: Optional[float] = None
+    networkidle_seconds: Optional[float] = None
+    blocked_requests: int = 0
+    _recorded: bool = field(default=False, repr=False)
+    _watcher: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    @property
+    def saved_seconds(self) -> Optional[float]:
+        """How much earlier the content was ready than network idle."""
+        if self.ready_seconds is None or self.networkidle_seconds is None:
+            return None
+        return max(0.0, self.networkidle_seconds - self.ready_seconds)
+
+    async def close(self, wait: float = 0):
+        """
+        Stop watching for network idle; call before the page is closed.
+
+        Args:
+            wait: Seconds to let the watcher run first, so the load can be
+                measured after its content has already been read
+        """
+        if self._watcher and not self._watcher.done():
+            if wait > 0:
+                await asyncio.wait({self._watcher}, timeout=wait)
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+
+class PageLoader:
+    """
+    Load quiz pages without waiting for every asset.
+
+    Requests for images, media, fonts and stylesheets, and requests to
+    known analytics/ad hosts, are aborted. Instead of ``networkidle`` the
+    loader waits until the ready element (``#result`` by default) has text
+    when the page has one, and until the DOM has stopped changing when it
+    does not, falling back to the ``load`` event if that takes too long.
+
+    Network idle is still awaited in the background, only to measure how
+    much time the early readiness saved: callers read the content first and
+    then give ``PageLoad.close`` a few seconds before closing the page.
+    Loads that were not idle by then count as unmeasured.
+    """
+
+    def __init__(
+        self,
+        block_resources: Optional[bool] = None,
+        blocked_hosts: Optional[Iterable[str]] = None,
+        ready_selector: Optional[str] = None,
+        dom_stable_ms: Optional[int] = None,
+        ready_timeout_ms: Optional[int] = None
+    ):
+        self.block_resources = config.BROWSER_BLOCK_RESOURCES if block_resources is None else block_resources
+        self.blocked_hosts: Set[str] = set(config.BROWSER_BLOCKED_HOSTS if blocked_hosts is None else blocked_hosts)
+        self.ready_selector = config.BROWSER_READY_SELECTOR if ready_selector is None else ready_selector
+        self.dom_stable_ms = dom_stable_ms or config.BROWSER_DOM_STABLE_MS
+        self.ready_timeout_ms = ready_timeout_ms or config.BROWSER_READY_TIMEOUT_MS
+
+        self.loads = 0
+        self.blocked_requests = 0
+        self.ready_by: Dict[str, int] = {}
+        self.measured_loads = 0
+        self.unmeasured_loads = 0
+        self.saved_seconds = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        """Load counters and the average time saved over network idle."""
+        return {
+            "loads": self.loads,
+            "blocked_requests": self.blocked_requests,
+            "ready_by": dict(self.ready_by),
+            "measured_loads": self.measured_loads,
+            "unmeasured_loads": self.unmeasured_loads,
+            "avg_saved_seconds": round(self.saved_seconds / self.measured_loads, 3) if self.measured_loads else None
+        }
+
+    async def load(self, page: Page, url: str, timeout: float) -> PageLoad:
+        """
+        Navigate to a URL and return once its content is ready.
+
+        Args:
+            page: Fresh Playwright page
+            url: Page to load
+            timeout: Seconds allowed for navigation plus readiness
+
+        Returns:
+            The load's timings; ``close()`` it before closing the page
+        """
+        result = PageLoad(url=url)
+        start = time.monotonic()
+
+        if self.block_resources:
+            async def route_request(route: Route, request: Request):
+                if self._should_block(request):
+                    result.blocked_requests += 1
+                    await route.abort()
+                else:
+                    await route.continue_()
+            await page.route("**/*", route_request)
+        await page.add_init_script(_MUTATION_TRACKER)
+
+        async def watch_networkidle():
+            try:
+                await page.wait_for_load_state("networkidle", timeout=timeout * 1000)
+                result.networkidle_seconds = time.monotonic() - start
+            except Exception:
+                # Page closed or never went idle; nothing to measure
+                pass
+
+        await page.goto(url, wait_until="domcontentloaded", timeout=timeout * 1000)
+        result._watcher = asyncio.create_task(watch_networkidle())
+        result._watcher.add_done_callback(lambda _: self._record_saved(result))
+
+        # Playwright treats a timeout of 0 as "wait forever"
+        ready_timeout = max(0.5, min(self.ready_timeout_ms / 1000, timeout - (time.monotonic() - start)))
+        result.ready_by = await self._wait_ready(page, ready_timeout)
+        result.ready_seconds = time.monotonic() - start
+        if result._watcher.done():
+            self._record_saved(result)
+
+        self.loads += 1
+        self.blocked_requests += result.blocked_requests
+        self.ready_by[result.ready_by] = self.ready_by.get(result.ready_by, 0) + 1
+        logger.info(
+            f"Page ready in {result.ready_seconds:.2f}s ({result.ready_by}, "
+            f"{result.blocked_requests} requests blocked)"
+        )
+        return result
+
+    def _should_block(self, request: Request) -> bool:
+        if request.resource_type in BLOCKED_RESOURCE_TYPES:
+            return True
+        host = urlparse(request.url).hostname or ""
+        return any(host == blocked or host.endswith(f".{blocked}") for blocked in self.blocked_hosts)
+
+    async def _wait_ready(self, page: Page, timeout: float) -> str:
+        """
+        Wait for the ready element to be filled, or for DOM stability on pages without one.
+
+        The two are not raced: a script can leave the DOM quiet for a while
+        before it fills the element, and that page is not ready yet.
+        """
+        if await self._has_ready_element(page):
+            condition, arg, polling, ready_by = _SELECTOR_FILLED, self.ready_selector, "mutation", "selector"
+        else:
+            condition, arg, polling, ready_by = _DOM_STABLE, self.dom_stable_ms, 100, "dom-stable"
+        try:
+            await page.wait_for_function(condition, arg=arg, polling=polling, timeout=timeout * 1000)
+            return ready_by
+        except Exception as e:
+            logger.debug(f"Page not {ready_by} within {timeout:.1f}s: {e}")
+
+        # The condition did not hold in time (e.g. endless animations, an element never filled)
+        try:
+            await page.wait_for_load_state("load", timeout=1000)
+            return "load"
+        except Exception:
+            return "timeout"
+
+    async def _has_ready_element(self, page: Page) -> bool:
+        if not self.ready_selector:
+            return False
+        try:
+            return await page.evaluate(_SELECTOR_PRESENT, self.ready_selector)
+        except Exception as e:
+            # Invalid selector or the page navigated away
+            logger.debug(f"Could not look up ready element {self.ready_selector}: {e}")
+            return False
+
+    def _record_saved(self, result: PageLoad):
+        """Count a load once both its readiness and its watcher have finished."""
+        if result._recorded or result.ready_seconds is None:
+            return
+        saved = result.saved_seconds
+        if saved is not None:
+            result._recorded = True
+            self.measured_loads += 1
+            self.saved_seconds += saved
+            logger.info(f"Content ready {saved:.2f}s before network idle for {result.url}")
+        elif result._watcher is not None and result._watcher.done():
+            # Cut off by close() or never went idle
+            result._recorded = True
+            self.unmeasured_loads += 1
@@ -0,0 +1,278 @@
+"""Parsed PDF documents with lazy, memoized page text and a bounded per-process cache."""
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pypdf import PdfReader
+
+import config
+from deadline import current_deadline
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Table cells in layout-mode text are separated by runs of spaces
+_CELL_GAP = re.compile(r"\s{2,}")
+
+def _extract(reader: PdfReader, index: int, layout: bool) -> str:
+    page = reader.pages[index]
+    if layout:
+        return page.extract_text(extraction_mode="layout") or ""
+    return page.extract_text() or ""
+
+class PdfDocument:
+    """
+    One parsed PDF.
+
+    The file is parsed once; each page's text is extracted on first use
+    and memoized, keeping at most ``max_text_chars`` characters of page
+    text (least recently used pages are dropped and re-extracted if asked
+    for again), so a 500-page file read one page at a time stays small.
+
+    ``layout=True`` keeps the horizontal position of text, which is what
+    ``page_rows`` and ``table`` split into cells.
+    """
+
+    def __init__(self, content: bytes, key: Optional[str] = None, max_text_chars: Optional[int] = None):
+        self.content = content
+        self.key = key or hashlib.sha256(content).hexdigest()
+        self.max_text_chars = max_text_chars or config.PDF_PAGE_TEXT_CHARS
+        self._reader = PdfReader(io.BytesIO(content))
+        self._texts: "OrderedDict[Tuple[int, bool], str]" = OrderedDict()
+        self._text_chars = 0
+        # pypdf readers are not safe to share between threads
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._reader.pages)
+
+    @property
+    def page_count(self) -> int:
+        return len(self)
+
+    def page_text(self, index: int, layout: bool = False) -> str:
+        """
+        Text of one page (0-indexed; negative indexes count from the end).
+
+        Raises:
+            IndexError: If the page does not exist
+        """
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"Page {index} out of range (0-{len(self) - 1})")
+        key = (index, layout)
+        with self._lock:
+            text = self._texts.get(key)
+            if text is not None:
+                self._texts.move_to_end(key)
+                return text
+            text = _extract(self._reader, index, layout)
+            self._remember(key, text)
+            return text
+
+    def iter_pages(self, pages: Optional[Iterable[int]] = None, layout: bool = False) -> Iterator[str]:
+        """Yield page texts one at a time (all pages by default)."""
+        for index in (range(len(self)) if pages is None else pages):
+            yield self.page_text(index, layout=layout)
+
+    def text(self, pages: Optional[Iterable[int]] = None, layout: bool = False, parallel: Optional[bool] = None) -> str:
+        """
+        Text of several pages (all by default), joined by newlines.
+
+        Args:
+            pages: Page indexes to include
+            layout: Keep horizontal positions (for tables)
+            parallel: Extract pages not yet memoized in worker processes;
+                by default only for documents of ``PDF_PARALLEL_MIN_PAGES``
+                or more pages
+
+        Returns:
+            The joined text
+        """
+        indexes = list(range(len(self)) if pages is None else pages)
+        if parallel is None:
+            parallel = len(indexes) >= config.PDF_PARALLEL_MIN_PAGES
+        texts: Dict[int, str] = {}
+        if parallel:
+            with self._lock:
+                missing = [i for i in indexes if (i, layout) not in self._texts]
+            if len(missing) > 1:
+                texts = self._extract_parallel(missing, layout)
+        return "\n".join(texts[i] if i in texts else self.page_text(i, layout=layout) for i in indexes)
+
+    def page_rows(self, index: int) -> List[List[str]]:
+        """Non-empty lines of a page, split into cells where the layout has wide gaps."""
+        rows = []
+        for line in self.page_text(index, layout=True).splitlines():
+            if line.strip():
+                rows.append(_CELL_GAP.split(line.strip()))
+        return rows
+
+    def table(self, index: int, header: bool = True, min_cells: int = 2) -> "pd.DataFrame":
+        """
+        The tabular lines of a page as a DataFrame.
+
+        Lines with fewer than ``min_cells`` cells (titles, footers, prose)
+        are skipped; rows are padded to the widest row.
+
+        Args:
+            index: Page index
+            header: Use the first tabular row as column names
+            min_cells: Minimum cells for a line to count as a table row
+        """
+        import pandas as pd
+
+        rows = [row for row in self.page_rows(index) if len(row) >= min_cells]
+        if not rows:
+            return pd.DataFrame()
+        width = max(len(row) for row in rows)
+        rows = [row + [""] * (width - len(row)) for row in rows]
+        if header:
+            return pd.DataFrame(rows[1:], columns=rows[0])
+        return pd.DataFrame(rows)
+
+    def _remember(self, key: Tuple[int, bool], text: str):
+        self._texts[key] = text
+        self._text_chars += len(text)
+        while self._text_chars > self.max_text_chars and len(self._texts) > 1:
+            _, dropped = self._texts.popitem(last=False)
+            self._text_chars -= len(dropped)
+
+    def _extract_parallel(self, indexes: List[int], layout: bool) -> Dict[int, str]:
+        """
+        Extract pages in separate interpreters.
+
+        Plain subprocesses rather than a multiprocessing pool, because
+        sandbox workers are daemonic and may not start pool processes.
+        Falls back to serial extraction if a worker fails. Each process holds
+        its own copy of the document, so the count is a fixed setting rather
+        than the CPU count of a possibly much larger host. The processes get
+        the sandbox run's remaining time (``SANDBOX_TIMEOUT_SECONDS`` outside
+        one) and are killed when it runs out or extraction fails.
+        """
+        workers = min(config.PDF_PARALLEL_WORKERS, os.cpu_count() or 1, len(indexes))
+        if workers < 2:
+            return {}
+        batches = [indexes[i::workers] for i in range(workers)]
+        deadline = current_deadline()
+        # Stop a little before the sandbox kills this process
+        timeout = deadline.remaining() - 1 if deadline else config.SANDBOX_TIMEOUT_SECONDS
+        if timeout <= 0:
+            return {}
+        ends_at = time.monotonic() + timeout
+        processes: List[subprocess.Popen] = []
+        results: Dict[int, str] = {}
+        failed = False
+        fd, path = tempfile.mkstemp(suffix=".pdf")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(self.content)
+            for batch in batches:
+                processes.append(subprocess.Popen(
+                    [sys.executable, os.path.abspath(__file__), path, json.dumps(batch), "1" if layout else "0"],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE
+                ))
+            for process, batch in zip(processes, batches):
+                try:
+                    out, err = process.communicate(timeout=max(0.1, ends_at - time.monotonic()))
+                except subprocess.TimeoutExpired:
+                    logger.warning(f"Parallel PDF extraction did not finish within {timeout:.1f}s")
+                    failed = True
+                    break
+                if process.returncode != 0:
+                    logger.warning(f"Parallel PDF extraction worker failed: {err.decode(errors='replace')[-500:]}")
+                    failed = True
+                    continue
+                results.update(zip(batch, json.loads(out)))
+        finally:
+            for process in processes:
+                if process.poll() is None:
+                    process.kill()
+                # Reaps the process and closes its pipes
+                process.communicate()
+            os.unlink(path)
+        if failed:
+            return results
+        logger.info(f"Extracted {len(results)} PDF pages with {workers} processes")
+        with self._lock:
+            for index, text in results.items():
+                self._remember((index, layout), text)
+        return results
+
+class PdfCache:
+    """
+    LRU of parsed documents keyed by content hash.
+
+    Bounded by document count and by the total size of the raw files, so
+    code that reopens the same PDF (or reads it page by page) parses it once.
+    """
+
+    def __init__(self, max_documents: Optional[int] = None, max_bytes: Optional[int] = None):
+        self.max_documents = max_documents or config.PDF_CACHE_DOCUMENTS
+        self.max_bytes = max_bytes or config.PDF_CACHE_MB * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self._documents: "OrderedDict[str, PdfDocument]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "documents": len(self._documents),
+            "bytes": self._bytes
+        }
+
+    def open(self, content: bytes) -> PdfDocument:
+        """Return the parsed document for these bytes, parsing it on a miss."""
+        key = hashlib.sha256(content).hexdigest()
+        with self._lock:
+            document = self._documents.get(key)
+            if document is not None:
+                self._documents.move_to_end(key)
+                self.hits += 1
+                return document
+            self.misses += 1
+
+        document = PdfDocument(content, key=key)
+        with self._lock:
+            if key not in self._documents:
+                self._documents[key] = document
+                self._bytes += len(content)
+            while len(self._documents) > 1 and (
+                len(self._documents) > self.max_documents or self._bytes > self.max_bytes
+            ):
+                _, evicted = self._documents.popitem(last=False)
+                self._bytes -= len(evicted.content)
+        return document
+
+_cache: Optional[PdfCache] = None
+
+def open_pdf(content: bytes) -> PdfDocument:
+    """Parse a PDF through this process's shared cache."""
+    global _cache
+    if _cache is None:
+        _cache = PdfCache()
+    return _cache.open(content)
+
+if __name__ == "__main__":
+    # Parallel extraction worker: <pdf path> <JSON list of page indexes> <layout 0|1>
+    reader = PdfReader(sys.argv[1])
+    layout = sys.argv[3] == "1"
+    json.dump([_extract(reader, index, layout) for index in json.loads(sys.argv[2])], sys.stdout)
@@ -25,10 +25,24 @@ Generate Python code to solve this task. The code should:
 2. Process and analyze the data (look for hidden elements, comments, or non-visible data if required)
 3. Return the final answer in the variable `answer`
 
+Download files with `data_processor.download_file(url)` (returns bytes); the quiz's data sources are already cached locally.
+For large CSV/JSON files use `table = data_processor.read_table(url)`, which reads in chunks: `table.sum(["col"])`, `table.count("col > 0")`, `table.groupby("key", {{"col": ["sum", "mean"]}})`, `table.filter("col > 0")`, or `table.to_frame()` for a DataFrame.
+For PDFs use `doc = data_processor.open_pdf(url)`: `doc.page_text(i)` (0-indexed, parsed once and cached), `doc.text()` for all pages, `doc.table(i)` for a page's table as a DataFrame.
+For Excel use `book = data_processor.open_excel(url)`: `book.describe()` lists sheets, sizes and headers without loading cells, `book.read(sheet, columns=[...], nrows=n)` reads only what you ask for (cached per workbook).
+For chart answers use `data_processor.create_chart(df, "bar", x_col, y_col, title)` (bar, barh, line, scatter, pie, hist); it returns a base64 data URI that fits the answer size limit. Do not use matplotlib.pyplot.
+
 Available libraries: requests, pandas, numpy, matplotlib, plotly, beautifulsoup4, PyPDF2, openpyxl, PIL
 
 Return ONLY executable Python code, no explanations."""
 
+# Appended to the code generation prompt, one per candidate program, so parallel
+# candidates do not all make the same mistake
+CODE_GENERATION_VARIANTS = [
+    "",
+    "\n\nInspect the data first (columns, types, units) and handle messy values before computing the answer.",
+    "\n\nDo not rely on helper shortcuts: parse the raw content yourself and double-check the result with a second computation.",
+]
+
 # Answer Extraction Prompt
 ANSWER_EXTRACTION_PROMPT = """From the following quiz question, extract:
 1. The complete problem statement including all instructions, constraints, and the specific question being asked.
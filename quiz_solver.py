@@ -2,22 +2,32 @@
 import asyncio
 import json
 import logging
-from typing import Any, Dict, Optional, List
+from typing import Any, Callable, Dict, Optional, List, Tuple
 from urllib.parse import urlparse, urljoin
-from playwright.async_api import async_playwright, Page, TimeoutError as PlaywrightTimeoutError
 import httpx
-import requests
 import re
-from datetime import datetime
-import google.generativeai as genai
-from google.generativeai.types import HarmCategory, HarmBlockThreshold
+import shutil
+import tempfile
+import time
 
 import config
+from answer_encoder import AnswerEncodingError, encode_submission
+from compaction import PageDigest
+from browser_pool import BrowserPool
 from data_processor import DataProcessor
+from fast_extract import QuizInfoExtractor
+from deadline import Deadline
+from http_client import get_http_clients
+from llm_client import LLMClient
+from metrics import SUBMISSIONS, span, timed
+from fetcher import FetchError, QuizPageFetcher
+from sandbox import SandboxError, SandboxPool
+from voting import AnswerVote
 from prompts import (
     QUIZ_SOLVER_SYSTEM_PROMPT,
     ANSWER_EXTRACTION_PROMPT,
-    CODE_GENERATION_PROMPT
+    CODE_GENERATION_PROMPT,
+    CODE_GENERATION_VARIANTS
 )
 
 logger = logging.getLogger(__name__)
@@ -53,41 +63,81 @@ def validate_url(url: str) -> bool:
 class QuizSolver:
     """Solve quiz tasks using browser automation and LLM."""
     
-    def __init__(self):
-        genai.configure(api_key=config.GOOGLE_API_KEY)
-        self.model = genai.GenerativeModel(config.GEMINI_MODEL)
+    def __init__(
+        self,
+        browser_pool: Optional[BrowserPool] = None,
+        llm_client: Optional[LLMClient] = None,
+        sandbox: Optional[SandboxPool] = None,
+        fetcher: Optional[QuizPageFetcher] = None,
+        extractor: Optional[QuizInfoExtractor] = None
+    ):
+        self.llm = llm_client or LLMClient()
         self.data_processor = DataProcessor()
-        self.start_time: Optional[datetime] = None
-        self.http_client = httpx.AsyncClient(timeout=30.0)
+        # Replaced at the start of every chain; covers direct solve_single_quiz calls too
+        self.deadline = Deadline(config.QUIZ_TIMEOUT_SECONDS)
+        self.last_answer: Any = None
+        self._artifact_dir: Optional[str] = None
+        self.http_client = get_http_clients().async_client
+        # Use the app-wide pool when given, otherwise own a private one
+        self.browser_pool = browser_pool or BrowserPool()
+        self._owns_browser_pool = browser_pool is None
+        self.sandbox = sandbox or SandboxPool(size=1)
+        self._owns_sandbox = sandbox is None
+        self.fetcher = fetcher or QuizPageFetcher(self.browser_pool)
+        self._owns_fetcher = fetcher is None
+        self.extractor = extractor or QuizInfoExtractor()
 
     async def close(self):
         """Close async resources."""
-        await self.http_client.aclose()
+        if self._artifact_dir:
+            shutil.rmtree(self._artifact_dir, ignore_errors=True)
+            self._artifact_dir = None
+        if self._owns_fetcher:
+            await self.fetcher.close()
+        if self._owns_browser_pool:
+            await self.browser_pool.close()
+        if self._owns_sandbox:
+            await self.sandbox.close()
     
     def _is_timeout_exceeded(self) -> bool:
         """Check if 3-minute timeout has been exceeded."""
-        if not self.start_time:
-            return False
-        elapsed = (datetime.now() - self.start_time).total_seconds()
-        return elapsed > config.QUIZ_TIMEOUT_SECONDS
+        return self.deadline.expired
     
-    async def solve_quiz_chain(self, initial_url: str):
+    async def solve_quiz_chain(
+        self,
+        initial_url: str,
+        on_step: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
         """
         Solve a chain of quizzes starting from the initial URL.
         
         Args:
             initial_url: Starting quiz URL
+            on_step: Optional callback invoked with a record of every quiz attempt
+            
+        Returns:
+            Dictionary with the chain's final status and, if it failed, the reason
         """
-        self.start_time = datetime.now()
+        self.deadline = Deadline(config.QUIZ_TIMEOUT_SECONDS)
         current_url = initial_url
         attempt_count = 0
+        failure: Optional[str] = None
         
         logger.info(f"Starting quiz chain from {initial_url}")
         
         while current_url and not self._is_timeout_exceeded():
+            step_start = time.monotonic()
+            step: Dict[str, Any] = {"url": current_url, "attempt": attempt_count + 1}
+            self.last_answer = None
             try:
                 logger.info(f"Solving quiz at {current_url}")
-                result = await self.solve_single_quiz(current_url)
+                result = await self.solve_single_quiz(current_url, attempt=attempt_count + 1)
+                
+                step.update(
+                    answer=self.last_answer,
+                    correct=bool(result.get("correct")),
+                    response=result
+                )
                 
                 if result.get("correct"):
                     logger.info(f"✓ Correct answer for {current_url}")
@@ -106,162 +156,132 @@ class QuizSolver:
                         attempt_count = 0
                     elif attempt_count >= config.MAX_RETRIES:
                         logger.error(f"Max retries exceeded for {current_url}")
+                        failure = f"Max retries exceeded for {current_url}"
                         break
                     # else: retry the same quiz
                 
             except Exception as e:
                 logger.error(f"Error solving quiz {current_url}: {e}", exc_info=True)
+                step.update(answer=self.last_answer, correct=False, error=str(e))
+                failure = f"Error solving quiz {current_url}: {e}"
                 break
+            finally:
+                step["latency_seconds"] = round(time.monotonic() - step_start, 3)
+                if on_step:
+                    on_step(step)
         
         await self.close()
         
         if self._is_timeout_exceeded():
             logger.warning("Quiz chain stopped: timeout exceeded")
-        else:
+            failure = failure or "Timeout exceeded"
+        elif not failure:
             logger.info("Quiz chain completed successfully")
+        
+        return {"status": "failed" if failure else "completed", "reason": failure}
     
-    async def solve_single_quiz(self, quiz_url: str) -> Dict[str, Any]:
+    @timed("quiz")
+    async def solve_single_quiz(self, quiz_url: str, attempt: int = 1, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         """
-        Solve a single quiz with Playwright and fallback to HTTPX.
+        Solve a single quiz, rendering the page with Playwright only when needed.
         
         Args:
             quiz_url: URL of the quiz
+            attempt: 1 for the first try; retries bypass cached LLM answers
+            deadline: Time budget shared by every stage (defaults to the chain's)
             
         Returns:
             Response from submission endpoint
         """
-        content = ""
-        page = None
-        playwright = None
-        browser = None
+        if deadline is not None:
+            self.deadline = deadline
+        deadline = self.deadline
         
-        # Try Playwright first
+        # Static HTTPX fetch first; Chromium only for pages that need JavaScript
         try:
-            playwright = await async_playwright().start()
-            browser = await playwright.chromium.launch(headless=True)
-            page = await browser.new_page()
-            
-            logger.info(f"Loading quiz page with Playwright: {quiz_url}")
-            await page.goto(quiz_url, timeout=config.BROWSER_TIMEOUT_MS)
-            await page.wait_for_load_state("networkidle")
-            
-            # Get rendered HTML content
-            content = await page.content()
-            logger.info(f"Playwright loaded content, length: {len(content)}")
-            
-        except Exception as e:
-            logger.error(f"Playwright failed: {e}. Falling back to HTTPX.")
-            # Fallback to HTTPX
-            try:
-                response = await self.http_client.get(quiz_url)
-                content = response.text
-                logger.info(f"HTTPX loaded content, length: {len(content)}")
-            except Exception as e2:
-                logger.error(f"Fallback HTTPX failed: {e2}")
-                if browser: await browser.close()
-                if playwright: await playwright.stop()
-                raise NetworkError(f"Failed to load quiz: {e} -> {e2}")
-
-        try:
-            # Extract quiz information using LLM (passing HTML content)
-            quiz_info = self._extract_quiz_info(content)
-            logger.info(f"Extracted quiz info: {quiz_info}")
-            
-            # Solve the quiz
-            answer = await self._solve_quiz(quiz_info, quiz_url, content, page)
-            logger.info(f"Generated answer: {answer}")
-            
-            # Resolve submit_url if relative
-            submit_url = quiz_info["submit_url"]
-            if submit_url and not submit_url.startswith("http"):
-                submit_url = urljoin(quiz_url, submit_url)
-            
-            # Submit the answer
-            result = await self._submit_answer(
-                submit_url,
-                quiz_url,
-                answer
-            )
-            
-            return result
-            
-        finally:
-            if browser: await browser.close()
-            if playwright: await playwright.stop()
+            fetched = await self.fetcher.fetch(quiz_url, deadline)
+        except FetchError as e:
+            raise NetworkError(str(e))
+        content = fetched.content
+        
+        # Parse the page once into ranked text blocks for every prompt
+        digest = PageDigest(content, base_url=quiz_url)
+        
+        # Extract quiz information using LLM (passing compacted page text)
+        quiz_info = await self._extract_quiz_info(content, digest)
+        logger.info(f"Extracted quiz info: {quiz_info}")
+        
+        # Solve the quiz
+        answer = await self._solve_quiz(quiz_info, quiz_url, content, attempt=attempt, digest=digest)
+        logger.info(f"Generated answer: {answer}")
+        self.last_answer = answer
+        
+        # Resolve submit_url if relative
+        submit_url = quiz_info["submit_url"]
+        if submit_url and not submit_url.startswith("http"):
+            submit_url = urljoin(quiz_url, submit_url)
+        
+        # Submit the answer
+        result = await self._submit_answer(
+            submit_url,
+            quiz_url,
+            answer
+        )
+        SUBMISSIONS.inc(correct=str(bool(result.get("correct"))).lower())
+        
+        return result
                 
-    async def _navigate_to_quiz(self, page: Page, url: str) -> None:
-        """Navigate to quiz page with retries."""
-        for attempt in range(config.MAX_RETRIES):
-            try:
-                logger.info(f"Loading quiz page: {url} (Attempt {attempt + 1})")
-                await page.goto(url, timeout=config.BROWSER_TIMEOUT_MS)
-                await page.wait_for_load_state("networkidle")
-                return
-            except PlaywrightTimeoutError:
-                logger.warning(f"Timeout loading {url}, retrying...")
-                if attempt == config.MAX_RETRIES - 1:
-                    raise NetworkError(f"Failed to load {url} after retries")
-            except Exception as e:
-                logger.error(f"Navigation error: {e}")
-                raise NetworkError(f"Navigation failed: {e}")
+    def _llm_budget(self) -> float:
+        """Timeout for one LLM call, keeping time in reserve to submit."""
+        return self.deadline.budget(cap=config.LLM_TIMEOUT_SECONDS, reserve=config.SUBMIT_RESERVE_SECONDS)
     
-    def _extract_quiz_info(self, content: str) -> Dict[str, Any]:
+    async def _extract_quiz_info(self, content: str, digest: Optional[PageDigest] = None) -> Dict[str, Any]:
         """
-        Extract quiz information from page content using LLM.
+        Extract quiz information from page content, using the LLM only when the rules are unsure.
         
         Args:
-            content: Page text content
+            content: Rendered page HTML
+            digest: Parsed page (built from ``content`` when not given)
             
         Returns:
             Dictionary with question, answer_type, data_sources, submit_url
         """
+        digest = digest or PageDigest(content)
+        with span("fast_extract"):
+            fast = self.extractor.extract(digest)
+        if self.extractor.accepts(fast):
+            logger.info(f"Fast-path extracted quiz info (confidence {fast.confidence}, {', '.join(fast.reasons)})")
+            return fast.info
+        
         try:
+            compacted = digest.compact(config.EXTRACTION_CONTEXT_TOKENS)
+            logger.info(f"Extraction context: {compacted.summary()}")
+            
             # Call Gemini API
-            response = self.model.generate_content(
-                f"{QUIZ_SOLVER_SYSTEM_PROMPT}\n\n{ANSWER_EXTRACTION_PROMPT.format(content=content[:4000])}",
-                generation_config=genai.types.GenerationConfig(
+            with span("llm_extract"):
+                response_text = await self.llm.generate(
+                    f"{QUIZ_SOLVER_SYSTEM_PROMPT}\n\n{ANSWER_EXTRACTION_PROMPT.format(content=compacted.text)}",
                     temperature=0.1,
-                    response_mime_type="application/json"
+                    response_mime_type="application/json",
+                    timeout=self._llm_budget()
                 )
-            )
             
-            result = json.loads(response.text)
+            result = json.loads(response_text)
             logger.info(f"LLM extracted quiz info: {result}")
             
-            # Validate and resolve extracted submit URL
-            submit_url = result.get("submit_url", "")
-            if submit_url:
-                # Resolve relative URLs
-                if not submit_url.startswith("http"):
-                    # We need the current URL to resolve relative paths. 
-                    # Since we don't pass current_url to this method, we might need to rely on the LLM or pass it.
-                    # Ideally, we should pass current_url to _extract_quiz_info.
-                    # For now, let's try to extract it from the content if possible or return relative and handle in caller.
-                    pass
+            # The rules are better at finding URLs than the LLM is at copying them
+            if not result.get("submit_url"):
+                result["submit_url"] = fast.info["submit_url"]
             
             return result
             
         except Exception as e:
             logger.error(f"Error extracting quiz info: {e}")
-            # Fallback: try to extract submit URL manually
-            submit_url_match = re.search(r'https://[^\s<>"]+/submit/\d+', content)
-            if not submit_url_match:
-                 submit_url_match = re.search(r'/submit/\d+', content)
-            
-            # Fallback: extract question
-            question_match = re.search(r'<div id="result">(.*?)</div>', content, re.DOTALL)
-            question = question_match.group(1).strip() if question_match else content[:1000]
-            
-            submit_url = submit_url_match.group(0) if submit_url_match else ""
-            
-            return {
-                "question": question,
-                "answer_type": "string",
-                "data_sources": [],
-                "submit_url": submit_url
-            }
+            # Fallback: whatever the rules found, however unsure
+            logger.info(f"Using fast-path quiz info (confidence {fast.confidence})")
+            return fast.info
     
-    async def _solve_quiz(self, quiz_info: Dict[str, Any], quiz_url: str, content: str, page: Optional[Page] = None) -> Any:
+    async def _solve_quiz(self, quiz_info: Dict[str, Any], quiz_url: str, content: str, attempt: int = 1, digest: Optional[PageDigest] = None) -> Any:
         """
         Solve the quiz using LLM to generate and execute code.
         
@@ -269,7 +289,8 @@ class QuizSolver:
             quiz_info: Extracted quiz information
             quiz_url: The URL of the quiz
             content: The rendered HTML content
-            page: Playwright page object
+            attempt: Attempt number; retries ask the LLM for fresh code
+            digest: Parsed page (built from ``content`` when not given)
             
         Returns:
             The answer to submit
@@ -277,16 +298,160 @@ class QuizSolver:
         question = quiz_info["question"]
         answer_type = quiz_info.get("answer_type", "string")
         
-        # Generate solution code using LLM
-        code = self._generate_solution_code(question, quiz_url, content)
+        # A retry means the cached code produced a wrong answer, so skip the cache
+        use_cache = attempt == 1
         
-        # Execute the code safely
-        answer = self._execute_solution_code(code, quiz_info)
+        # Not enough time to generate and run code: answer directly so something gets submitted
+        if self.deadline.remaining() < config.DIRECT_ANSWER_BELOW_SECONDS:
+            logger.warning(f"Only {self.deadline.remaining():.0f}s left, answering directly without code")
+            answer = await self._llm_direct_answer(question, use_cache=use_cache)
+            return self._format_answer(answer, answer_type)
+        
+        # Download the data sources while the LLM is writing the code
+        artifacts: Dict[str, str] = {}
+        prefetch = asyncio.create_task(self._prefetch_data_sources(quiz_info, quiz_url, artifacts))
+        try:
+            # Generate and run candidate programs, then vote on their answers
+            answer, agreed = await self._solve_with_candidates(
+                question, quiz_url, content, use_cache, digest, prefetch, artifacts
+            )
+        finally:
+            if not prefetch.done():
+                prefetch.cancel()
+            elif not prefetch.cancelled() and prefetch.exception():
+                logger.warning(f"Prefetch failed: {prefetch.exception()}")
+        if artifacts:
+            logger.info(f"Prefetched {len(artifacts)} data source(s)")
+        
+        if not agreed:
+            # No program produced an answer: try to answer with LLM directly
+            answer = await self._llm_direct_answer(question, use_cache=use_cache)
         
         # Format answer based on type
         return self._format_answer(answer, answer_type)
     
-    def _generate_solution_code(self, question: str, url: str, content: str) -> str:
+    async def _solve_with_candidates(
+        self,
+        question: str,
+        quiz_url: str,
+        content: str,
+        use_cache: bool,
+        digest: Optional[PageDigest],
+        prefetch: asyncio.Task,
+        artifacts: Dict[str, str]
+    ) -> Tuple[Any, int]:
+        """
+        Generate ``CODEGEN_CANDIDATES`` programs concurrently and vote on their answers.
+        
+        Each candidate uses its own temperature and prompt variant and runs in
+        its own sandbox worker as soon as its code is ready, so the count is
+        capped at the pool size: extra candidates would only queue behind
+        the others and spend the deadline running one after another. Voting stops as
+        soon as ``CODEGEN_QUORUM`` answers agree (a majority by default) or the
+        deadline leaves only the submit reserve; remaining candidates are
+        cancelled.
+        
+        Returns:
+            The winning answer and the number of candidates that agreed on it
+        """
+        candidates = max(1, min(config.CODEGEN_CANDIDATES, self.sandbox.size))
+        if candidates < config.CODEGEN_CANDIDATES:
+            logger.info(f"Running {candidates} of {config.CODEGEN_CANDIDATES} candidates, one per sandbox worker (SANDBOX_WORKERS={self.sandbox.size})")
+        vote = AnswerVote(config.CODEGEN_QUORUM or candidates // 2 + 1)
+        tasks = {
+            asyncio.create_task(
+                self._run_candidate(i, question, quiz_url, content, use_cache, digest, prefetch, artifacts)
+            ): i
+            for i in range(candidates)
+        }
+        pending = set(tasks)
+        try:
+            while pending and not vote.decided:
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=self.deadline.budget(reserve=config.SUBMIT_RESERVE_SECONDS, minimum=0),
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    logger.warning(f"Out of time with {len(pending)} candidate(s) still running")
+                    break
+                for task in done:
+                    index = tasks[task]
+                    if task.exception():
+                        logger.error(f"Candidate {index} failed: {task.exception()}")
+                    elif vote.add(task.result(), index):
+                        logger.info(f"Candidate {index} answered: {task.result()}")
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        
+        answer, agreed = vote.winner()
+        if candidates > 1:
+            logger.info(f"Vote: {agreed} of {vote.votes} answer(s) agree ({candidates} candidates, {len(pending)} cancelled)")
+        return answer, agreed
+    
+    async def _run_candidate(
+        self,
+        index: int,
+        question: str,
+        quiz_url: str,
+        content: str,
+        use_cache: bool,
+        digest: Optional[PageDigest],
+        prefetch: asyncio.Task,
+        artifacts: Dict[str, str]
+    ) -> Any:
+        """Generate one candidate program and execute it once the prefetch settles."""
+        temperature = min(1.0, 0.2 + index * config.CODEGEN_TEMPERATURE_STEP)
+        code = await self._generate_solution_code(
+            question, quiz_url, content, use_cache=use_cache, digest=digest,
+            temperature=temperature, variant=index
+        )
+        
+        # Give unfinished downloads a short grace period; the code can fetch the rest itself
+        await asyncio.wait(
+            {prefetch},
+            timeout=self.deadline.budget(cap=config.PREFETCH_WAIT_SECONDS, reserve=config.SUBMIT_RESERVE_SECONDS, minimum=0)
+        )
+        
+        return await self._execute_solution_code(code, artifacts=artifacts)
+    
+    async def _prefetch_data_sources(self, quiz_info: Dict[str, Any], quiz_url: str, results: Dict[str, str]) -> None:
+        """
+        Download the quiz's data sources into the solver's artifact directory.
+        
+        Args:
+            quiz_info: Extracted quiz information
+            quiz_url: The URL of the quiz, used to resolve relative sources
+            results: Filled with url -> local path as downloads complete
+        """
+        submit_url = urljoin(quiz_url, quiz_info.get("submit_url") or "")
+        urls = []
+        for source in quiz_info.get("data_sources") or []:
+            if not isinstance(source, str) or not source.strip():
+                continue
+            url = urljoin(quiz_url, source.strip())
+            if validate_url(url) and url.startswith("http") and url not in (quiz_url, submit_url):
+                urls.append(url)
+        if not urls:
+            return
+        
+        if self._artifact_dir is None:
+            self._artifact_dir = tempfile.mkdtemp(prefix="quiz-artifacts-")
+        await self.data_processor.prefetch_async(urls, self._artifact_dir, results)
+    
+    @timed("codegen")
+    async def _generate_solution_code(
+        self,
+        question: str,
+        url: str,
+        content: str,
+        use_cache: bool = True,
+        digest: Optional[PageDigest] = None,
+        temperature: float = 0.2,
+        variant: int = 0
+    ) -> str:
         """
         Generate Python code to solve the quiz using LLM.
         
@@ -294,24 +459,28 @@ class QuizSolver:
             question: The quiz question
             url: The quiz URL
             content: The rendered HTML content
+            use_cache: Whether a cached response may be reused
+            digest: Parsed page (built from ``content`` when not given)
+            temperature: Sampling temperature
+            variant: Index into the prompt variants, so candidates approach the task differently
             
         Returns:
             Python code as string
         """
         try:
-            # Call Gemini API
-            # We pass a truncated version of content to avoid token limits if it's huge
-            truncated_content = content[:10000]
+            # Ranked page text within the token budget instead of the first N characters of HTML
+            compacted = (digest or PageDigest(content, base_url=url)).compact(config.CODEGEN_CONTEXT_TOKENS)
+            logger.info(f"Code generation context: {compacted.summary()}")
             
-            response = self.model.generate_content(
-                f"{QUIZ_SOLVER_SYSTEM_PROMPT}\n\n{CODE_GENERATION_PROMPT.format(question=question, url=url)}\n\nPage Content Context:\n{truncated_content}",
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.2
-                )
+            # Call Gemini API
+            hint = CODE_GENERATION_VARIANTS[variant % len(CODE_GENERATION_VARIANTS)]
+            code = await self.llm.generate(
+                f"{QUIZ_SOLVER_SYSTEM_PROMPT}\n\n{CODE_GENERATION_PROMPT.format(question=question, url=url)}{hint}\n\nPage Content Context:\n{compacted.text}",
+                temperature=temperature,
+                timeout=self._llm_budget(),
+                use_cache=use_cache
             )
             
-            code = response.text
-            
             # Extract code from markdown if present
             if "```python" in code:
                 code = re.search(r'```python\n(.*?)```', code, re.DOTALL).group(1)
@@ -325,60 +494,52 @@ class QuizSolver:
             logger.error(f"Error generating code: {e}")
             return "answer = None"
     
-    def _execute_solution_code(self, code: str, quiz_info: Dict[str, Any]) -> Any:
+    @timed("execute")
+    async def _execute_solution_code(self, code: str, artifacts: Optional[Dict[str, str]] = None) -> Any:
         """
-        Execute the generated solution code safely.
+        Execute the generated solution code in the sandbox pool.
         
         Args:
             code: Python code to execute
-            quiz_info: Quiz information
+            artifacts: Prefetched data sources (url -> local path)
             
         Returns:
             The answer variable from executed code
+            
+        Raises:
+            SandboxError: If the code fails or runs out of time
         """
-        # Create safe execution environment
-        safe_globals = {
-            "requests": requests,  # Keep requests for generated code compatibility if needed, or prefer httpx
-            "httpx": httpx,
-            "pd": __import__("pandas"),
-            "np": __import__("numpy"),
-            "BeautifulSoup": __import__("bs4").BeautifulSoup,
-            "data_processor": self.data_processor,
-            "json": json,
-            "re": re,
-            "base64": __import__("base64"),
-        }
-        
-        safe_locals = {}
+        # Leave time for submission after the code runs
+        timeout = self.deadline.budget(cap=config.SANDBOX_TIMEOUT_SECONDS, reserve=config.SUBMIT_RESERVE_SECONDS)
         
         try:
-            exec(code, safe_globals, safe_locals)
-            answer = safe_locals.get("answer")
+            answer = await self.sandbox.run(code, timeout=timeout, artifacts=artifacts)
             logger.info(f"Code executed successfully, answer: {answer}")
             return answer
-        except Exception as e:
-            logger.error(f"Error executing code: {e}", exc_info=True)
-            # Fallback: try to answer with LLM directly
-            return self._llm_direct_answer(quiz_info["question"])
+        except SandboxError as e:
+            logger.error(f"Error executing code: {e}")
+            raise
     
-    def _llm_direct_answer(self, question: str) -> str:
+    @timed("direct_answer")
+    async def _llm_direct_answer(self, question: str, use_cache: bool = True) -> str:
         """
         Get direct answer from LLM without code execution.
         
         Args:
             question: The quiz question
+            use_cache: Whether a cached response may be reused
             
         Returns:
             Direct answer
         """
         try:
-            response = self.model.generate_content(
+            response_text = await self.llm.generate(
                 f"{QUIZ_SOLVER_SYSTEM_PROMPT}\n\nAnswer this question directly, return only the answer:\n{question}",
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.1
-                )
+                temperature=0.1,
+                timeout=self._llm_budget(),
+                use_cache=use_cache
             )
-            return response.text.strip()
+            return response_text.strip()
         except Exception as e:
             logger.error(f"Error getting direct answer: {e}")
             return ""
@@ -420,6 +581,7 @@ class QuizSolver:
                 return answer.strip()
             return answer
     
+    @timed("submit")
     async def _submit_answer(self, submit_url: str, quiz_url: str, answer: Any) -> Dict[str, Any]:
         """
         Submit answer to the endpoint asynchronously.
@@ -432,32 +594,36 @@ class QuizSolver:
         Returns:
             Response from server
         """
-        payload = {
+        fields = {
             "email": config.STUDENT_EMAIL,
             "secret": config.STUDENT_SECRET,
-            "url": quiz_url,
-            "answer": answer
+            "url": quiz_url
         }
         
-        # Validate payload size (1MB limit per problem statement)
-        payload_json = json.dumps(payload)
-        payload_size = len(payload_json.encode('utf-8'))
-        if payload_size > 1_000_000:  # 1MB = 1,000,000 bytes
-            logger.error(f"Payload too large: {payload_size:,} bytes (limit: 1,000,000)")
+        # Serialized once, within the 1MB limit; file answers are shrunk to fit
+        try:
+            body = encode_submission(fields, answer)
+        except AnswerEncodingError as e:
+            logger.error(f"Cannot submit answer: {e}")
             return {
                 "correct": False,
-                "reason": f"Answer payload exceeds 1MB limit ({payload_size:,} bytes)"
+                "reason": str(e)
             }
         
-        logger.info(f"Submitting answer to {submit_url} (payload size: {payload_size:,} bytes)")
+        logger.info(f"Submitting answer to {submit_url} (payload size: {len(body):,} bytes)")
 
         
         for attempt in range(3):
+            # Retries are only worth it while the quiz is still within its time limit
+            if attempt > 0 and self.deadline.expired:
+                break
             try:
                 response = await self.http_client.post(
                     submit_url,
-                    json=payload,
-                    timeout=30.0
+                    content=body,
+                    headers={"Content-Type": "application/json"},
+                    # The answer is ready, so give the first POST a fair chance even past the deadline
+                    timeout=max(self.deadline.budget(cap=config.HTTP_TIMEOUT_SECONDS), 5.0)
                 )
                 
                 response.raise_for_status()
@@ -0,0 +1,276 @@
+"""Record quiz traffic into a cassette directory and replay it offline."""
+import hashlib
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Any, Dict, List, Optional, Union
+from urllib.parse import urlsplit, urlunsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+
+logger = logging.getLogger(__name__)
+
+REPLAY_RECORD = "record"
+REPLAY_REPLAY = "replay"
+
+# Carries the original URL from the rewriting transports to the stub server
+REPLAY_URL_HEADER = "X-Replay-Url"
+
+def _sha(data: Union[str, bytes]) -> str:
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+class Cassette:
+    """
+    A directory of recorded traffic.
+
+    Layout (one file per entry, so several processes can record at once)::
+
+        http/<method+url hash>/<request body hash>.json   response metadata
+        http/<method+url hash>/<request body hash>.body   response body
+        pages/<url hash>.json                            final page HTML as the solver saw it
+        llm/<request key>.json                           prompt, response and latency
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        for sub in ("http", "pages", "llm"):
+            os.makedirs(os.path.join(directory, sub), exist_ok=True)
+
+    def record_http(
+        self,
+        method: str,
+        url: str,
+        request_body: Optional[bytes],
+        status: int,
+        content_type: str,
+        body: bytes,
+        latency_seconds: float
+    ):
+        """Store one HTTP exchange."""
+        folder = os.path.join(self.directory, "http", _sha(f"{method.upper()} {url}"))
+        os.makedirs(folder, exist_ok=True)
+        name = _sha(request_body or b"")
+        self._write(os.path.join(folder, f"{name}.body"), body)
+        self._write(os.path.join(folder, f"{name}.json"), json.dumps({
+            "method": method.upper(),
+            "url": url,
+            "status": status,
+            "content_type": content_type,
+            "latency_seconds": latency_seconds,
+            "recorded_at": time.time()
+        }).encode("utf-8"))
+
+    def find_http(self, method: str, url: str, request_body: Optional[bytes]) -> Optional[Dict[str, Any]]:
+        """
+        Look up a recorded exchange.
+
+        An exact request body match wins; otherwise the latest exchange for
+        the same method and URL is used (e.g. a submission whose answer
+        payload differs from the recorded one).
+        """
+        folder = os.path.join(self.directory, "http", _sha(f"{method.upper()} {url}"))
+        if not os.path.isdir(folder):
+            return None
+        name = _sha(request_body or b"")
+        if not os.path.exists(os.path.join(folder, f"{name}.json")):
+            entries = [f for f in os.listdir(folder) if f.endswith(".json")]
+            if not entries:
+                return None
+            name = max(entries, key=lambda f: os.path.getmtime(os.path.join(folder, f)))[:-len(".json")]
+        with open(os.path.join(folder, f"{name}.json"), encoding="utf-8") as f:
+            entry = json.load(f)
+        with open(os.path.join(folder, f"{name}.body"), "rb") as f:
+            entry["body"] = f.read()
+        return entry
+
+    def record_page(self, url: str, content: str):
+        """Store the HTML a quiz page resolved to (after any rendering)."""
+        self._write(
+            os.path.join(self.directory, "pages", f"{_sha(url)}.json"),
+            json.dumps({"url": url, "content": content, "recorded_at": time.time()}).encode("utf-8")
+        )
+
+    def find_page(self, url: str) -> Optional[str]:
+        data = self._read_json(os.path.join(self.directory, "pages", f"{_sha(url)}.json"))
+        return data["content"] if data else None
+
+    def page_urls(self) -> List[str]:
+        """Recorded page URLs, oldest first."""
+        folder = os.path.join(self.directory, "pages")
+        pages = [self._read_json(os.path.join(folder, name)) for name in os.listdir(folder) if name.endswith(".json")]
+        return [page["url"] for page in sorted((p for p in pages if p), key=lambda p: p["recorded_at"])]
+
+    def record_llm(self, key: str, prompt: str, response: str, latency_seconds: float):
+        """Store one LLM response under its ``llm_cache.make_key`` key."""
+        self._write(
+            os.path.join(self.directory, "llm", f"{key}.json"),
+            json.dumps({"prompt": prompt, "response": response, "latency_seconds": latency_seconds}).encode("utf-8")
+        )
+
+    def find_llm(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._read_json(os.path.join(self.directory, "llm", f"{key}.json"))
+
+    @staticmethod
+    def _read_json(path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _write(path: str, data: bytes):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to write cassette entry {path}: {e}")
+
+_cassette: Optional[Cassette] = None
+
+def active_cassette() -> Optional[Cassette]:
+    """The cassette for ``REPLAY_MODE``, or None when recording/replay is off."""
+    global _cassette
+    if config.REPLAY_MODE not in (REPLAY_RECORD, REPLAY_REPLAY):
+        return None
+    if _cassette is None or _cassette.directory != config.REPLAY_CASSETTE_DIR:
+        _cassette = Cassette(config.REPLAY_CASSETTE_DIR)
+    return _cassette
+
+def install_recorder(async_client: httpx.AsyncClient, session: requests.Session, cassette: Cassette):
+    """Record every response received through the pooled clients."""
+
+    async def record_async(response: httpx.Response):
+        await response.aread()
+        try:
+            elapsed = response.elapsed.total_seconds()
+        except RuntimeError:
+            elapsed = 0.0
+        cassette.record_http(
+            response.request.method,
+            str(response.request.url),
+            response.request.content,
+            response.status_code,
+            response.headers.get("content-type", ""),
+            response.content,
+            elapsed
+        )
+
+    def record_sync(response: requests.Response, *args, **kwargs):
+        body = response.request.body
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        cassette.record_http(
+            response.request.method,
+            response.request.url,
+            body,
+            response.status_code,
+            response.headers.get("content-type", ""),
+            response.content,
+            response.elapsed.total_seconds()
+        )
+
+    async_client.event_hooks["response"].append(record_async)
+    session.hooks["response"].append(record_sync)
+    logger.info(f"Recording HTTP traffic to {cassette.directory}")
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """httpx transport that sends every request to the stub server instead of its host."""
+
+    def __init__(self, stub_url: str):
+        self._stub = httpx.URL(stub_url)
+        self._transport = httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request.headers[REPLAY_URL_HEADER] = str(request.url)
+        request.url = request.url.copy_with(scheme=self._stub.scheme, host=self._stub.host, port=self._stub.port)
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+class ReplayAdapter(HTTPAdapter):
+    """requests adapter that sends every request to the stub server instead of its host."""
+
+    def __init__(self, stub_url: str, **kwargs):
+        self._stub = urlsplit(stub_url)
+        super().__init__(**kwargs)
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        original = urlsplit(request.url)
+        request.headers[REPLAY_URL_HEADER] = request.url
+        request.url = urlunsplit((self._stub.scheme, self._stub.netloc, original.path or "/", original.query, ""))
+        return super().send(request, **kwargs)
+
+def create_stub_app(cassette: Cassette):
+    """FastAPI app that answers rewritten requests from the cassette."""
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse, Response
+
+    stub = FastAPI(title="Quiz replay stub")
+
+    @stub.api_route("/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE", "HEAD"])
+    async def serve(path: str, request: Request):
+        url = request.headers.get(REPLAY_URL_HEADER) or str(request.url)
+        if request.method == "GET":
+            page = cassette.find_page(url)
+            if page is not None:
+                return Response(page, media_type="text/html")
+
+        entry = cassette.find_http(request.method, url, await request.body())
+        if entry is None:
+            logger.warning(f"No recording for {request.method} {url}")
+            return JSONResponse({"error": f"No recording for {request.method} {url}"}, status_code=404)
+        return Response(entry["body"], status_code=entry["status"], media_type=entry["content_type"] or None)
+
+    return stub
+
+class StubServer:
+    """Serve a cassette on a free local port from a background thread."""
+
+    def __init__(self, cassette: Cassette, host: str = "127.0.0.1"):
+        self.cassette = cassette
+        self.host = host
+        self.url: Optional[str] = None
+        self._server = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, timeout: float = 10.0) -> str:
+        """Start serving and return the stub's base URL."""
+        import uvicorn
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, 0))
+        port = sock.getsockname()[1]
+
+        self._server = uvicorn.Server(uvicorn.Config(create_stub_app(self.cassette), log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, kwargs={"sockets": [sock]}, daemon=True)
+        self._thread.start()
+
+        deadline = time.monotonic() + timeout
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Replay stub server did not start")
+            time.sleep(0.05)
+
+        self.url = f"http://{self.host}:{port}"
+        logger.info(f"Replay stub serving {self.cassette.directory} at {self.url}")
+        return self.url
+
+    def stop(self):
+        if self._server:
+            self._server.should_exit = True
+        if self._thread:
+            self._thread.join(timeout=5)
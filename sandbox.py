@@ -0,0 +1,279 @@
+"""Sandboxed process pool for executing generated solution code."""
+import asyncio
+import logging
+import math
+import multiprocessing
+import os
+import signal
+from typing import Any, Dict, Optional, Set
+
+import config
+
+try:
+    import resource
+except ImportError:  # Windows has no rlimits
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+class SandboxError(Exception):
+    """Base exception for sandboxed execution errors."""
+    pass
+
+class SandboxTimeoutError(SandboxError):
+    """Generated code exceeded its wall-clock or CPU budget."""
+    pass
+
+class SandboxExecutionError(SandboxError):
+    """Generated code raised an exception."""
+    pass
+
+def _to_serializable(value: Any) -> Any:
+    """
+    Convert an answer into plain Python types before it crosses the pipe.
+
+    numpy scalars/arrays and pandas objects are unwrapped so the parent
+    process never needs to import them just to unpickle a result.
+    """
+    if value is None or isinstance(value, (bool, int, float, str, bytes)):
+        return value
+    if isinstance(value, dict):
+        return {str(k): _to_serializable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [_to_serializable(v) for v in value]
+    # pandas DataFrame / Series
+    if hasattr(value, "to_dict") and hasattr(value, "columns"):
+        return _to_serializable(value.to_dict(orient="records"))
+    if hasattr(value, "tolist"):
+        # numpy arrays, pandas Series and numpy scalars
+        return _to_serializable(value.tolist())
+    if hasattr(value, "item"):
+        return _to_serializable(value.item())
+    return str(value)
+
+def _set_cpu_limit(cpu_seconds: float):
+    """Allow this process ``cpu_seconds`` more CPU time before SIGXCPU."""
+    if resource is None or not cpu_seconds:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = usage.ru_utime + usage.ru_stime
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = int(math.ceil(used + cpu_seconds))
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+def _worker_main(conn, memory_limit_mb: int):
+    """Worker loop: import heavy libraries once, then exec jobs from the pipe."""
+    # One BLAS thread per worker; the pool already provides the parallelism
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ.setdefault(var, "1")
+    # Own process group, so killing the worker also kills processes its code started
+    if hasattr(os, "setsid"):
+        os.setsid()
+
+    import base64
+    import json
+    import re
+
+    import httpx
+    import numpy as np
+    import requests
+    import pandas as pd
+    from bs4 import BeautifulSoup
+
+    from data_processor import DataProcessor
+    from deadline import Deadline, set_current_deadline
+    from http_client import get_http_clients, route_requests_through
+
+    if resource is not None and memory_limit_mb:
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    # Only pandas/numpy are pre-imported; data_processor loads its parsing and
+    # charting libraries on first use, so an idle worker stays small on a 512MB host
+
+    # Process-local pooled clients, kept warm across runs on this worker
+    http = get_http_clients()
+    route_requests_through(http.session)
+    data_processor = DataProcessor(http)
+    base_globals = {
+        "requests": requests,
+        "httpx": httpx,
+        "pd": pd,
+        "np": np,
+        "BeautifulSoup": BeautifulSoup,
+        "data_processor": data_processor,
+        "json": json,
+        "re": re,
+        "base64": base64,
+    }
+
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+
+        code, cpu_seconds, artifacts = job
+        _set_cpu_limit(cpu_seconds)
+        # The run's wall-clock budget, for helpers that wait on subprocesses
+        set_current_deadline(Deadline(cpu_seconds))
+        data_processor.register_artifacts(artifacts)
+
+        safe_globals = dict(base_globals)
+        safe_locals = {}
+        try:
+            exec(code, safe_globals, safe_locals)
+            reply = ("ok", _to_serializable(safe_locals.get("answer")))
+        except BaseException as e:  # includes SystemExit raised by generated code
+            reply = ("error", f"{type(e).__name__}: {e}")
+
+        try:
+            conn.send(reply)
+        except Exception as e:
+            conn.send(("error", f"Answer could not be serialized: {e}"))
+
+class _Worker:
+    """A pre-warmed worker process and its end of the job pipe."""
+
+    def __init__(self, ctx, memory_limit_mb: int):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, memory_limit_mb),
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+    def kill(self):
+        try:
+            if hasattr(os, "killpg") and self.process.pid:
+                try:
+                    os.killpg(self.process.pid, signal.SIGKILL)
+                except OSError:
+                    # Not (yet) a group leader, or already gone
+                    pass
+            self.process.kill()
+            self.process.join(timeout=1)
+        finally:
+            self.conn.close()
+
+class SandboxPool:
+    """
+    Run generated code in a pool of pre-warmed worker processes.
+
+    Each run gets a wall-clock deadline and a matching CPU rlimit; workers
+    also run under an address-space cap. A worker that overruns or dies is
+    killed and replaced so the next run starts from a clean process.
+    """
+
+    def __init__(
+        self,
+        size: Optional[int] = None,
+        memory_limit_mb: Optional[int] = None,
+        default_timeout: Optional[float] = None
+    ):
+        self.size = size or config.SANDBOX_WORKERS
+        self.memory_limit_mb = config.SANDBOX_MEMORY_MB if memory_limit_mb is None else memory_limit_mb
+        self.default_timeout = default_timeout or config.SANDBOX_TIMEOUT_SECONDS
+
+        # spawn keeps workers independent of the server's threads and event loop
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle: Optional[asyncio.Queue] = None
+        self._workers: Set[_Worker] = set()
+
+    async def start(self):
+        """Spawn the worker processes."""
+        if self._idle is not None:
+            return
+        self._idle = asyncio.Queue()
+        for _ in range(self.size):
+            self._idle.put_nowait(self._spawn())
+        logger.info(f"Started {self.size} sandbox workers")
+
+    async def close(self):
+        """Stop all worker processes."""
+        for worker in list(self._workers):
+            try:
+                worker.conn.send(None)
+            except Exception:
+                pass
+            worker.kill()
+        self._workers.clear()
+        self._idle = None
+
+    async def run(
+        self,
+        code: str,
+        timeout: Optional[float] = None,
+        artifacts: Optional[Dict[str, str]] = None
+    ) -> Any:
+        """
+        Execute code in a worker and return its ``answer`` variable.
+
+        Args:
+            code: Python code to execute
+            timeout: Wall-clock seconds allowed, including time waiting for a free
+                worker; zero or less (an expired deadline) fails at once
+            artifacts: Prefetched files (url -> local path) that the worker's
+                ``data_processor.download_file`` serves without a network call
+
+        Returns:
+            The answer, converted to plain Python types
+
+        Raises:
+            SandboxTimeoutError: If the code overruns its budget
+            SandboxExecutionError: If the code raises
+            SandboxError: If the worker dies unexpectedly
+        """
+        if timeout is None:
+            timeout = self.default_timeout
+        if timeout <= 0:
+            raise SandboxTimeoutError("No time left to execute code")
+        await self.start()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+
+        try:
+            worker = await asyncio.wait_for(self._idle.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            raise SandboxTimeoutError("No sandbox worker became available in time")
+
+        remaining = max(0.0, deadline - loop.time())
+        healthy = False
+        try:
+            worker.conn.send((code, remaining, artifacts))
+            ready = await asyncio.to_thread(worker.conn.poll, remaining)
+            if not ready:
+                raise SandboxTimeoutError(f"Code execution exceeded {timeout:.1f}s")
+            try:
+                status, payload = worker.conn.recv()
+            except (EOFError, OSError):
+                # SIGXCPU, the address-space cap or a hard crash killed the worker
+                raise SandboxError(f"Sandbox worker died (exit code {worker.process.exitcode})")
+            healthy = True
+        finally:
+            if healthy:
+                self._idle.put_nowait(worker)
+            else:
+                self._replace(worker)
+
+        if status == "error":
+            raise SandboxExecutionError(payload)
+        return payload
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self._ctx, self.memory_limit_mb)
+        self._workers.add(worker)
+        return worker
+
+    def _replace(self, worker: _Worker):
+        logger.warning("Replacing sandbox worker")
+        self._workers.discard(worker)
+        worker.kill()
+        if self._idle is not None:
+            self._idle.put_nowait(self._spawn())
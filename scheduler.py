@@ -0,0 +1,100 @@
+"""Bounded job queue with admission control for quiz chains."""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Optional, Set
+
+import config
+
+logger = logging.getLogger(__name__)
+
+class SchedulerFullError(Exception):
+    """The scheduler cannot accept more jobs right now."""
+    pass
+
+class JobScheduler:
+    """
+    Run jobs on a fixed number of worker tasks fed by a bounded queue.
+
+    ``submit`` never blocks: when the queue is full it raises
+    ``SchedulerFullError`` so the endpoint can shed load instead of
+    starting unbounded browsers and LLM calls.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[..., Awaitable[Any]],
+        max_concurrency: Optional[int] = None,
+        max_queue: Optional[int] = None
+    ):
+        self.handler = handler
+        self.max_concurrency = max_concurrency or config.JOB_MAX_CONCURRENCY
+        self.max_queue = max_queue or config.JOB_QUEUE_SIZE
+        self.running = 0
+
+        self._queue: Optional[asyncio.Queue] = None
+        # Strong references so worker tasks are never garbage collected mid-run
+        self._workers: Set[asyncio.Task] = set()
+        self._accepting = False
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of jobs waiting for a worker."""
+        return self._queue.qsize() if self._queue else 0
+
+    async def start(self):
+        """Start the worker tasks."""
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        for i in range(self.max_concurrency):
+            task = asyncio.create_task(self._worker(), name=f"job-worker-{i}")
+            self._workers.add(task)
+        self._accepting = True
+        logger.info(f"Job scheduler started ({self.max_concurrency} workers, queue size {self.max_queue})")
+
+    def submit(self, *args: Any):
+        """
+        Queue a job for the handler.
+
+        Raises:
+            SchedulerFullError: If the queue is full or the scheduler is shutting down
+        """
+        if not self._accepting:
+            raise SchedulerFullError("Server is shutting down")
+        try:
+            self._queue.put_nowait(args)
+        except asyncio.QueueFull:
+            raise SchedulerFullError(f"Job queue is full ({self.max_queue} waiting)")
+
+    async def shutdown(self, timeout: Optional[float] = None):
+        """
+        Stop accepting jobs and let queued and running jobs finish.
+
+        Jobs still running after ``timeout`` seconds are cancelled.
+        """
+        self._accepting = False
+        timeout = config.JOB_DRAIN_TIMEOUT_SECONDS if timeout is None else timeout
+
+        if self._queue is not None:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout=timeout)
+                logger.info("All queued jobs drained")
+            except asyncio.TimeoutError:
+                logger.warning(f"Cancelling {self.running} running and {self.queue_depth} queued jobs after drain timeout")
+
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+
+    async def _worker(self):
+        while True:
+            args = await self._queue.get()
+            self.running += 1
+            try:
+                await self.handler(*args)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job failed: {e}", exc_info=True)
+            finally:
+                self.running -= 1
+                self._queue.task_done()
@@ -0,0 +1,85 @@
+"""Majority voting over answers produced by independently generated programs."""
+import json
+import math
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional, Tuple
+
+def normalize_answer(answer: Any) -> Optional[Hashable]:
+    """
+    Map an answer to a key under which equivalent answers compare equal.
+
+    ``42``, ``42.0`` and ``" 42 "`` share a key; floats are compared to six
+    decimals; dicts and lists by their sorted JSON. Empty answers return
+    None and do not vote.
+    """
+    if answer is None:
+        return None
+    if isinstance(answer, bool):
+        return ("bool", answer)
+    if isinstance(answer, (int, float)):
+        if isinstance(answer, float) and not math.isfinite(answer):
+            return ("num", str(answer))
+        if float(answer).is_integer():
+            return ("num", int(answer))
+        return ("num", round(float(answer), 6))
+    if isinstance(answer, str):
+        text = " ".join(answer.split())
+        if not text:
+            return None
+        try:
+            return normalize_answer(float(text.replace(",", "")))
+        except ValueError:
+            return ("str", text)
+    try:
+        return ("json", json.dumps(answer, sort_keys=True, default=str))
+    except (TypeError, ValueError):
+        return ("repr", repr(answer))
+
+class AnswerVote:
+    """
+    Tally candidate answers until ``quorum`` of them agree.
+
+    Ties are broken in favour of the answer that arrived first.
+    """
+
+    def __init__(self, quorum: int):
+        self.quorum = max(1, quorum)
+        # key -> (first answer seen, candidate indexes that produced it)
+        self._groups: "OrderedDict[Hashable, Tuple[Any, List[int]]]" = OrderedDict()
+
+    @property
+    def votes(self) -> int:
+        return sum(len(indexes) for _, indexes in self._groups.values())
+
+    @property
+    def decided(self) -> bool:
+        """Whether some answer has reached the quorum."""
+        return any(len(indexes) >= self.quorum for _, indexes in self._groups.values())
+
+    def add(self, answer: Any, candidate: int) -> bool:
+        """
+        Record one candidate's answer.
+
+        Returns:
+            True if the answer counted as a vote
+        """
+        key = normalize_answer(answer)
+        if key is None:
+            return False
+        if key not in self._groups:
+            self._groups[key] = (answer, [])
+        self._groups[key][1].append(candidate)
+        return True
+
+    def winner(self) -> Tuple[Any, int]:
+        """
+        The most common answer and how many candidates agreed on it.
+
+        Returns:
+            ``(None, 0)`` when no candidate produced an answer
+        """
+        best_answer, best_count = None, 0
+        for answer, indexes in self._groups.values():
+            if len(indexes) > best_count:
+                best_answer, best_count = answer, len(indexes)
+        return best_answer, best_count